@@ -5,4 +5,16 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'App'
-# App/apps.py
\ No newline at end of file
+
+    def ready(self):
+        # Registrar señales de cachés y estructuras derivadas
+        from . import signals  # noqa: F401
+
+        # Bus de invalidación entre procesos: el hilo de escucha se arranca
+        # en el primer request de cada proceso (después del fork del servidor)
+        from django.conf import settings
+        if settings.INVALIDACION_BUS:
+            from django.core.signals import request_started
+            from . import bus
+            request_started.connect(bus.asegurar_escucha, dispatch_uid='bus_invalidacion')
+# App/apps.py
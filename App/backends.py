@@ -0,0 +1,31 @@
+# App/backends.py
+"""
+Backend de autenticación propio
+Registrado en settings.AUTHENTICATION_BACKENDS
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+
+
+# Lo que se carga junto con el User de cada request
+RELACIONADOS_USUARIO = ('profile', 'usuario__categoria')
+
+
+class ModelBackendRelacionado(ModelBackend):
+    """
+    ModelBackend que carga el User del request con su UserProfile, su
+    Usuario vinculado y la Categoria de este en una sola consulta
+
+    AuthenticationMiddleware resuelve request.user (o request.auser())
+    con get_user() la primera vez que se usa; después request.user.profile,
+    request.user.usuario y request.user.usuario.categoria no consultan la
+    base. aget_user() de BaseBackend llama a get_user(), así que vale
+    también para las vistas async.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = User._default_manager.select_related(*RELACIONADOS_USUARIO).get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
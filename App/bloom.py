@@ -0,0 +1,458 @@
+# App/bloom.py
+"""
+Filtro de Bloom de emails y teléfonos existentes
+
+Antes de preguntar a la base "¿ya existe este email/teléfono?" se consulta
+el filtro: si responde que no, seguro no existe y se evita la consulta;
+si responde que tal vez, se hace la consulta exacta de siempre.
+
+Contiene Usuario.email, Usuario.telefono_digitos y auth_user.email.
+Se reconstruye con `python manage.py reconstruir_bloom` y se actualiza
+en cada guardado (ver App/signals.py). Según settings.BLOOM_USUARIOS:
+
+- 'cache':   cada proceso tiene su copia en memoria. reconstruir_bloom
+             deja la base en la caché de coordinación; al cargarla, cada
+             proceso agrega lo guardado desde entonces (updated_at /
+             date_joined). Las altas se avisan a los demás por el bus
+             (App/bus.py) como posiciones de bits al confirmar la
+             transacción. Requiere settings.INVALIDACION_BUS: sin bus no
+             se enteraría de las altas de otros procesos
+- 'archivo': los bits viven en settings.BLOOM_USUARIOS_ARCHIVO, mapeado
+             en memoria (mmap) y compartido por los procesos del servidor
+- 'off':     desactivado, siempre se hace la consulta exacta
+
+Si el filtro no está construido (o no se pudo actualizar) se responde
+"tal vez". Un falso negativo solo es posible en ventanas chicas (una alta
+de otro proceso cuyo aviso todavía no llegó): por eso el filtro solo
+ahorra lecturas previas y las restricciones únicas de la base siguen
+siendo las que impiden duplicados.
+"""
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Usuario, normalizar_telefono
+from . import bus
+from . import cache_niveles
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== FILTRO ====================
+
+# Cabecera del formato serializado: marca, cantidad de bits, cantidad de hashes
+CABECERA = struct.Struct('<4sQI')
+MARCA = b'BLM1'
+
+# Tasa de falsos positivos con la que se dimensiona el filtro
+TASA_ERROR = 0.01
+# Holgura para las altas posteriores a la reconstrucción
+FACTOR_CAPACIDAD = 2
+CAPACIDAD_MINIMA = 10_000
+
+
+class FiltroBloom:
+    """
+    Filtro de Bloom sobre un buffer de bytes (bytearray o mmap)
+
+    Usa doble hashing: las k posiciones salen de un solo blake2b
+    """
+
+    def __init__(self, bits, m, k):
+        self.bits = bits
+        self.m = m
+        self.k = k
+
+    @classmethod
+    def nuevo(cls, capacidad, tasa_error=TASA_ERROR):
+        """
+        Filtro vacío dimensionado para capacidad elementos
+
+        Args:
+            capacidad: Cantidad esperada de elementos
+            tasa_error: Probabilidad de falso positivo a esa capacidad
+        """
+        capacidad = max(capacidad, 1)
+        m = max(8, int(-capacidad * math.log(tasa_error) / math.log(2) ** 2))
+        k = max(1, round(m / capacidad * math.log(2)))
+        return cls(bytearray((m + 7) // 8), m, k)
+
+    @classmethod
+    def desde_buffer(cls, buffer):
+        """
+        Filtro sobre un buffer serializado (bytes leídos de la caché o un mmap)
+        Con un mmap los bits no se copian: se usan directo del archivo
+        """
+        marca, m, k = CABECERA.unpack_from(buffer, 0)
+        if marca != MARCA:
+            raise ValueError('Formato de filtro de Bloom desconocido')
+        return cls(memoryview(buffer)[CABECERA.size:], m, k)
+
+    def serializar(self):
+        return CABECERA.pack(MARCA, self.m, self.k) + bytes(self.bits)
+
+    def _posiciones(self, valor):
+        digest = hashlib.blake2b(valor.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    def agregar(self, valor):
+        """Agrega un valor y devuelve las posiciones que marcó"""
+        posiciones = self._posiciones(valor)
+        for posicion in posiciones:
+            self.marcar(posicion)
+        return posiciones
+
+    def marcar(self, posicion):
+        self.bits[posicion >> 3] |= 1 << (posicion & 7)
+
+    def __contains__(self, valor):
+        return all(
+            self.bits[posicion >> 3] & (1 << (posicion & 7))
+            for posicion in self._posiciones(valor)
+        )
+
+
+# ==================== CLAVES ====================
+
+def clave_email(email):
+    return f'email:{email.strip().lower()}' if email else None
+
+
+def clave_telefono(telefono):
+    digitos = normalizar_telefono(telefono)
+    return f'tel:{digitos}' if digitos else None
+
+
+def claves_usuario(usuario):
+    """Claves de un Usuario (email y teléfono)"""
+    return [c for c in (clave_email(usuario.email), clave_telefono(usuario.telefono)) if c]
+
+
+# ==================== ALMACENAMIENTO ====================
+
+CLAVE_CACHE = 'bloom:usuarios:base'
+CLAVE_VERSION = 'bloom:usuarios:version'
+
+# Al cargar la base o reconstruir se vuelve a agregar lo guardado desde
+# un poco antes: updated_at se fija al guardar, no al confirmar
+MARGEN_AL_DIA = timedelta(minutes=5)
+
+# Con más posiciones que esto (una importación grande) se avisa a los
+# demás procesos que recarguen en vez de mandar cientos de avisos
+MAXIMO_POSICIONES_AVISO = 20_000
+
+_local = threading.local()
+
+
+class _AlmacenCache:
+    """
+    Copia del filtro en la memoria de cada proceso
+
+    La caché de coordinación solo guarda la base que escribe reconstruir();
+    guardar un usuario no toma locks ni reescribe la caché: al confirmar,
+    agrega sus claves a la copia local y avisa por el bus las posiciones
+    de bits. La versión de la base se lee de la memoria del proceso
+    (cache_niveles.version, invalidada por el bus)
+    """
+
+    def __init__(self):
+        self._filtro = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._avisado_sin_bus = False
+
+    def filtro(self):
+        if not settings.INVALIDACION_BUS:
+            if not self._avisado_sin_bus:
+                logger.warning("BLOOM_USUARIOS='cache' requiere INVALIDACION_BUS: el filtro queda sin usar")
+                self._avisado_sin_bus = True
+            return None
+        version = cache_niveles.version(CLAVE_VERSION)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._cargar(version)
+        return self._filtro
+
+    def _cargar(self, version):
+        """Carga la base y le agrega lo guardado desde que se construyó"""
+        datos = cache_niveles.coordinacion().get(CLAVE_CACHE)
+        filtro = None
+        if datos:
+            filtro = FiltroBloom.desde_buffer(bytearray(datos['filtro']))
+            desde = datos['desde'] - MARGEN_AL_DIA
+            for clave in _claves_desde(
+                Usuario.objects.filter(updated_at__gte=desde),
+                User.objects.filter(date_joined__gte=desde),
+            ):
+                filtro.agregar(clave)
+        self._filtro = filtro
+        self._version = version
+
+    def reemplazar(self, filtro, desde):
+        cache_niveles.coordinacion().set(
+            CLAVE_CACHE, {'filtro': filtro.serializar(), 'desde': desde}, None
+        )
+        cache_niveles.cambiar_version(CLAVE_VERSION)
+
+    def agregar(self, claves):
+        # Al confirmar: antes el alta no se ve en la base y, si se revierte,
+        # la copia local conservaría claves que los demás no tienen.
+        # Un callback por llamada, como en bus.publicar()
+        pendientes = getattr(_local, 'pendientes', None)
+        if pendientes is None:
+            pendientes = _local.pendientes = set()
+        pendientes.update(claves)
+        transaction.on_commit(self._confirmar, robust=True)
+
+    def _confirmar(self):
+        """Agrega las claves confirmadas y avisa sus posiciones a los demás procesos"""
+        claves = getattr(_local, 'pendientes', None)
+        if not claves:
+            return
+        _local.pendientes = set()
+        try:
+            self._agregar_y_avisar(claves)
+        except Exception as e:
+            logger.warning(f'No se pudo actualizar el filtro de Bloom, se invalida: {e}')
+            self.invalidar()
+
+    def _agregar_y_avisar(self, claves):
+        if self.filtro() is None:
+            return
+        with self._lock:
+            if self._filtro is None:
+                return
+            version = self._version
+            posiciones = set()
+            for clave in claves:
+                posiciones.update(self._filtro.agregar(clave))
+        if len(posiciones) > MAXIMO_POSICIONES_AVISO:
+            bus.publicar('bloom')
+        else:
+            bus.publicar('bloom', [f'{version}:{posicion}' for posicion in posiciones])
+
+    def aplicar(self, claves):
+        """
+        Marca las posiciones avisadas por otro proceso
+
+        Si vienen de otra versión de la base (o se pide descartar todo) se
+        descarta la copia: la próxima consulta la recarga y se pone al día
+        desde la base
+        """
+        with self._lock:
+            if self._filtro is None or claves is None:
+                self._filtro = None
+                self._version = None
+                return
+            posiciones = []
+            for clave in claves:
+                version, _, posicion = clave.rpartition(':')
+                if version != self._version:
+                    self._filtro = None
+                    self._version = None
+                    return
+                posiciones.append(int(posicion))
+            for posicion in posiciones:
+                self._filtro.marcar(posicion)
+
+    def invalidar(self):
+        with self._lock:
+            self._filtro = None
+            self._version = None
+
+
+class _AlmacenArchivo:
+    """
+    Bits en un archivo mapeado en memoria (MAP_SHARED)
+    Las altas de cualquier proceso se ven al instante en los demás
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._filtro = None
+        self._archivo = None
+        self._inodo = None
+        self._lock = threading.Lock()
+
+    def filtro(self):
+        try:
+            inodo = os.stat(self.ruta).st_ino
+        except FileNotFoundError:
+            return None
+        if inodo != self._inodo:
+            # Primera vez, o reconstruir_bloom reemplazó el archivo
+            with self._lock:
+                archivo = open(self.ruta, 'r+b')
+                mapa = mmap.mmap(archivo.fileno(), 0)
+                self._filtro = FiltroBloom.desde_buffer(mapa)
+                if self._archivo:
+                    self._archivo.close()
+                self._archivo = archivo
+                self._inodo = inodo
+        return self._filtro
+
+    def reemplazar(self, filtro, desde):
+        # Se escribe aparte y se renombra: los lectores nunca ven un archivo a medias
+        directorio = os.path.dirname(os.path.abspath(self.ruta))
+        os.makedirs(directorio, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directorio, delete=False) as temporal:
+            temporal.write(filtro.serializar())
+        os.chmod(temporal.name, 0o644)
+        os.replace(temporal.name, self.ruta)
+
+    def agregar(self, claves):
+        import fcntl  # Solo POSIX: el modo 'archivo' no está disponible en Windows
+
+        filtro = self.filtro()
+        if filtro is None:
+            return
+        # flock: dos procesos que tocan el mismo byte no se pisan los bits
+        fcntl.flock(self._archivo, fcntl.LOCK_EX)
+        try:
+            for clave in claves:
+                filtro.agregar(clave)
+        finally:
+            fcntl.flock(self._archivo, fcntl.LOCK_UN)
+
+    def invalidar(self):
+        try:
+            os.remove(self.ruta)
+        except FileNotFoundError:
+            pass
+
+
+_almacenes = {}
+
+
+def _almacen():
+    """Almacén configurado en settings.BLOOM_USUARIOS (None si está desactivado)"""
+    modo = getattr(settings, 'BLOOM_USUARIOS', 'off')
+    if modo not in ('cache', 'archivo'):
+        return None
+    if modo not in _almacenes:
+        _almacenes[modo] = (
+            _AlmacenArchivo(settings.BLOOM_USUARIOS_ARCHIVO) if modo == 'archivo'
+            else _AlmacenCache()
+        )
+    return _almacenes[modo]
+
+
+@bus.manejador('bloom')
+def _aplicar_aviso(claves):
+    almacen = _almacenes.get('cache')
+    if almacen is not None:
+        almacen.aplicar(claves)
+
+
+# ==================== API ====================
+
+def _puede_existir(clave):
+    if clave is None:
+        return False
+    almacen = _almacen()
+    if almacen is None:
+        return True
+    try:
+        filtro = almacen.filtro()
+    except Exception as e:
+        logger.warning(f'No se pudo leer el filtro de Bloom: {e}')
+        return True
+    return filtro is None or clave in filtro
+
+
+def email_puede_existir(email):
+    """
+    False si el email seguro no está registrado (Usuario ni auth_user)
+    True si tal vez: hay que hacer la consulta exacta
+    """
+    return _puede_existir(clave_email(email))
+
+
+def telefono_puede_existir(telefono):
+    """
+    False si el teléfono seguro no está registrado
+    True si tal vez: hay que hacer la consulta exacta
+    """
+    return _puede_existir(clave_telefono(telefono))
+
+
+def registrar(claves):
+    """
+    Agrega claves al filtro (desde las señales post_save)
+    En modo 'archivo' se agregan enseguida: si la transacción se revierte
+    solo queda un falso positivo. En modo 'cache' se agregan y se avisan
+    al confirmarla
+    """
+    almacen = _almacen()
+    if almacen is None or not claves:
+        return
+    try:
+        filtro = almacen.filtro()
+        if filtro is None or all(clave in filtro for clave in claves):
+            # Sin filtro no hay nada que actualizar; si ya estaban (lo normal
+            # al editar sin cambiar email ni teléfono) no se escribe ni se avisa
+            return
+        almacen.agregar(claves)
+    except Exception as e:
+        logger.warning(f'No se pudo actualizar el filtro de Bloom, se invalida: {e}')
+        almacen.invalidar()
+
+
+def _claves_desde(usuarios, users):
+    for email, digitos in usuarios.values_list('email', 'telefono_digitos').iterator(chunk_size=5000):
+        yield clave_email(email)
+        if digitos:
+            yield f'tel:{digitos}'
+    for email in users.exclude(email='').values_list('email', flat=True).iterator(chunk_size=5000):
+        yield clave_email(email)
+
+
+def reconstruir():
+    """
+    Reconstruye el filtro completo desde la base y lo publica
+
+    Las altas que llegan mientras se recorre la base se vuelven a
+    agregar al final (Usuario.updated_at / User.date_joined, con
+    MARGEN_AL_DIA), para no perder las que se registraron en el filtro
+    anterior
+
+    Returns:
+        tuple (cantidad de claves, bytes del filtro)
+    """
+    almacen = _almacen()
+    if almacen is None:
+        raise RuntimeError('El filtro de Bloom está desactivado (settings.BLOOM_USUARIOS)')
+
+    inicio = time.time()
+    desde = timezone.now()
+
+    total = Usuario.objects.count() * 2 + User.objects.count()
+    filtro = FiltroBloom.nuevo(max(total * FACTOR_CAPACIDAD, CAPACIDAD_MINIMA))
+    cantidad = 0
+    for clave in _claves_desde(Usuario.objects.all(), User.objects.all()):
+        filtro.agregar(clave)
+        cantidad += 1
+
+    almacen.reemplazar(filtro, desde)
+    registrar(list(_claves_desde(
+        Usuario.objects.filter(updated_at__gte=desde - MARGEN_AL_DIA),
+        User.objects.filter(date_joined__gte=desde - MARGEN_AL_DIA),
+    )))
+
+    logger.info(f'Filtro de Bloom reconstruido: {cantidad} claves en {time.time() - inicio:.2f}s')
+    return cantidad, len(filtro.bits)
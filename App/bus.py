@@ -0,0 +1,225 @@
+# App/bus.py
+"""
+Bus de invalidación entre procesos con LISTEN/NOTIFY de PostgreSQL
+
+Las cachés de cada proceso (el L1 de App/cache_niveles.py, el índice en
+memoria, el mapa de categorías) no se enteran de lo que escriben los
+demás procesos. Con settings.INVALIDACION_BUS, quien invalida
+algo en su proceso lo publica en el canal settings.INVALIDACION_CANAL y
+cada proceso del servidor tiene un hilo que escucha el canal y descarta
+lo mismo en su memoria.
+
+- Cada módulo registra con @bus.manejador(tema) la función que descarta lo
+  suyo en este proceso; recibe la lista de claves publicadas, o None si
+  hay que descartar todo (también después de reconectar, porque los
+  avisos de mientras tanto se perdieron)
+- publicar() dentro de una transacción acumula los avisos y los manda
+  juntos al confirmar: así los demás procesos no recargan datos viejos y
+  una importación no manda un aviso por fila
+- Es "como mucho una vez": las cachés conservan sus timeouts y recargas
+  periódicas como red de seguridad
+"""
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Máximo de bytes por aviso (PostgreSQL admite hasta 8000)
+LIMITE_PAYLOAD = 7000
+
+# Segundos entre reintentos si se cae la conexión de escucha
+ESPERA_RECONEXION = 5
+
+_TOKEN = uuid.uuid4().hex[:8]
+
+_manejadores = {}
+_local = threading.local()
+_lock = threading.Lock()
+_escucha = None
+
+
+def _origen():
+    # Con el pid: los procesos hijos de un fork comparten _TOKEN
+    return f'{_TOKEN}:{os.getpid()}'
+
+
+# ==================== PUBLICACIÓN ====================
+
+def manejador(tema):
+    """
+    Decorador: registra la función que descarta en este proceso lo de un tema
+
+    Args:
+        tema: Nombre del tema ('cache', 'version', ...)
+    """
+    def registrar(funcion):
+        _manejadores[tema] = funcion
+        return funcion
+    return registrar
+
+
+def publicar(tema, claves=None):
+    """
+    Avisa a los demás procesos que descarten algo (no hace nada con el bus apagado)
+
+    Args:
+        tema: Tema registrado con @manejador
+        claves: Lista de claves JSON (ids, strings) o None para descartar todo el tema
+    """
+    if not settings.INVALIDACION_BUS:
+        return
+    pendientes = getattr(_local, 'pendientes', None)
+    if pendientes is None:
+        pendientes = _local.pendientes = {}
+    if claves is None:
+        pendientes[tema] = None
+    elif tema not in pendientes:
+        pendientes[tema] = set(claves)
+    elif pendientes[tema] is not None:
+        pendientes[tema].update(claves)
+    # Un callback por llamada: si un savepoint se revierte con el suyo, el
+    # siguiente manda todo igual (a lo sumo se descarta de más)
+    transaction.on_commit(_enviar, robust=True)
+
+
+def _payloads(tema, claves):
+    """Avisos de un tema partidos para no pasar LIMITE_PAYLOAD"""
+    base = {'t': tema, 'o': _origen()}
+    if claves is None:
+        yield json.dumps({**base, 'c': None})
+        return
+    lote, tamano = [], 0
+    for clave in claves:
+        largo = len(json.dumps(clave)) + 1
+        if lote and tamano + largo > LIMITE_PAYLOAD:
+            yield json.dumps({**base, 'c': lote})
+            lote, tamano = [], 0
+        lote.append(clave)
+        tamano += largo
+    if lote:
+        yield json.dumps({**base, 'c': lote})
+
+
+def _enviar():
+    pendientes = getattr(_local, 'pendientes', None)
+    if not pendientes:
+        return
+    _local.pendientes = {}
+    payloads = [
+        payload
+        for tema, claves in pendientes.items()
+        for payload in _payloads(tema, None if claves is None else sorted(claves, key=str))
+    ]
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload',
+            [settings.INVALIDACION_CANAL, payloads],
+        )
+
+
+# ==================== ESCUCHA ====================
+
+def _despachar(payload):
+    try:
+        aviso = json.loads(payload)
+    except ValueError:
+        logger.warning(f'Aviso de invalidación inválido: {payload[:100]}')
+        return
+    if aviso.get('o') == _origen():
+        # Este proceso ya lo descartó al publicarlo
+        return
+    funcion = _manejadores.get(aviso.get('t'))
+    if funcion is None:
+        return
+    try:
+        funcion(aviso.get('c'))
+    except Exception as e:
+        logger.error(f'Error invalidando {aviso.get("t")}: {e}')
+
+
+def _descartar_todo():
+    for tema in list(_manejadores):
+        _despachar(json.dumps({'t': tema, 'c': None}))
+
+
+class _Escucha(threading.Thread):
+    """Hilo que escucha el canal con una conexión propia en autocommit"""
+
+    def __init__(self):
+        super().__init__(name='bus-invalidacion', daemon=True)
+        self.pid = os.getpid()
+        self.detenido = threading.Event()
+        self.conectado = threading.Event()
+
+    def run(self):
+        primera = True
+        while not self.detenido.is_set():
+            conexion = connections.create_connection(DEFAULT_DB_ALIAS)
+            try:
+                conexion.ensure_connection()
+                with conexion.cursor() as cursor:
+                    cursor.execute(f'LISTEN {conexion.ops.quote_name(settings.INVALIDACION_CANAL)}')
+                if not primera:
+                    logger.info('Bus de invalidación reconectado: se descartan las cachés locales')
+                    _descartar_todo()
+                primera = False
+                self.conectado.set()
+                self._escuchar(conexion.connection)
+            except Exception as e:
+                logger.warning(f'Bus de invalidación desconectado: {e}')
+                self.detenido.wait(ESPERA_RECONEXION)
+            finally:
+                self.conectado.clear()
+                conexion.close()
+
+    def _escuchar(self, crudo):
+        while not self.detenido.is_set():
+            # Despierta cada segundo para poder detenerse
+            if select.select([crudo], [], [], 1) == ([], [], []):
+                continue
+            crudo.poll()
+            while crudo.notifies:
+                _despachar(crudo.notifies.pop(0).payload)
+
+
+def iniciar():
+    """
+    Arranca el hilo de escucha de este proceso si no está corriendo
+    Se llama en cada request (App/apps.py): después de un fork el hilo del
+    proceso padre no existe en el hijo y se arranca uno nuevo
+
+    Returns:
+        El hilo de escucha, o None con el bus apagado
+    """
+    global _escucha
+    if not settings.INVALIDACION_BUS:
+        return None
+    if _escucha is not None and _escucha.pid == os.getpid() and _escucha.is_alive():
+        return _escucha
+    with _lock:
+        if _escucha is None or _escucha.pid != os.getpid() or not _escucha.is_alive():
+            _escucha = _Escucha()
+            _escucha.start()
+    return _escucha
+
+
+def asegurar_escucha(**kwargs):
+    """Receptor de request_started"""
+    iniciar()
+
+
+def detener():
+    """Detiene el hilo de escucha de este proceso"""
+    global _escucha
+    with _lock:
+        if _escucha is not None:
+            _escucha.detenido.set()
+            _escucha.join()
+            _escucha = None
@@ -0,0 +1,499 @@
+# App/cache_niveles.py
+"""
+Caché en dos niveles y cálculo sin estampida
+
+CacheNiveles es un backend de caché de Django:
+- L1: LRU acotado en la memoria del proceso (OPTIONS L1_ENTRADAS), con
+  entradas que duran a lo sumo OPTIONS L1_TIMEOUT segundos
+- L2: otra caché de settings.CACHES (LOCATION es su alias), compartida
+  por los procesos: archivo, base de datos o Redis
+
+Las lecturas van primero a L1; las escrituras van a los dos niveles. Lo
+que un proceso escribe o borra se avisa por el bus de invalidación
+(App/bus.py) para que los demás lo saquen de su L1; sin bus, L1_TIMEOUT
+acota cuánto puede durar un valor viejo.
+
+Los locks no pasan por L1: van a la caché 'coordinacion'
+(settings.CACHE_COORDINACION), que tiene add() atómico entre procesos
+(base de datos o Redis; FileBasedCache no lo tiene). Las versiones
+(version() / cambiar_version()) viven ahí también, pero cada proceso
+guarda la que leyó: con el bus de invalidación se descarta al llegar el
+aviso del cambio (VERSION_L1_CON_BUS es solo la red de seguridad); sin
+bus dura VERSION_L1_SIN_BUS segundos. Leer una versión no consulta la
+caché compartida salvo en esos vencimientos.
+
+obtener() / aobtener() calculan valores caros (dashboard, conteos) sin
+que todos los procesos los recalculen a la vez cuando vencen:
+- Si falta la clave, un solo proceso la calcula (lock con add() en la
+  caché de coordinación) y los demás esperan el resultado
+- Antes de vencer, cada lectura tiene una probabilidad creciente de
+  recalcularla mientras los demás siguen usando el valor vigente
+  (refresco anticipado probabilístico, "XFetch")
+"""
+import asyncio
+import math
+import pickle
+import random
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache as cache_defecto, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+from . import bus
+
+
+# ==================== BACKEND EN DOS NIVELES ====================
+
+_instancias = weakref.WeakSet()
+
+
+class CacheNiveles(BaseCache):
+    """
+    Backend de caché: LRU por proceso delante de una caché compartida
+
+    Ejemplo en settings.CACHES:
+        'default': {
+            'BACKEND': 'App.cache_niveles.CacheNiveles',
+            'LOCATION': 'compartida',
+            'OPTIONS': {'L1_ENTRADAS': 1000, 'L1_TIMEOUT': 5},
+        }
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        opciones = params.get('OPTIONS', {})
+        self._alias_l2 = location
+        self._l1_entradas = int(opciones.get('L1_ENTRADAS', 1000))
+        self._l1_timeout = float(opciones.get('L1_TIMEOUT', 5))
+        # clave -> (valor serializado, vencimiento en time.time())
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        _instancias.add(self)
+
+    @cached_property
+    def l2(self):
+        return caches[self._alias_l2]
+
+    def _timeout(self, timeout):
+        # El timeout por defecto es el de este backend, no el de L2
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    # ---------- L1 ----------
+
+    def _l1_leer(self, clave):
+        with self._lock:
+            entrada = self._l1.get(clave)
+            if entrada is None:
+                return self._missing_key
+            serializado, vence = entrada
+            if vence <= time.time():
+                del self._l1[clave]
+                return self._missing_key
+            self._l1.move_to_end(clave)
+        # Se guarda serializado (como LocMemCache): quien modifique el
+        # valor devuelto no modifica la copia en caché
+        return pickle.loads(serializado)
+
+    def _l1_guardar(self, clave, valor, timeout):
+        if timeout is not None and timeout <= 0:
+            self._l1_descartar([clave])
+            return
+        vence = time.time() + (self._l1_timeout if timeout is None else min(timeout, self._l1_timeout))
+        serializado = pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1[clave] = (serializado, vence)
+            self._l1.move_to_end(clave)
+            while len(self._l1) > self._l1_entradas:
+                self._l1.popitem(last=False)
+
+    def _l1_descartar(self, claves):
+        with self._lock:
+            for clave in claves:
+                self._l1.pop(clave, None)
+
+    def _avisar(self, claves):
+        # Los demás procesos sacan estas claves de su L1
+        bus.publicar('cache', list(claves))
+
+    # ---------- API de BaseCache ----------
+
+    def get(self, key, default=None, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        valor = self._l1_leer(clave)
+        if valor is not self._missing_key:
+            return valor
+        valor = self.l2.get(key, self._missing_key, version=version)
+        if valor is self._missing_key:
+            return default
+        self._l1_guardar(clave, valor, None)
+        return valor
+
+    def get_many(self, keys, version=None):
+        resultado = {}
+        faltantes = []
+        for key in keys:
+            valor = self._l1_leer(self.make_and_validate_key(key, version=version))
+            if valor is self._missing_key:
+                faltantes.append(key)
+            else:
+                resultado[key] = valor
+        if faltantes:
+            desde_l2 = self.l2.get_many(faltantes, version=version)
+            for key, valor in desde_l2.items():
+                self._l1_guardar(self.make_key(key, version=version), valor, None)
+            resultado.update(desde_l2)
+        return resultado
+
+    def has_key(self, key, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        if self._l1_leer(clave) is not self._missing_key:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        self.l2.set(key, value, timeout, version=version)
+        self._l1_guardar(clave, value, timeout)
+        self._avisar([clave])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        fallidas = self.l2.set_many(data, timeout, version=version)
+        claves = []
+        for key, valor in data.items():
+            clave = self.make_and_validate_key(key, version=version)
+            claves.append(clave)
+            if key in fallidas:
+                self._l1_descartar([clave])
+            else:
+                self._l1_guardar(clave, valor, timeout)
+        self._avisar(claves)
+        return fallidas
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        timeout = self._timeout(timeout)
+        if self.l2.add(key, value, timeout, version=version):
+            self._l1_guardar(clave, value, timeout)
+            self._avisar([clave])
+            return True
+        # Otro proceso la tiene: la copia local puede estar vieja
+        self._l1_descartar([clave])
+        return False
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        self._l1_descartar([clave])
+        return self.l2.touch(key, self._timeout(timeout), version=version)
+
+    def incr(self, key, delta=1, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        # En L2: con Redis el incremento es atómico entre procesos
+        valor = self.l2.incr(key, delta, version=version)
+        self._l1_descartar([clave])
+        self._avisar([clave])
+        return valor
+
+    def delete(self, key, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        self._l1_descartar([clave])
+        borrada = self.l2.delete(key, version=version)
+        self._avisar([clave])
+        return borrada
+
+    def delete_many(self, keys, version=None):
+        claves = [self.make_and_validate_key(key, version=version) for key in keys]
+        self._l1_descartar(claves)
+        self.l2.delete_many(keys, version=version)
+        self._avisar(claves)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.l2.clear()
+        bus.publicar('cache')
+
+
+@bus.manejador('cache')
+def _descartar_l1(claves):
+    """Saca de L1 las claves que cambió otro proceso (None: vacía L1)"""
+    for instancia in list(_instancias):
+        if claves is None:
+            with instancia._lock:
+                instancia._l1.clear()
+        else:
+            instancia._l1_descartar(claves)
+
+
+# ==================== VERSIONES Y LOCKS ====================
+
+def coordinacion():
+    """
+    Caché para versiones, locks y el filtro de Bloom: sin L1 y con add()
+    atómico entre procesos (settings.CACHE_COORDINACION)
+    En vistas async usar solo su API async (aget, aadd, ...)
+    """
+    return caches['coordinacion']
+
+
+# Segundos que un proceso usa la versión que leyó sin volver a consultarla
+VERSION_L1_CON_BUS = 60
+VERSION_L1_SIN_BUS = 5
+
+# clave -> (versión, vencimiento en time.monotonic())
+_versiones = {}
+_versiones_lock = threading.Lock()
+
+
+def _nueva_version():
+    return uuid.uuid4().hex[:12]
+
+
+def _version_local(clave):
+    entrada = _versiones.get(clave)
+    if entrada is None or entrada[1] <= time.monotonic():
+        return None
+    return entrada[0]
+
+
+def _guardar_version_local(clave, valor):
+    duracion = VERSION_L1_CON_BUS if settings.INVALIDACION_BUS else VERSION_L1_SIN_BUS
+    with _versiones_lock:
+        _versiones[clave] = (valor, time.monotonic() + duracion)
+
+
+@bus.manejador('version')
+def _descartar_versiones(claves):
+    """Olvida las versiones que cambió otro proceso (None: todas)"""
+    with _versiones_lock:
+        if claves is None:
+            _versiones.clear()
+        else:
+            for clave in claves:
+                _versiones.pop(clave, None)
+
+
+def version(clave):
+    """
+    Versión vigente de algo cacheado (se crea si no existe)
+    Desde la memoria del proceso; la caché de coordinación se consulta
+    solo la primera vez o al vencer la copia local
+
+    Args:
+        clave: Clave de la versión ('dashboard:version', ...)
+
+    Returns:
+        str que cambia cada vez que se llama a cambiar_version()
+    """
+    valor = _version_local(clave)
+    if valor is None:
+        cache = coordinacion()
+        valor = cache.get(clave)
+        if valor is None:
+            cache.add(clave, _nueva_version(), None)
+            valor = cache.get(clave)
+        _guardar_version_local(clave, valor)
+    return valor
+
+
+async def aversion(clave):
+    """Versión async de version()"""
+    valor = _version_local(clave)
+    if valor is None:
+        cache = coordinacion()
+        valor = await cache.aget(clave)
+        if valor is None:
+            await cache.aadd(clave, _nueva_version(), None)
+            valor = await cache.aget(clave)
+        _guardar_version_local(clave, valor)
+    return valor
+
+
+def cambiar_version(clave):
+    """
+    Cambia una versión: lo cacheado con la anterior deja de usarse
+    No se incrementa: con DatabaseCache incr() no es atómico y dos
+    procesos podrían dejar el mismo número; un valor nuevo al azar no
+    pierde ningún cambio
+
+    Este proceso la ve al instante; los demás al recibir el aviso del bus
+    (o al vencer su copia local si el bus está apagado)
+    """
+    valor = _nueva_version()
+    coordinacion().set(clave, valor, None)
+    _guardar_version_local(clave, valor)
+    bus.publicar('version', [clave])
+
+
+# ==================== CÁLCULO SIN ESTAMPIDA ====================
+
+# Cuánto espera un proceso a que otro termine de calcular la misma clave
+# antes de calcularla él mismo
+ESPERA_CALCULO = 2.0
+INTERVALO_ESPERA = 0.05
+
+# Mayor BETA: refresco anticipado más temprano (1 es lo habitual en XFetch)
+BETA = 1.0
+
+# Valor guardado junto con lo que tardó en calcularse y su vencimiento
+_Sobre = namedtuple('_Sobre', ['valor', 'costo', 'vence'])
+
+
+def _clave_lock(clave):
+    return f'{clave}:calculando'
+
+
+def _vigente(sobre):
+    """
+    True si el valor se puede usar sin recalcular
+    Cuanto más cerca del vencimiento y más caro el cálculo, más probable
+    es que esta lectura lo recalcule antes de tiempo
+    """
+    if not isinstance(sobre, _Sobre):
+        return False
+    if sobre.vence is None:
+        return True
+    return time.time() - sobre.costo * BETA * math.log(1 - random.random()) < sobre.vence
+
+
+def _clasificar(calculos, sobres):
+    """
+    Returns:
+        tuple (dict clave -> valor utilizable, lista de claves a recalcular)
+    """
+    datos = {}
+    pendientes = []
+    for clave in calculos:
+        sobre = sobres.get(clave)
+        if isinstance(sobre, _Sobre):
+            # Aunque haya que refrescarla, el valor vigente sirve mientras tanto
+            datos[clave] = sobre.valor
+        if not _vigente(sobre):
+            pendientes.append(clave)
+    return datos, pendientes
+
+
+def _sobre(valor, costo, timeout):
+    return _Sobre(valor, costo, None if timeout is None else time.time() + timeout)
+
+
+def _versiones_compartidas(claves):
+    """Versiones leídas de la caché de coordinación, sin pasar por la memoria del proceso"""
+    return coordinacion().get_many(list(claves)) if claves else {}
+
+
+async def _aversiones_compartidas(claves):
+    return await coordinacion().aget_many(list(claves)) if claves else {}
+
+
+def obtener(calculos, timeout, cache=None, versiones=()):
+    """
+    Valores de varias claves, calculando solo los que faltan o están por vencer
+
+    Args:
+        calculos: dict clave -> función sin argumentos que calcula el valor
+        timeout: Segundos en caché
+        cache: Caché a usar (default: la caché por defecto)
+        versiones: Claves de versión (cambiar_version) que se cambian al
+            invalidar estos valores. Si alguna cambia mientras se calculan,
+            el resultado se devuelve pero no se guarda: pudo leer datos de
+            antes de la invalidación y quedaría en caché hasta el timeout
+
+    Returns:
+        dict clave -> valor
+
+    Las claves se guardan con su costo y vencimiento: leerlas siempre con
+    obtener(), no con cache.get()
+    """
+    cache = cache or cache_defecto
+    locks = coordinacion()
+    datos, pendientes = _clasificar(calculos, cache.get_many(list(calculos)))
+
+    nuevos = {}
+    tomadas = []
+    for clave in pendientes:
+        if locks.add(_clave_lock(clave), 1, ESPERA_CALCULO * 5):
+            tomadas.append(clave)
+        elif clave not in datos:
+            # Otro proceso la está calculando: esperar su resultado
+            limite = time.monotonic() + ESPERA_CALCULO
+            while time.monotonic() < limite:
+                time.sleep(INTERVALO_ESPERA)
+                sobre = cache.get(clave)
+                if isinstance(sobre, _Sobre):
+                    datos[clave] = sobre.valor
+                    break
+            else:
+                tomadas.append(clave)
+        # Si no se tomó el lock y hay valor vigente, otro lo está refrescando
+
+    try:
+        antes = _versiones_compartidas(versiones) if tomadas else None
+        for clave in tomadas:
+            inicio = time.monotonic()
+            valor = calculos[clave]()
+            nuevos[clave] = _sobre(valor, time.monotonic() - inicio, timeout)
+            datos[clave] = valor
+        if nuevos and _versiones_compartidas(versiones) == antes:
+            cache.set_many(nuevos, timeout)
+    finally:
+        if tomadas:
+            locks.delete_many([_clave_lock(clave) for clave in tomadas])
+
+    return datos
+
+
+async def aobtener(calculos, timeout, cache=None, versiones=()):
+    """
+    Versión async de obtener(): los cálculos son funciones que devuelven
+    corrutinas y los de las claves tomadas corren juntos con asyncio.gather
+    """
+    cache = cache or cache_defecto
+    locks = coordinacion()
+    datos, pendientes = _clasificar(calculos, await cache.aget_many(list(calculos)))
+
+    tomadas = []
+    esperadas = []
+    for clave in pendientes:
+        if await locks.aadd(_clave_lock(clave), 1, ESPERA_CALCULO * 5):
+            tomadas.append(clave)
+        elif clave not in datos:
+            esperadas.append(clave)
+
+    async def esperar(clave):
+        limite = time.monotonic() + ESPERA_CALCULO
+        while time.monotonic() < limite:
+            await asyncio.sleep(INTERVALO_ESPERA)
+            sobre = await cache.aget(clave)
+            if isinstance(sobre, _Sobre):
+                return sobre.valor
+        return await calcular(clave)
+
+    async def calcular(clave):
+        inicio = time.monotonic()
+        valor = await calculos[clave]()
+        nuevos[clave] = _sobre(valor, time.monotonic() - inicio, timeout)
+        return valor
+
+    nuevos = {}
+    try:
+        antes = await _aversiones_compartidas(versiones) if tomadas else None
+        valores = await asyncio.gather(
+            *(calcular(clave) for clave in tomadas),
+            *(esperar(clave) for clave in esperadas),
+        )
+        datos.update(zip(tomadas + esperadas, valores))
+        if nuevos and await _aversiones_compartidas(versiones) == antes:
+            await cache.aset_many(nuevos, timeout)
+    finally:
+        if tomadas:
+            await locks.adelete_many([_clave_lock(clave) for clave in tomadas])
+
+    return datos
@@ -0,0 +1,137 @@
+# App/categorias.py
+"""
+Mapa en memoria de Categoria (nombre <-> id)
+
+Categoria es una tabla chica de referencia: se carga entera una vez por
+proceso y se resuelve sin consultar la base. Las señales post_save y
+post_delete de Categoria (App/signals.py) la invalidan cambiando una
+versión compartida (cache_niveles.cambiar_version).
+
+Cada búsqueda compara esa versión, pero cache_niveles la guarda en la
+memoria del proceso y el bus (App/bus.py) avisa a los demás cuando
+cambia, así que en régimen una búsqueda no hace ninguna consulta.
+"""
+import threading
+
+from .models import Categoria
+from . import cache_niveles
+from . import diferido
+
+
+CLAVE_VERSION = 'categorias:version'
+
+_lock = threading.Lock()
+_mapa = {'version': None, 'por_id': None, 'por_nombre': None}
+
+
+def _normalizar(nombre):
+    """Los nombres se comparan sin mayúsculas ni espacios en los extremos"""
+    return nombre.strip().lower() if nombre else ''
+
+
+def _cargado():
+    """
+    Mapas vigentes, cargándolos si no están o si otro proceso los invalidó
+    Una sola consulta para toda la tabla
+
+    Returns:
+        tuple (dict id -> nombre, dict nombre normalizado -> id)
+    """
+    version = cache_niveles.version(CLAVE_VERSION)
+    if _mapa['por_id'] is None or _mapa['version'] != version:
+        with _lock:
+            if _mapa['por_id'] is None or _mapa['version'] != version:
+                filas = list(Categoria.objects.values_list('id', 'name'))
+                por_nombre = {}
+                for pk, nombre in sorted(filas):
+                    # Con nombres repetidos gana el id más bajo
+                    por_nombre.setdefault(_normalizar(nombre), pk)
+                _mapa.update(version=version, por_id=dict(filas), por_nombre=por_nombre)
+    return _mapa['por_id'], _mapa['por_nombre']
+
+
+# ==================== LECTURA ====================
+
+def nombre(categoria_id):
+    """
+    Nombre de una categoría
+
+    Args:
+        categoria_id: ID de la categoría (puede ser None)
+
+    Returns:
+        str o None si no existe
+    """
+    if categoria_id is None:
+        return None
+    por_id, _ = _cargado()
+    return por_id.get(categoria_id)
+
+
+def id_por_nombre(nombre_categoria):
+    """
+    ID de la categoría con ese nombre (sin distinguir mayúsculas)
+
+    Returns:
+        int o None si no existe
+    """
+    _, por_nombre = _cargado()
+    return por_nombre.get(_normalizar(nombre_categoria))
+
+
+def ids_por_nombre(nombres):
+    """
+    Resuelve muchos nombres de una vez (pensado para importaciones)
+
+    Args:
+        nombres: Iterable de nombres
+
+    Returns:
+        dict nombre original -> id, solo con los que existen
+    """
+    _, por_nombre = _cargado()
+    resultado = {}
+    for nombre_categoria in nombres:
+        pk = por_nombre.get(_normalizar(nombre_categoria))
+        if pk is not None:
+            resultado[nombre_categoria] = pk
+    return resultado
+
+
+def opciones():
+    """
+    Categorías para un <select>, ordenadas por nombre
+
+    Returns:
+        list de tuplas (id, nombre)
+    """
+    por_id, _ = _cargado()
+    return sorted(por_id.items(), key=lambda item: (_normalizar(item[1]), item[0]))
+
+
+# ==================== INVALIDACIÓN ====================
+
+def invalidar():
+    """
+    Descarta el mapa de este proceso y cambia la versión compartida
+    Llamar también después de bulk_create/update() sobre Categoria,
+    que no disparan señales
+
+    Dentro de una transacción se aplica al confirmarla: antes, otro
+    proceso recargaría las filas viejas con la versión nueva y las
+    conservaría hasta el próximo cambio
+    """
+    diferido.al_confirmar_una_vez(_invalidar_ahora)
+
+
+def _invalidar_ahora():
+    # El aviso de la versión por el bus basta para que los demás
+    # procesos recarguen el mapa en la próxima búsqueda
+    _descartar()
+    cache_niveles.cambiar_version(CLAVE_VERSION)
+
+
+def _descartar():
+    """Descarta el mapa de este proceso"""
+    with _lock:
+        _mapa.update(version=None, por_id=None, por_nombre=None)
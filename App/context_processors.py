@@ -0,0 +1,94 @@
+# App/context_processors.py
+"""
+Context processors propios
+Registrados en TEMPLATES['OPTIONS']['context_processors'] (settings.py)
+"""
+import asyncio
+import hashlib
+from functools import lru_cache
+
+from django.template.loader import get_template
+from django.utils.functional import SimpleLazyObject
+
+from . import dashboard
+from . import permisos
+
+
+def obtener_rol(user):
+    """
+    Rol del sistema (UserProfile.role) de un usuario autenticado
+    Sale del snapshot de permisos cacheado (App/permisos.py)
+
+    Args:
+        user: User autenticado
+
+    Returns:
+        str con el rol, 'Employee' si no tiene perfil
+    """
+    return permisos.de(user).rol
+
+
+async def aobtener_rol(user):
+    """Versión async de obtener_rol()"""
+    return (await permisos.ade(user)).rol
+
+
+# Fragmentos de home.html cacheados por una hora que no dependen de los datos
+FRAGMENTOS_ESTATICOS = ('home/hero.html', 'home/cards.html', 'home/scripts.html')
+
+
+@lru_cache(maxsize=None)
+def version_plantillas():
+    """
+    Hash del contenido de FRAGMENTOS_ESTATICOS, calculado una vez por proceso
+    Va en la clave de su {% cache %}: al desplegar otra versión de los
+    templates (o del JS de scripts.html) no se sirven los fragmentos viejos
+    """
+    contenido = hashlib.md5()
+    for nombre in FRAGMENTOS_ESTATICOS:
+        contenido.update(get_template(nombre).template.source.encode())
+    return contenido.hexdigest()[:12]
+
+
+def dashboard_context(request):
+    """
+    Datos que usan los fragmentos cacheados de home.html
+
+    Todo es perezoso: si los fragmentos están en caché, las estadísticas
+    ni el rol llegan a consultarse. mis_importaciones (la parte que no se
+    cachea) lee solo la clave de este usuario.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'version_plantillas': version_plantillas()}
+
+    return {
+        'user_role': SimpleLazyObject(lambda: obtener_rol(user)),
+        'dashboard_version': SimpleLazyObject(dashboard.version_datos),
+        'version_plantillas': version_plantillas(),
+        'estadisticas': SimpleLazyObject(lambda: dashboard.obtener_estadisticas(user)),
+        'mis_importaciones': SimpleLazyObject(lambda: dashboard.obtener_importaciones_recientes(user)),
+    }
+
+
+async def adashboard_context(user):
+    """
+    Mismos datos que dashboard_context() pero ya resueltos, para las vistas
+    async: en el event loop el template no puede consultar la base de forma
+    perezosa. La vista los agrega a su contexto y tapan a los perezosos.
+
+    Args:
+        user: User autenticado (ya resuelto con request.auser())
+    """
+    user_role, dashboard_version, estadisticas = await asyncio.gather(
+        aobtener_rol(user),
+        dashboard.aversion_datos(),
+        dashboard.aobtener_estadisticas(user),
+    )
+    return {
+        'user_role': user_role,
+        'dashboard_version': dashboard_version,
+        'version_plantillas': version_plantillas(),
+        'estadisticas': estadisticas,
+        'mis_importaciones': estadisticas['recent_imports'],
+    }
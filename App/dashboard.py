@@ -0,0 +1,212 @@
+# App/dashboard.py
+"""
+Estadísticas del dashboard (home) servidas desde caché
+
+Los conteos se leen del resumen diario (App/resumen.py), no de App_usuario.
+Los agregados se calculan una sola vez y quedan en caché hasta que
+una señal post_save/post_delete de Usuario o ImportAudit los invalida
+(ver App/signals.py). En estado estable el home no ejecuta agregados.
+"""
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Usuario, ImportAudit
+from . import cache_niveles
+from . import diferido
+from . import resumen
+
+
+# ==================== CLAVES DE CACHÉ ====================
+
+CLAVE_VERSION = 'dashboard:version'
+CLAVE_TOTAL_ACTIVOS = 'dashboard:total_activos'
+CLAVE_TOTAL_REGISTROS = 'dashboard:total_registros'
+CLAVE_USUARIOS_HOY = 'dashboard:usuarios_hoy:{fecha}'
+CLAVE_USUARIOS_RECIENTES = 'dashboard:usuarios_recientes'
+CLAVE_IMPORTS_RECIENTES = 'dashboard:imports_recientes:{user_id}'
+CLAVE_VERSION_IMPORTS = 'dashboard:imports_recientes:{user_id}:version'
+
+# Red de seguridad: aunque falle una invalidación, el dato se refresca
+TIMEOUT_ESTADISTICAS = 60 * 10  # 10 minutos
+
+
+# ==================== CÁLCULO ====================
+
+def version_datos():
+    """
+    Número de versión de los datos del dashboard
+    Se usa como clave de los fragmentos cacheados de home.html: al
+    invalidar las estadísticas cambia y los fragmentos viejos dejan de usarse
+    """
+    return cache_niveles.version(CLAVE_VERSION)
+
+
+def _claves(user):
+    """Claves de caché del dashboard para un usuario, en el orden de _armar()"""
+    return [
+        CLAVE_TOTAL_ACTIVOS,
+        CLAVE_TOTAL_REGISTROS,
+        CLAVE_USUARIOS_HOY.format(fecha=timezone.localdate().isoformat()),
+        CLAVE_USUARIOS_RECIENTES,
+        CLAVE_IMPORTS_RECIENTES.format(user_id=user.pk),
+    ]
+
+
+def _versiones(user):
+    """
+    Versiones que cambian al invalidar las claves de _claves(): un cálculo
+    que empezó antes de la invalidación no guarda su resultado
+    """
+    return [CLAVE_VERSION, CLAVE_VERSION_IMPORTS.format(user_id=user.pk)]
+
+
+def _usuarios_recientes():
+    # Últimos 10 usuarios creados
+    return (
+        Usuario.objects.filter(is_active=True)
+        .select_related('categoria')
+        .order_by('-created_at')[:10]
+    )
+
+
+def _imports_recientes(user):
+    # Últimas 5 importaciones del usuario
+    return ImportAudit.objects.filter(user=user).order_by('-uploaded_at')[:5]
+
+
+def _armar(claves, datos):
+    total_activos, total_registros, hoy, recientes, imports = claves
+    return {
+        'total_usuarios': datos[total_activos],
+        'total_registros': datos[total_registros],
+        'usuarios_hoy': datos[hoy],
+        'recent_imports': datos[imports],
+        'usuarios_recientes': datos[recientes],
+    }
+
+
+def obtener_estadisticas(user):
+    """
+    Devuelve los datos del dashboard, calculando solo lo que no está en caché
+    Cuando una clave vence la recalcula un solo proceso (App/cache_niveles.py)
+
+    Args:
+        user: User autenticado (para sus importaciones recientes)
+
+    Returns:
+        dict con total_usuarios, total_registros, usuarios_hoy,
+        recent_imports y usuarios_recientes
+    """
+    claves = _claves(user)
+    clave_activos, clave_registros, clave_hoy, clave_recientes, clave_imports = claves
+    calculos = {
+        clave_activos: resumen.total_activos,
+        clave_registros: resumen.total_registros,
+        clave_hoy: lambda: resumen.creados_en(timezone.localdate()),
+        clave_recientes: lambda: list(_usuarios_recientes()),
+        clave_imports: lambda: list(_imports_recientes(user)),
+    }
+
+    return _armar(claves, cache_niveles.obtener(
+        calculos, TIMEOUT_ESTADISTICAS, versiones=_versiones(user)
+    ))
+
+
+async def aobtener_estadisticas(user):
+    """
+    Versión async de obtener_estadisticas()
+    Las consultas de las claves que faltan en caché se lanzan juntas
+    con asyncio.gather en vez de una tras otra
+
+    Args:
+        user: User autenticado (ya resuelto con request.auser())
+    """
+    claves = _claves(user)
+    clave_activos, clave_registros, clave_hoy, clave_recientes, clave_imports = claves
+    calculos = {
+        clave_activos: resumen.atotal_activos,
+        clave_registros: resumen.atotal_registros,
+        clave_hoy: lambda: resumen.acreados_en(timezone.localdate()),
+        clave_recientes: lambda: _alistar(_usuarios_recientes()),
+        clave_imports: lambda: _alistar(_imports_recientes(user)),
+    }
+
+    return _armar(claves, await cache_niveles.aobtener(
+        calculos, TIMEOUT_ESTADISTICAS, versiones=_versiones(user)
+    ))
+
+
+def obtener_importaciones_recientes(user):
+    """
+    Solo las importaciones recientes de un usuario (la parte de home.html
+    que no se cachea): no toca las demás claves del dashboard
+
+    Args:
+        user: User autenticado
+
+    Returns:
+        list de ImportAudit
+    """
+    clave = CLAVE_IMPORTS_RECIENTES.format(user_id=user.pk)
+    calculos = {clave: lambda: list(_imports_recientes(user))}
+    versiones = [CLAVE_VERSION_IMPORTS.format(user_id=user.pk)]
+    return cache_niveles.obtener(calculos, TIMEOUT_ESTADISTICAS, versiones=versiones)[clave]
+
+
+async def aobtener_importaciones_recientes(user):
+    """Versión async de obtener_importaciones_recientes()"""
+    clave = CLAVE_IMPORTS_RECIENTES.format(user_id=user.pk)
+    calculos = {clave: lambda: _alistar(_imports_recientes(user))}
+    versiones = [CLAVE_VERSION_IMPORTS.format(user_id=user.pk)]
+    return (await cache_niveles.aobtener(calculos, TIMEOUT_ESTADISTICAS, versiones=versiones))[clave]
+
+
+async def aversion_datos():
+    """Versión async de version_datos()"""
+    return await cache_niveles.aversion(CLAVE_VERSION)
+
+
+async def _alistar(queryset):
+    return [objeto async for objeto in queryset]
+
+
+# ==================== INVALIDACIÓN ====================
+
+def invalidar_estadisticas_usuarios():
+    """
+    Descarta los agregados que dependen de la tabla de usuarios
+    y cambia la versión de datos de los fragmentos de home.html
+
+    Dentro de una transacción se aplica una sola vez, al confirmarla:
+    antes, otro request volvería a cachear los datos viejos
+    """
+    diferido.al_confirmar_una_vez(_descartar_estadisticas_usuarios)
+
+
+def _descartar_estadisticas_usuarios():
+    clave_hoy = CLAVE_USUARIOS_HOY.format(fecha=timezone.localdate().isoformat())
+    cache.delete_many([
+        CLAVE_TOTAL_ACTIVOS, CLAVE_TOTAL_REGISTROS, clave_hoy, CLAVE_USUARIOS_RECIENTES
+    ])
+    cache_niveles.cambiar_version(CLAVE_VERSION)
+
+
+def invalidar_importaciones_recientes(user_id):
+    """
+    Descarta las importaciones recientes cacheadas de un usuario
+    Dentro de una transacción se aplica al confirmarla, como
+    invalidar_estadisticas_usuarios()
+
+    Args:
+        user_id: ID del User que subió el archivo
+    """
+    if user_id is not None:
+        transaction.on_commit(partial(_descartar_importaciones_recientes, user_id))
+
+
+def _descartar_importaciones_recientes(user_id):
+    cache.delete(CLAVE_IMPORTS_RECIENTES.format(user_id=user_id))
+    cache_niveles.cambiar_version(CLAVE_VERSION_IMPORTS.format(user_id=user_id))
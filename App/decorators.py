@@ -1,8 +1,11 @@
 # App/decorators.py - NUEVO ARCHIVO
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
 from functools import wraps
 
+from . import permisos
+
 def role_required(role_names):
     """
     Decorador para verificar roles
@@ -18,9 +21,8 @@ def role_required(role_names):
                 messages.warning(request, 'Debes iniciar sesión')
                 return redirect('login')
             
-            user_groups = request.user.groups.values_list('name', flat=True)
-            
-            if any(role in user_groups for role in role_names):
+            # Grupos desde el snapshot cacheado (App/permisos.py), sin consultar la base
+            if permisos.de(request.user).en_grupos(role_names):
                 return view_func(request, *args, **kwargs)
             else:
                 messages.error(request, 'No tienes permisos para acceder a esta sección')
@@ -31,4 +33,22 @@ def role_required(role_names):
 # Decoradores específicos
 admin_required = role_required('Admin')
 manager_required = role_required(['Admin', 'Manager'])
-employee_required = role_required(['Admin', 'Manager', 'Employee'])
\ No newline at end of file
+employee_required = role_required(['Admin', 'Manager', 'Employee'])
+
+
+def login_required_async(view_func):
+    """
+    Equivalente a @login_required para vistas async
+    (en Django 5.0 login_required no acepta corrutinas)
+    
+    Resuelve el usuario con request.auser() y lo deja en request.user,
+    así la vista y el template no lo cargan de forma síncrona
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        request.user = user
+        return await view_func(request, *args, **kwargs)
+    return wrapper
\ No newline at end of file
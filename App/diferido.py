@@ -0,0 +1,123 @@
+# App/diferido.py
+"""
+Escritura diferida de históricos y eventos (UsuarioHistorico, EventoUsuario)
+
+Dentro de `with diferido.agrupar():` las filas que generan las señales de
+Usuario no se insertan una por una: se acumulan y se escriben con un
+bulk_create por modelo al salir del bloque, antes de confirmar la
+transacción. Fuera de un bloque se escriben en el momento, como siempre.
+
+Las filas pendientes se guardan en una lista propia del bloque. Los
+savepoints que pueden revertirse adentro (Usuario.save, cada fila de la
+importación) se abren con diferido.atomico(): si se revierte, descarta
+las filas que se agregaron dentro de él. Si se revierte todo el bloque
+no se escribe nada.
+
+al_confirmar_una_vez() programa una función una sola vez por bloque
+(invalidaciones que piden muchas señales).
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+_local = threading.local()
+
+# Filas por INSERT al volcar
+TAMANO_LOTE = 1000
+
+
+def activo():
+    """True si se está dentro de un bloque agrupar() en este hilo"""
+    return getattr(_local, 'pendientes', None) is not None
+
+
+@contextmanager
+def agrupar():
+    """
+    Bloque atómico que acumula los históricos y eventos y los escribe juntos al final
+
+    Anidado dentro de otro agrupar() es un atomico(): escribe el externo.
+    """
+    if activo():
+        with atomico():
+            yield
+        return
+
+    with transaction.atomic():
+        _local.pendientes, _local.funciones = [], {}
+        try:
+            yield
+            pendientes, funciones = _local.pendientes, list(_local.funciones)
+        finally:
+            _local.pendientes = _local.funciones = None
+        _volcar(pendientes)
+        for funcion in funciones:
+            transaction.on_commit(funcion)
+
+
+@contextmanager
+def atomico():
+    """
+    transaction.atomic() que, si se revierte, descarta también las filas
+    pendientes que se agregaron adentro (fuera de agrupar() es igual a
+    transaction.atomic())
+    """
+    marca = len(_local.pendientes) if activo() else None
+    try:
+        with transaction.atomic():
+            yield
+    except BaseException:
+        if marca is not None and activo():
+            del _local.pendientes[marca:]
+        raise
+
+
+def guardar(objeto):
+    """
+    Escribe una fila, o la deja pendiente si hay un bloque agrupar() activo
+
+    Args:
+        objeto: Instancia sin guardar (UsuarioHistorico, EventoUsuario)
+    """
+    if activo():
+        _local.pendientes.append(objeto)
+    else:
+        _escribir(type(objeto), [objeto])
+
+
+def _volcar(pendientes):
+    """Escribe las filas pendientes con un bulk_create por modelo"""
+    por_modelo = {}
+    for objeto in pendientes:
+        por_modelo.setdefault(type(objeto), []).append(objeto)
+    for modelo, objetos in por_modelo.items():
+        _escribir(modelo, objetos)
+
+
+def _escribir(modelo, objetos):
+    # preparar_lote completa lo que depende de las filas ya guardadas
+    # (la secuencia de UsuarioHistorico); los locks que toma duran hasta
+    # el final de la transacción, que incluye el INSERT
+    with transaction.atomic():
+        preparar = getattr(modelo, 'preparar_lote', None)
+        if preparar is not None:
+            preparar(objetos)
+        modelo.objects.bulk_create(objetos, batch_size=TAMANO_LOTE)
+
+
+# ==================== CALLBACKS ÚNICOS ====================
+
+def al_confirmar_una_vez(funcion):
+    """
+    transaction.on_commit(funcion), una sola vez por bloque agrupar()
+    aunque se pida muchas veces. Si la pidió una fila que después se
+    revirtió igual se ejecuta: son invalidaciones, descartar de más no
+    hace daño
+
+    Fuera de un bloque es transaction.on_commit(funcion)
+    """
+    if activo():
+        _local.funciones[funcion] = None
+    else:
+        transaction.on_commit(funcion)
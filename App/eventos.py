@@ -0,0 +1,165 @@
+# App/eventos.py
+"""
+Lectura del outbox de cambios de usuarios (EventoUsuario)
+
+Los eventos se escriben en la misma transacción que el cambio (alta,
+modificación o eliminación, también en importaciones y operaciones
+masivas). Un consumidor los lee por lotes en orden de (txid, id), los
+entrega a un destino y recién después guarda su offset (ConsumidorEventos):
+si se corta entre una cosa y la otra, el lote se vuelve a entregar. La
+entrega es "al menos una vez"; el id del evento sirve para descartar
+repetidos.
+"""
+import json
+import os
+import sys
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import ConsumidorEventos, EventoUsuario
+
+
+# Transacciones terminadas: toda transacción con txid menor que el xmin del
+# snapshot ya confirmó o se descartó, así que sus eventos no pueden aparecer
+# después de leerlos
+_TRANSACCIONES_TERMINADAS = 'txid_snapshot_xmin(txid_current_snapshot())'
+
+
+# ==================== LECTURA ====================
+
+def leer(consumidor, lote=1000):
+    """
+    Siguiente lote de eventos para un consumidor
+
+    Args:
+        consumidor: ConsumidorEventos
+        lote: Máximo de eventos
+
+    Returns:
+        Lista de dicts (id, txid, usuario_id, tipo, datos, created_at)
+    """
+    return list(
+        EventoUsuario.objects
+        .filter(
+            Q(txid__gt=consumidor.ultimo_txid)
+            | Q(txid=consumidor.ultimo_txid, id__gt=consumidor.ultimo_id)
+        )
+        .filter(txid__lt=RawSQL(_TRANSACCIONES_TERMINADAS, []))
+        .order_by('txid', 'id')
+        .values('id', 'txid', 'usuario_id', 'tipo', 'datos', 'created_at')[:lote]
+    )
+
+
+def confirmar(consumidor, eventos):
+    """
+    Avanza el offset del consumidor hasta el último evento entregado
+    """
+    if not eventos:
+        return
+    ultimo = eventos[-1]
+    consumidor.ultimo_txid = ultimo['txid']
+    consumidor.ultimo_id = ultimo['id']
+    consumidor.save(update_fields=['ultimo_txid', 'ultimo_id', 'updated_at'])
+
+
+def serializar(evento):
+    """Evento como una línea NDJSON (sin el salto de línea)"""
+    return json.dumps(evento, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+# ==================== DESTINOS ====================
+
+class SalidaEstandar:
+    """Escribe los eventos en stdout, una línea JSON por evento"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def escribir(self, eventos):
+        for evento in eventos:
+            self.stream.write(serializar(evento) + '\n')
+        self.stream.flush()
+
+    def cerrar(self):
+        pass
+
+
+class SalidaSegmentos:
+    """
+    Agrega los eventos a segmentos .ndjson de solo-anexar en un directorio
+
+    Los segmentos se numeran (eventos-000001.ndjson, ...) y se abre uno
+    nuevo al superar el tamaño máximo; no se usa el id del primer evento
+    porque el orden de entrega es por transacción, no por id. Cada lote
+    se sincroniza a disco (fsync) antes de que se confirme el offset.
+    """
+
+    def __init__(self, directorio=None, tamano_maximo=None):
+        self.directorio = directorio or settings.EVENTOS_DIRECTORIO
+        self.tamano_maximo = tamano_maximo or settings.EVENTOS_SEGMENTO_BYTES
+        os.makedirs(self.directorio, exist_ok=True)
+        self.archivo = None
+
+    def _ruta(self, numero):
+        return os.path.join(self.directorio, f'eventos-{numero:06d}.ndjson')
+
+    def _ultimo_numero(self):
+        numeros = [
+            int(nombre[len('eventos-'):-len('.ndjson')])
+            for nombre in os.listdir(self.directorio)
+            if nombre.startswith('eventos-') and nombre.endswith('.ndjson')
+        ]
+        return max(numeros, default=0)
+
+    def _abrir(self):
+        if self.archivo is not None:
+            if self.archivo.tell() < self.tamano_maximo:
+                return
+            self.archivo.close()
+        numero = self._ultimo_numero()
+        if not numero or os.path.getsize(self._ruta(numero)) >= self.tamano_maximo:
+            numero += 1
+        self.archivo = open(self._ruta(numero), 'a', encoding='utf-8')
+
+    def escribir(self, eventos):
+        if not eventos:
+            return
+        self._abrir()
+        self.archivo.write(''.join(serializar(evento) + '\n' for evento in eventos))
+        self.archivo.flush()
+        os.fsync(self.archivo.fileno())
+
+    def cerrar(self):
+        if self.archivo is not None:
+            self.archivo.close()
+            self.archivo = None
+
+
+# ==================== CONSUMO ====================
+
+def consumir(nombre, salida, lote=1000):
+    """
+    Entrega todos los eventos pendientes de un consumidor
+
+    Args:
+        nombre: Nombre del consumidor (se crea si no existe)
+        salida: SalidaEstandar o SalidaSegmentos
+        lote: Eventos por lote
+
+    Returns:
+        int: Cantidad de eventos entregados
+    """
+    consumidor, _ = ConsumidorEventos.objects.get_or_create(nombre=nombre)
+    total = 0
+    while True:
+        eventos = leer(consumidor, lote)
+        if not eventos:
+            return total
+        salida.escribir(eventos)
+        confirmar(consumidor, eventos)
+        total += len(eventos)
+        if len(eventos) < lote:
+            return total
@@ -1,5 +1,6 @@
 from django import forms
-from .models import Usuario
+from .models import Usuario, normalizar_telefono
+from . import bloom
 
 class UsuarioForm(forms.ModelForm):
     # Campo de contraseña opcional, ya que solo se debe cambiar si el usuario lo desea.
@@ -25,7 +26,12 @@ class UsuarioForm(forms.ModelForm):
         telefono = self.cleaned_data.get('telefono')
         if telefono:
             # Busca otros usuarios con ese teléfono, excluyendo el usuario actual (instancia)
-            if Usuario.objects.filter(telefono=telefono).exclude(pk=self.instance.pk).exists():
+            # Se compara normalizado para que +569... y 569... sean el mismo número
+            digitos = normalizar_telefono(telefono)
+            # El filtro de Bloom evita la consulta cuando el número seguro no existe
+            if digitos and bloom.telefono_puede_existir(digitos) and Usuario.objects.filter(
+                telefono_digitos=digitos
+            ).exclude(pk=self.instance.pk).exists():
                 raise forms.ValidationError("Este número de teléfono ya está registrado por otro usuario.")
         return telefono
         
@@ -37,7 +43,9 @@ class UsuarioForm(forms.ModelForm):
             # Normalizar el email como lo hace tu modelo antes de buscar
             email_normalized = email.lower().strip()
             # Busca otros usuarios con ese email, excluyendo el usuario actual (instancia)
-            if Usuario.objects.filter(email=email_normalized).exclude(pk=self.instance.pk).exists():
+            if bloom.email_puede_existir(email_normalized) and Usuario.objects.filter(
+                email__lower=email_normalized
+            ).exclude(pk=self.instance.pk).exists():
                 raise forms.ValidationError("Este correo electrónico ya está registrado por otro usuario.")
         return email
 
@@ -0,0 +1,423 @@
+# App/historico.py
+"""
+Lectura del histórico de usuarios (UsuarioHistorico, guardado como deltas)
+
+- estado_en(): cómo era un usuario en un momento dado, con una consulta
+  acotada a INTERVALO_SNAPSHOT filas
+- linea_de_tiempo(): cambios de un usuario del más nuevo al más viejo,
+  paginados por secuencia (índice único usuario + secuencia)
+- archivar(): mueve los cambios viejos a archivos .ndjson.gz en el storage
+  por defecto (retención); las dos lecturas anteriores los consultan solo
+  si se pide con archivo=True, abriendo solo los archivos del usuario
+  según el índice ArchivoHistorico
+"""
+import gzip
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Mod
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ArchivoHistorico, Usuario, UsuarioHistorico
+
+logger = logging.getLogger(__name__)
+
+
+class HistoricoArchivado(Exception):
+    """Lo pedido es anterior al histórico en la base y está en los archivos"""
+
+
+def _tipar(datos):
+    """Los valores del JSON vuelven a su tipo (fechas, enteros) según el campo de Usuario"""
+    tipados = {}
+    for campo, valor in datos.items():
+        try:
+            tipados[campo] = Usuario._meta.get_field(campo).to_python(valor)
+        except (FieldDoesNotExist, ValidationError):
+            tipados[campo] = valor
+    return tipados
+
+
+# ==================== ESTADO EN UN MOMENTO ====================
+
+def _tramo_hasta(usuario_id, momento):
+    """
+    Filas necesarias para reconstruir el estado al momento indicado:
+    desde el último snapshot hasta el último cambio anterior a momento
+
+    Una sola consulta: la subconsulta encuentra la secuencia S del último
+    cambio (índice usuario + modified_at) y el rango va de su snapshot
+    S - (S - 1) % INTERVALO_SNAPSHOT hasta S (índice usuario + secuencia)
+    """
+    historicos = UsuarioHistorico.objects.filter(usuario_id=usuario_id)
+    ultima = Subquery(
+        historicos
+        .filter(modified_at__lte=momento)
+        .order_by('-modified_at', '-secuencia')
+        .values('secuencia')[:1]
+    )
+    desde = ultima - Mod(ultima - 1, UsuarioHistorico.INTERVALO_SNAPSHOT)
+    return list(
+        historicos
+        .filter(secuencia__gte=desde, secuencia__lte=ultima)
+        .order_by('secuencia')
+        .values('secuencia', 'modified_at', 'cambios', 'estado')
+    )
+
+
+def _aplicar(filas):
+    """
+    Estado que resulta de aplicar filas consecutivas (por secuencia)
+    desde un snapshot
+    """
+    datos = {}
+    for fila in filas:
+        if fila['estado'] is not None:
+            datos = dict(fila['estado'])
+        else:
+            datos.update({campo: nuevo for campo, (anterior, nuevo) in fila['cambios'].items()})
+    return datos
+
+
+def _previo_al_primero(primero):
+    """Estado antes del primer cambio: el posterior con sus valores anteriores"""
+    datos = dict(primero['estado'] or {})
+    datos.update({campo: anterior for campo, (anterior, nuevo) in primero['cambios'].items()})
+    return datos
+
+
+def _resultado(fila, datos):
+    # Los históricos convertidos del formato anterior (migración 0018) no
+    # registraban rol, categoria_id ni is_active: hasta el próximo snapshot
+    # esos campos no se conocen. Van en None y listados en desconocidos,
+    # para no confundirlos con un valor vacío ni tomarlos del usuario actual
+    desconocidos = [campo for campo in UsuarioHistorico.CAMPOS if campo not in datos]
+    datos = _tipar({campo: datos.get(campo) for campo in UsuarioHistorico.CAMPOS})
+    if fila is None:
+        return {'secuencia': 0, 'modificado': None, 'datos': datos, 'desconocidos': desconocidos}
+    return {
+        'secuencia': fila['secuencia'], 'modificado': fila['modified_at'],
+        'datos': datos, 'desconocidos': desconocidos,
+    }
+
+
+def estado_en(usuario, momento, archivo=False):
+    """
+    Estado de un usuario en un momento dado
+
+    Args:
+        usuario: Instancia de Usuario
+        momento: datetime con zona horaria
+        archivo: Si el momento es anterior al histórico que queda en la
+            base, buscar en los archivos del usuario
+
+    Returns:
+        dict con secuencia (0 si es anterior a todo cambio), modificado
+        (fecha de ese cambio o None), datos (campos de UsuarioHistorico.CAMPOS)
+        y desconocidos (campos que ese histórico no registraba, en None
+        dentro de datos), o None si el usuario todavía no existía
+
+    Raises:
+        HistoricoArchivado: si hace falta el archivo y archivo es False
+    """
+    if usuario.created_at > momento:
+        return None
+
+    filas = _tramo_hasta(usuario.id, momento)
+    if filas:
+        return _resultado(filas[-1], _aplicar(filas))
+
+    primero = (
+        UsuarioHistorico.objects
+        .filter(usuario_id=usuario.id)
+        .order_by('secuencia')
+        .values('secuencia', 'modified_at', 'cambios', 'estado')
+        .first()
+    )
+    if primero is None:
+        # Sin cambios: el estado actual
+        return _resultado(None, UsuarioHistorico.estado_de(usuario))
+    if primero['secuencia'] == 1:
+        return _resultado(None, _previo_al_primero(primero))
+
+    # Los cambios anteriores a momento ya se archivaron
+    if not archivo:
+        raise HistoricoArchivado(usuario.id)
+    return _estado_desde_archivo(usuario.id, momento)
+
+
+def _estado_desde_archivo(usuario_id, momento):
+    """Misma reconstrucción que estado_en() sobre las filas archivadas"""
+    filas = sorted(filas_archivadas(usuario_id, hasta=momento), key=lambda fila: fila['secuencia'])
+    anteriores = [fila for fila in filas if fila['modified_at'] <= momento]
+    if not anteriores:
+        # Anterior a todo cambio: hace falta el primero, esté en el día que esté
+        todas = sorted(filas_archivadas(usuario_id), key=lambda fila: fila['secuencia'])
+        return _resultado(None, _previo_al_primero(todas[0]) if todas else {})
+
+    ultima = anteriores[-1]
+    desde = ultima['secuencia'] - (ultima['secuencia'] - 1) % UsuarioHistorico.INTERVALO_SNAPSHOT
+    return _resultado(ultima, _aplicar(fila for fila in anteriores if fila['secuencia'] >= desde))
+
+
+# ==================== LÍNEA DE TIEMPO ====================
+
+def linea_de_tiempo(usuario_id, antes=None, limite=50, archivo=False):
+    """
+    Cambios de un usuario, del más nuevo al más viejo
+
+    Args:
+        usuario_id: ID del Usuario
+        antes: Secuencia de la última fila de la página anterior (None = desde el último)
+        limite: Filas por página
+        archivo: Al terminarse el histórico de la base, seguir con los archivos
+
+    Returns:
+        tuple (lista de dicts, secuencia para pedir la página siguiente o None)
+    """
+    historicos = UsuarioHistorico.objects.filter(usuario_id=usuario_id)
+    if antes is not None:
+        historicos = historicos.filter(secuencia__lt=antes)
+
+    # De los snapshots solo interesa saber que lo son: el estado completo no se lee
+    filas = list(
+        historicos
+        .order_by('-secuencia')
+        .annotate(snapshot=ExpressionWrapper(Q(estado__isnull=False), output_field=BooleanField()))
+        .values('secuencia', 'modified_at', 'modified_by__username', 'change_reason', 'cambios', 'snapshot')
+        [:limite + 1]
+    )
+
+    # La base no llegó a la secuencia 1: lo que falta está archivado
+    desde = filas[-1]['secuencia'] if filas else antes
+    if archivo and len(filas) <= limite and desde != 1:
+        archivadas = sorted(
+            (fila for fila in filas_archivadas(usuario_id) if desde is None or fila['secuencia'] < desde),
+            key=lambda fila: -fila['secuencia'],
+        )
+        archivadas = archivadas[:limite + 1 - len(filas)]
+        nombres = dict(
+            User.objects
+            .filter(id__in={fila['modified_by_id'] for fila in archivadas} - {None})
+            .values_list('id', 'username')
+        )
+        filas += [
+            {
+                'secuencia': fila['secuencia'],
+                'modified_at': fila['modified_at'],
+                'modified_by__username': nombres.get(fila['modified_by_id']),
+                'change_reason': fila['change_reason'],
+                'cambios': fila['cambios'],
+                'snapshot': fila['estado'] is not None,
+                'archivado': True,
+            }
+            for fila in archivadas
+        ]
+
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = filas[-1]['secuencia']
+
+    return [
+        {
+            'secuencia': fila['secuencia'],
+            'fecha': fila['modified_at'],
+            'modificado_por': fila['modified_by__username'],
+            'razon': fila['change_reason'],
+            'cambios': fila['cambios'],
+            'snapshot': fila['snapshot'],
+            'archivado': fila.get('archivado', False),
+        }
+        for fila in filas
+    ], siguiente
+
+
+# ==================== ARCHIVO ====================
+# Cada archivo es NDJSON comprimido con gzip, una fila por línea, bajo
+# settings.HISTORICO_ARCHIVO_DIR/AAAA-MM-DD/ según el día de modified_at.
+# Se escribe el archivo y recién después se borran sus filas: si el proceso
+# se corta entre medio, la próxima corrida vuelve a archivarlas y la lectura
+# descarta los duplicados por id. El índice ArchivoHistorico (usuario ->
+# archivos) se guarda en la misma transacción que borra las filas.
+
+COLUMNAS_ARCHIVO = (
+    'id', 'usuario_id', 'secuencia', 'modified_at', 'modified_by_id',
+    'change_reason', 'cambios', 'estado',
+)
+
+
+def archivables(corte):
+    """
+    Filas que se pueden archivar sin romper la reconstrucción: de cada
+    usuario, las anteriores a su último snapshot previo a corte. Así lo
+    que queda en la base siempre empieza en un snapshot (y solo quedan
+    hasta INTERVALO_SNAPSHOT - 1 filas más viejas que corte)
+
+    Args:
+        corte: datetime; se archiva lo modificado antes
+
+    Returns:
+        QuerySet de UsuarioHistorico
+    """
+    ultimo_snapshot = Subquery(
+        UsuarioHistorico.objects
+        .filter(usuario_id=OuterRef('usuario_id'), modified_at__lt=corte, estado__isnull=False)
+        .order_by()
+        .values('usuario_id')
+        .annotate(ultimo=Max('secuencia'))
+        .values('ultimo')
+    )
+    return UsuarioHistorico.objects.filter(modified_at__lt=corte, secuencia__lt=ultimo_snapshot)
+
+
+def _guardar_archivo(dia, filas, sufijo):
+    contenido = b''.join(
+        json.dumps(fila, cls=DjangoJSONEncoder, separators=(',', ':')).encode() + b'\n'
+        for fila in filas
+    )
+    ruta = f'{settings.HISTORICO_ARCHIVO_DIR}/{dia.isoformat()}/historicos-{sufijo}.ndjson.gz'
+    return default_storage.save(ruta, ContentFile(gzip.compress(contenido)))
+
+
+def archivar(dias=None, lote=5000, simular=False):
+    """
+    Mueve a archivos el histórico más viejo que dias y lo borra de la base
+
+    Recorre por id en lotes: cada lote se escribe (un archivo por día) y
+    después se borra con un DELETE por lote en su propia transacción
+
+    Args:
+        dias: Retención en días (por defecto settings.HISTORICO_RETENCION_DIAS)
+        lote: Filas por lote
+        simular: Solo contar lo que se archivaría
+
+    Returns:
+        int: Cantidad de filas archivadas (o a archivar si simular)
+    """
+    dias = settings.HISTORICO_RETENCION_DIAS if dias is None else dias
+    corte = timezone.now() - timedelta(days=dias)
+    pendientes = archivables(corte)
+    if simular:
+        return pendientes.count()
+
+    marca = timezone.now().strftime('%Y%m%dT%H%M%S')
+    total, ultimo_id, numero = 0, 0, 0
+    while True:
+        filas = list(
+            pendientes.filter(id__gt=ultimo_id).order_by('id').values(*COLUMNAS_ARCHIVO)[:lote]
+        )
+        if not filas:
+            break
+        numero += 1
+
+        por_dia = defaultdict(list)
+        for fila in filas:
+            por_dia[timezone.localtime(fila['modified_at']).date()].append(fila)
+        indices = []
+        for dia, filas_dia in por_dia.items():
+            ruta = _guardar_archivo(dia, filas_dia, f'{marca}-{numero:05d}')
+            indices += _indices_archivo(ruta, filas_dia)
+
+        # Sin señales ni relaciones: Django lo resuelve en un solo DELETE
+        ids = [fila['id'] for fila in filas]
+        with transaction.atomic():
+            ArchivoHistorico.objects.bulk_create(indices)
+            UsuarioHistorico.objects.filter(id__in=ids).delete()
+        total += len(filas)
+        ultimo_id = ids[-1]
+        logger.info(f'Histórico archivado: lote {numero}, {len(filas)} filas')
+
+    return total
+
+
+def _indices_archivo(ruta, filas):
+    """Filas de ArchivoHistorico (sin guardar) de un archivo: una por usuario"""
+    por_usuario = defaultdict(list)
+    for fila in filas:
+        por_usuario[fila['usuario_id']].append(fila['modified_at'])
+    return [
+        ArchivoHistorico(
+            usuario_id=usuario_id, ruta=ruta,
+            desde=min(fechas), hasta=max(fechas), filas=len(fechas),
+        )
+        for usuario_id, fechas in por_usuario.items()
+    ]
+
+
+def _leer_archivo(ruta):
+    """Filas de un archivo (modified_at como datetime)"""
+    with default_storage.open(ruta, 'rb') as archivo:
+        for linea in gzip.open(archivo, 'rt', encoding='utf-8'):
+            fila = json.loads(linea)
+            fila['modified_at'] = parse_datetime(fila['modified_at'])
+            yield fila
+
+
+def _dias_archivados():
+    """Carpetas de días del archivo"""
+    try:
+        carpetas, _ = default_storage.listdir(settings.HISTORICO_ARCHIVO_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(filter(None, (parse_date(carpeta) for carpeta in carpetas)))
+
+
+def indexar_archivos():
+    """
+    Reconstruye el índice ArchivoHistorico recorriendo todos los archivos
+    (los escritos antes de que existiera, o si se copiaron a mano).
+    Recorre todo el archivo: se corre desde el comando, nunca en un request
+
+    Returns:
+        int: Cantidad de filas del índice
+    """
+    indices = []
+    for dia in _dias_archivados():
+        carpeta = f'{settings.HISTORICO_ARCHIVO_DIR}/{dia.isoformat()}'
+        _, archivos = default_storage.listdir(carpeta)
+        for nombre in archivos:
+            ruta = f'{carpeta}/{nombre}'
+            indices += _indices_archivo(ruta, _leer_archivo(ruta))
+
+    with transaction.atomic():
+        ArchivoHistorico.objects.all().delete()
+        ArchivoHistorico.objects.bulk_create(indices, batch_size=1000)
+    return len(indices)
+
+
+def filas_archivadas(usuario_id, hasta=None):
+    """
+    Filas archivadas de un usuario, sin duplicados
+
+    Abre solo los archivos que el índice ArchivoHistorico asocia al
+    usuario (y, con hasta, los que tienen cambios anteriores)
+
+    Args:
+        usuario_id: ID del Usuario
+        hasta: datetime opcional; se saltan los archivos con cambios
+            del usuario solo posteriores
+
+    Returns:
+        list de dicts con COLUMNAS_ARCHIVO (modified_at como datetime)
+    """
+    indices = ArchivoHistorico.objects.filter(usuario_id=usuario_id)
+    if hasta is not None:
+        indices = indices.filter(desde__lte=hasta)
+    vistas = {}
+    for ruta in indices.order_by('desde').values_list('ruta', flat=True):
+        for fila in _leer_archivo(ruta):
+            if fila['usuario_id'] == usuario_id:
+                vistas[fila['id']] = fila
+    return list(vistas.values())
@@ -0,0 +1,456 @@
+# App/indice_usuarios.py
+"""
+Índice en memoria de los usuarios activos (opcional)
+
+Se activa con settings.INDICE_USUARIOS_MEMORIA. Cada proceso guarda una
+copia de las columnas del listado en arrays de NumPy (ids y fechas int64,
+edad int16, rol y categoría como códigos chicos, textos internados) y
+ordena, filtra y pagina sin consultar la base.
+
+Se mantiene al día:
+- De forma incremental con post_save/post_delete (ver App/signals.py),
+  aplicados al confirmar la transacción
+- Con los avisos del bus de invalidación (App/bus.py): los ids que cambió
+  otro proceso se releen de la base en la próxima lectura
+- Con una recarga completa cada settings.INDICE_USUARIOS_RECARGA segundos,
+  que cubre los cambios hechos con update()/bulk_create sin registrar
+"""
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import Usuario, normalizar_telefono
+from . import bus
+
+
+# ==================== CONSTANTES ====================
+
+CAMPOS_CARGA = (
+    'id', 'first_name', 'last_name', 'email', 'telefono', 'telefono_digitos',
+    'edad', 'created_at', 'updated_at', 'rol', 'categoria_id',
+)
+
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+EDAD_NULA = -1
+# Al ordenar por edad los NULL van al final en orden ascendente y al
+# principio en descendente, igual que PostgreSQL
+EDAD_NULA_ORDEN = np.iinfo(np.int16).max
+
+CAMPOS_TEXTO = ('first_name', 'last_name', 'email')
+
+# Arrays del índice y su dtype (los textos son arrays de objetos str)
+COLUMNAS = {
+    'ids': np.int64,
+    'created': np.int64,   # microsegundos desde 1970
+    'updated': np.int64,   # microsegundos desde 1970 (para la versión)
+    'edad': np.int16,      # EDAD_NULA si no tiene
+    'rol': np.int8,        # código en IndiceUsuarios._roles
+    'categoria': np.int16, # código en IndiceUsuarios._categorias
+    'first_name': object,
+    'last_name': object,
+    'email': object,
+    'telefono': object,
+    'tel_reverso': object, # telefono_digitos invertido, para buscar por sufijo
+    'busqueda': object,    # nombre, apellido y email en minúsculas
+}
+
+
+def _micros(valor):
+    """datetime -> microsegundos desde 1970 (int)"""
+    return (valor - EPOCA) // timedelta(microseconds=1)
+
+
+def _texto(valor):
+    """Texto internado: los nombres repetidos comparten memoria"""
+    return sys.intern(valor) if valor else ''
+
+
+# ==================== ÍNDICE ====================
+
+class IndiceUsuarios:
+    """
+    Columnas de los usuarios activos, ordenadas por id
+
+    Los arrays no se modifican nunca: cada cambio arma arrays nuevos y los
+    reemplaza. consultar() devuelve un Resultado con las posiciones ya
+    filtradas y ordenadas junto con los arrays que usó, así una recarga
+    o un cambio aplicado mientras tanto no desplaza las filas.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._lock_carga = threading.Lock()
+        self._cargado_en = None
+        self._pendientes = {}
+        self._por_releer = set()
+        self._ordenes = {}
+        self._version = ''
+        self._roles = [code for code, _ in Usuario.ROL_CHOICES]
+        self._categorias = [None]
+        self._asignar(self._columnas([]))
+
+    @property
+    def version(self):
+        """
+        Identifica el contenido del índice (para ETags): cantidad, suma de
+        ids y último updated_at. Depende solo de los datos, así dos
+        procesos con el mismo contenido dan el mismo ETag
+        """
+        return self._version
+
+    # ---------- códigos ----------
+
+    def _codigo(self, tabla, valor):
+        try:
+            return tabla.index(valor)
+        except ValueError:
+            tabla.append(valor)
+            return len(tabla) - 1
+
+    # ---------- carga ----------
+
+    def _columnas(self, filas):
+        """
+        Convierte tuplas de CAMPOS_CARGA en un dict de arrays
+        """
+        columnas = {nombre: [] for nombre in COLUMNAS}
+        for (pk, first_name, last_name, email, telefono, digitos, edad,
+             created_at, updated_at, rol, categoria_id) in filas:
+            first_name, last_name, email = _texto(first_name), _texto(last_name), _texto(email)
+            columnas['ids'].append(pk)
+            columnas['created'].append(_micros(created_at))
+            columnas['updated'].append(_micros(updated_at))
+            columnas['edad'].append(EDAD_NULA if edad is None else edad)
+            columnas['rol'].append(self._codigo(self._roles, rol))
+            columnas['categoria'].append(self._codigo(self._categorias, categoria_id))
+            columnas['first_name'].append(first_name)
+            columnas['last_name'].append(last_name)
+            columnas['email'].append(email)
+            columnas['telefono'].append(_texto(telefono))
+            columnas['tel_reverso'].append(digitos[::-1] if digitos else '')
+            columnas['busqueda'].append(f'{first_name}\n{last_name}\n{email}'.lower())
+
+        return {
+            nombre: np.array(valores, dtype=COLUMNAS[nombre])
+            for nombre, valores in columnas.items()
+        }
+
+    def _asignar(self, columnas):
+        for nombre, array in columnas.items():
+            setattr(self, f'_{nombre}', array)
+        self._ordenes = {}
+        ids, updated = columnas['ids'], columnas['updated']
+        self._version = f'{len(ids)}:{int(ids.sum())}:{int(updated.max()) if len(updated) else 0}'
+
+    def cargar(self):
+        """
+        Recarga completa desde la base (una consulta, cursor del servidor)
+        """
+        filas = (
+            Usuario.objects.filter(is_active=True)
+            .order_by('id')
+            .values_list(*CAMPOS_CARGA)
+            .iterator(chunk_size=5000)
+        )
+        # Se arma fuera del lock: mientras tanto las lecturas usan los arrays anteriores.
+        # Los cambios encolados se conservan; volver a aplicarlos no hace daño
+        columnas = self._columnas(filas)
+        with self._lock:
+            self._asignar(columnas)
+            self._cargado_en = time.monotonic()
+
+    def _vencido(self):
+        recarga = getattr(settings, 'INDICE_USUARIOS_RECARGA', 300)
+        return self._cargado_en is None or time.monotonic() - self._cargado_en > recarga
+
+    def asegurar_fresco(self):
+        """
+        Carga el índice si nunca se cargó o si pasó el intervalo de recarga
+        y aplica los cambios encolados. Se llama antes de leer version o
+        consultar(); es la única operación de lectura que puede consultar la base
+        """
+        if self._vencido():
+            with self._lock_carga:
+                if self._vencido():
+                    self.cargar()
+        self._releer()
+        self._aplicar_pendientes()
+
+    # ---------- actualización incremental ----------
+
+    def registrar_guardado(self, usuario):
+        """
+        Programa la actualización de un usuario recién guardado
+        Se aplica al confirmar la transacción, así un rollback no la deja aplicada
+        """
+        self.registrar_guardados([usuario])
+
+    def registrar_guardados(self, usuarios):
+        """
+        Igual que registrar_guardado() para muchos usuarios (ediciones masivas),
+        con un solo callback al confirmar
+        """
+        filas = {
+            usuario.pk: tuple(getattr(usuario, campo) for campo in CAMPOS_CARGA) if usuario.is_active else None
+            for usuario in usuarios
+        }
+        if filas:
+            transaction.on_commit(lambda: self._encolar(filas))
+            bus.publicar('usuarios', list(filas))
+
+    def registrar_eliminacion(self, usuario):
+        """Programa la baja de un usuario eliminado"""
+        self.registrar_eliminaciones([usuario.pk])
+
+    def registrar_eliminaciones(self, pks):
+        """Programa la baja de muchos usuarios eliminados, con un solo callback"""
+        filas = dict.fromkeys(pks)
+        if filas:
+            transaction.on_commit(lambda: self._encolar(filas))
+            bus.publicar('usuarios', list(filas))
+
+    def _encolar(self, filas):
+        with self._lock:
+            self._pendientes.update(filas)
+
+    def releer(self, pks):
+        """
+        Marca usuarios cambiados por otro proceso para releerlos de la base
+        en la próxima lectura (None: recarga completa)
+        """
+        if pks is None:
+            self._cargado_en = None
+            return
+        with self._lock:
+            self._por_releer.update(pks)
+
+    def _releer(self):
+        """Una consulta para todos los usuarios marcados con releer()"""
+        with self._lock:
+            if not self._por_releer:
+                return
+            pks, self._por_releer = self._por_releer, set()
+        filas = dict.fromkeys(pks)
+        for fila in Usuario.objects.filter(id__in=pks, is_active=True).values_list(*CAMPOS_CARGA):
+            filas[fila[0]] = fila
+        self._encolar(filas)
+
+    def _aplicar_pendientes(self):
+        """
+        Aplica los cambios encolados de una vez:
+        - Modificaciones de usuarios presentes: asignación en su posición
+        - Bajas: se filtran sus posiciones
+        - Altas: se concatenan y se reordena por id
+        """
+        with self._lock:
+            if not self._pendientes:
+                return
+            pendientes, self._pendientes = self._pendientes, {}
+
+            pks = np.fromiter(pendientes, dtype=np.int64, count=len(pendientes))
+            posiciones = np.searchsorted(self._ids, pks)
+            posiciones_validas = np.minimum(posiciones, max(len(self._ids) - 1, 0))
+            presentes = (
+                (posiciones < len(self._ids)) & (self._ids[posiciones_validas] == pks)
+                if len(self._ids) else np.zeros(len(pks), dtype=bool)
+            )
+
+            # Se trabaja sobre copias: los arrays actuales pueden estar en uso
+            columnas = {nombre: getattr(self, f'_{nombre}').copy() for nombre in COLUMNAS}
+
+            vivos = np.ones(len(self._ids), dtype=bool)
+            altas = []
+            for pk, posicion, presente in zip(pks.tolist(), posiciones.tolist(), presentes.tolist()):
+                fila = pendientes[pk]
+                if fila is None:
+                    if presente:
+                        vivos[posicion] = False
+                elif presente:
+                    for nombre, valor in self._columnas([fila]).items():
+                        columnas[nombre][posicion] = valor[0]
+                else:
+                    altas.append(fila)
+
+            columnas = {nombre: array[vivos] for nombre, array in columnas.items()}
+            if altas:
+                nuevas = self._columnas(altas)
+                columnas = {
+                    nombre: np.concatenate([array, nuevas[nombre]])
+                    for nombre, array in columnas.items()
+                }
+                orden = np.argsort(columnas['ids'], kind='stable')
+                columnas = {nombre: array[orden] for nombre, array in columnas.items()}
+
+            self._asignar(columnas)
+
+    # ---------- lectura ----------
+
+    def _clave_orden(self, campo):
+        if campo == 'created_at':
+            return self._created
+        if campo == 'edad':
+            return np.where(self._edad == EDAD_NULA, EDAD_NULA_ORDEN, self._edad)
+        # Textos: sin distinguir mayúsculas, aproximando la collation de la base
+        return np.array([valor.lower() for valor in getattr(self, f'_{campo}')], dtype=object)
+
+    def _orden(self, order_by):
+        """
+        Posiciones ordenadas por order_by (con desempate por id)
+        Se calculan una vez por versión del índice
+        """
+        if order_by not in self._ordenes:
+            campo = order_by.lstrip('-')
+            if order_by.startswith('-') and campo in self._ordenes:
+                self._ordenes[order_by] = self._ordenes[campo][::-1]
+            else:
+                # Los arrays están ordenados por id: un sort estable desempata por id
+                ascendente = np.argsort(self._clave_orden(campo), kind='stable')
+                self._ordenes[campo] = ascendente
+                self._ordenes['-' + campo] = ascendente[::-1]
+        return self._ordenes[order_by]
+
+    def _prefijo(self, nombre, prefijo):
+        """
+        Posiciones cuyo valor (en minúsculas) empieza con prefijo, con
+        búsqueda binaria sobre los valores ordenados (se ordenan una vez
+        por versión del índice)
+
+        Args:
+            nombre: 'tel_reverso' o un campo de CAMPOS_TEXTO
+            prefijo: Texto ya en minúsculas
+        """
+        clave = ('prefijo', nombre)
+        if clave not in self._ordenes:
+            valores = getattr(self, f'_{nombre}')
+            if nombre != 'tel_reverso':
+                valores = np.array([valor.lower() for valor in valores], dtype=object)
+            orden = np.argsort(valores, kind='stable')
+            self._ordenes[clave] = (orden, valores[orden])
+        orden, ordenados = self._ordenes[clave]
+
+        desde = np.searchsorted(ordenados, prefijo, side='left')
+        hasta = np.searchsorted(ordenados, prefijo + '\uffff', side='left')
+        return orden[desde:hasta]
+
+    def consultar(self, query='', order_by='-created_at', edad=None, creado=None, prefijo=None):
+        """
+        Filtra y ordena los usuarios activos sin consultar la base
+
+        Args:
+            query: Término de búsqueda con la semántica de filtrar_por_busqueda
+                   (texto en nombre, apellido o email, y teléfono por sufijo)
+            order_by: Campo de ORDENAMIENTOS_PERMITIDOS
+            edad: tuple (mínimo, máximo), cualquiera puede ser None
+            creado: tuple (desde, hasta) de datetimes, cualquiera puede ser None
+            prefijo: tuple (campo de CAMPOS_TEXTO, texto) para búsqueda por prefijo
+
+        Returns:
+            Resultado con las filas en el orden pedido
+        """
+        # Import local: views importa este módulo
+        from .views import TELEFONO_BUSQUEDA_REGEX
+
+        self._aplicar_pendientes()
+        with self._lock:
+            mascara = np.ones(len(self._ids), dtype=bool)
+
+            if query:
+                termino = query.lower()
+                coincidencias = np.fromiter(
+                    (termino in texto for texto in self._busqueda),
+                    dtype=bool, count=len(self._busqueda)
+                )
+                digitos = normalizar_telefono(query) if TELEFONO_BUSQUEDA_REGEX.match(query) else None
+                if digitos:
+                    coincidencias[self._prefijo('tel_reverso', digitos[::-1])] = True
+                mascara &= coincidencias
+
+            if edad:
+                minimo, maximo = edad
+                con_edad = self._edad != EDAD_NULA
+                if minimo is not None:
+                    mascara &= con_edad & (self._edad >= minimo)
+                if maximo is not None:
+                    mascara &= con_edad & (self._edad <= maximo)
+
+            if creado:
+                desde, hasta = creado
+                if desde is not None:
+                    mascara &= self._created >= _micros(desde)
+                if hasta is not None:
+                    mascara &= self._created <= _micros(hasta)
+
+            if prefijo:
+                campo, texto = prefijo
+                if campo not in CAMPOS_TEXTO:
+                    raise ValueError(f'Campo de prefijo no permitido: {campo}')
+                coincidencias = np.zeros(len(self._ids), dtype=bool)
+                coincidencias[self._prefijo(campo, texto.lower())] = True
+                mascara &= coincidencias
+
+            orden = self._orden(order_by)
+            return Resultado(
+                orden[mascara[orden]],
+                {nombre: getattr(self, f'_{nombre}') for nombre in COLUMNAS},
+                list(self._roles),
+                list(self._categorias),
+            )
+
+
+class Resultado:
+    """
+    Resultado de IndiceUsuarios.consultar(): posiciones y los arrays a los
+    que apuntan, tomados juntos bajo el lock
+
+    Se pagina como una lista (len y slices); cada slice devuelve las
+    filas como dicts para el template.
+    """
+
+    def __init__(self, posiciones, columnas, roles, categorias):
+        self.posiciones = posiciones
+        self._columnas = columnas
+        self._roles = roles
+        self._categorias = categorias
+
+    def __len__(self):
+        return len(self.posiciones)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return self.filas(self.posiciones[indice])
+        return self.filas([self.posiciones[indice]])[0]
+
+    def filas(self, posiciones):
+        """
+        Filas de las posiciones indicadas, como dicts para el template
+
+        Args:
+            posiciones: Posiciones de este resultado (normalmente una página)
+        """
+        c = self._columnas
+        return [
+            {
+                'id': int(c['ids'][i]),
+                'first_name': c['first_name'][i],
+                'last_name': c['last_name'][i],
+                'email': c['email'][i],
+                'telefono': c['telefono'][i] or None,
+                'edad': None if c['edad'][i] == EDAD_NULA else int(c['edad'][i]),
+                'created_at': EPOCA + timedelta(microseconds=int(c['created'][i])),
+                'rol': self._roles[c['rol'][i]],
+                'categoria_id': self._categorias[c['categoria'][i]],
+            }
+            for i in posiciones
+        ]
+
+
+# Instancia del proceso
+indice = IndiceUsuarios()
+
+# Cambios hechos por otros procesos (App/bus.py)
+bus.manejador('usuarios')(indice.releer)
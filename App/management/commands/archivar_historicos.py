@@ -0,0 +1,41 @@
+# App/management/commands/archivar_historicos.py
+"""
+Comando: python manage.py archivar_historicos [--dias N] [--lote N] [--simular] [--indexar]
+
+Política de retención de UsuarioHistorico: mueve los cambios más viejos
+que --dias (por defecto settings.HISTORICO_RETENCION_DIAS) a archivos
+.ndjson.gz en el storage por defecto, uno por día, y los borra de la base
+por lotes. De cada usuario se conserva desde su último snapshot anterior
+al corte, así el estado se sigue reconstruyendo desde la base.
+
+Cada archivo queda registrado por usuario en ArchivoHistorico; --indexar
+reconstruye ese índice recorriendo todos los archivos (los escritos antes
+de que existiera).
+
+Pensado para correr periódicamente (cron).
+"""
+from django.core.management.base import BaseCommand
+
+from App import historico
+
+
+class Command(BaseCommand):
+    help = 'Archiva el histórico de usuarios más viejo que la retención configurada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None, help='Días de histórico que se conservan en la base')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por lote')
+        parser.add_argument('--simular', action='store_true', help='Solo contar las filas a archivar')
+        parser.add_argument('--indexar', action='store_true', help='Reconstruir el índice de archivos por usuario')
+
+    def handle(self, *args, **options):
+        if options['indexar']:
+            total = historico.indexar_archivos()
+            self.stdout.write(self.style.SUCCESS(f'Índice de archivos reconstruido: {total} entradas'))
+            return
+
+        total = historico.archivar(dias=options['dias'], lote=options['lote'], simular=options['simular'])
+        if options['simular']:
+            self.stdout.write(f'Se archivarían {total} filas')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Histórico archivado: {total} filas'))
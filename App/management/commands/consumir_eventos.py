@@ -0,0 +1,78 @@
+# App/management/commands/consumir_eventos.py
+"""
+Comando: python manage.py consumir_eventos [--destino archivo|stdout] [--consumidor NOMBRE]
+                                          [--lote N] [--seguir] [--intervalo SEG]
+
+Entrega el outbox de cambios de usuarios (EventoUsuario) en orden, por
+lotes, a segmentos .ndjson en EVENTOS_DIRECTORIO o a stdout, y guarda el
+offset de cada consumidor para continuar donde quedó (App/eventos.py).
+Con --seguir queda esperando eventos nuevos.
+"""
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from App import eventos
+
+
+class Command(BaseCommand):
+    help = 'Entrega los eventos de cambios de usuarios a un archivo de segmentos o a stdout'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--destino',
+            choices=['archivo', 'stdout'],
+            default='archivo',
+            help='Dónde escribir los eventos (default: archivo)',
+        )
+        parser.add_argument(
+            '--consumidor',
+            help='Nombre del consumidor para el offset (default: el destino)',
+        )
+        parser.add_argument(
+            '--directorio',
+            help='Directorio de los segmentos (default: EVENTOS_DIRECTORIO)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Eventos por lote (default: 1000)',
+        )
+        parser.add_argument(
+            '--seguir',
+            action='store_true',
+            help='No terminar: seguir esperando eventos nuevos',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=1.0,
+            help='Segundos entre consultas con --seguir (default: 1)',
+        )
+
+    def handle(self, *args, **options):
+        destino = options['destino']
+        nombre = options['consumidor'] or destino
+        if destino == 'stdout':
+            salida = eventos.SalidaEstandar(sys.stdout)
+            # Los mensajes del comando no se mezclan con los eventos
+            mensajes = self.stderr
+        else:
+            salida = eventos.SalidaSegmentos(options['directorio'])
+            mensajes = self.stdout
+
+        try:
+            while True:
+                entregados = eventos.consumir(nombre, salida, options['lote'])
+                if entregados:
+                    mensajes.write(f'{nombre}: {entregados} eventos entregados')
+                if not options['seguir']:
+                    break
+                if not entregados:
+                    time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            salida.cerrar()
@@ -0,0 +1,208 @@
+# App/management/commands/explicar_consultas.py
+"""
+Comando: python manage.py explicar_consultas
+
+Ejecuta las vistas principales con RequestFactory, captura las consultas SQL
+que realizan y corre EXPLAIN ANALYZE sobre cada una, marcando los
+Seq Scan sobre tablas de la aplicación.
+
+Uso:
+    python manage.py explicar_consultas
+    python manage.py explicar_consultas --seed 50000 --verbose
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from App.models import Usuario
+
+
+# Vistas a analizar: (descripción, nombre de la URL, parámetros GET)
+VISTAS = [
+    ('home', 'home', {}),
+    ('listar_usuarios', 'listar_usuarios', {}),
+    ('listar_usuarios (orden por apellido)', 'listar_usuarios', {'order_by': 'last_name'}),
+    ('listar_usuarios (orden por nombre)', 'listar_usuarios', {'order_by': '-first_name'}),
+    ('listar_usuarios (búsqueda por texto)', 'listar_usuarios', {'q': 'juan'}),
+    ('listar_usuarios (búsqueda por teléfono)', 'listar_usuarios', {'q': '5678'}),
+    ('api_usuarios', 'api_usuarios', {'fields': 'id,email'}),
+    ('api_usuarios (orden por apellido)', 'api_usuarios', {'order_by': 'last_name'}),
+    ('eliminar_multiples', 'eliminar_multiples', {}),
+]
+
+# Tablas propias: un Seq Scan sobre ellas es sospechoso
+PREFIJO_TABLAS_APP = '"App_'
+
+
+class Command(BaseCommand):
+    help = 'Corre EXPLAIN ANALYZE sobre las consultas de cada vista y marca los Seq Scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Cantidad de usuarios de prueba a insertar antes de analizar (se revierten al final)'
+        )
+        parser.add_argument(
+            '--usuario',
+            help='Username con el que se ejecutan las vistas (por defecto el primer superusuario)'
+        )
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Mostrar el plan completo de cada consulta'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('explicar_consultas requiere PostgreSQL')
+
+        # Todo corre dentro de una transacción que se revierte al final,
+        # así los datos sembrados no quedan en la base
+        with transaction.atomic():
+            if options['seed']:
+                self.sembrar(options['seed'])
+
+            user = self.obtener_usuario(options['usuario'])
+            total_seq_scans = 0
+
+            for descripcion, url_name, params in VISTAS:
+                total_seq_scans += self.analizar_vista(
+                    descripcion, url_name, params, user, options['verbose']
+                )
+
+            transaction.set_rollback(True)
+
+        if total_seq_scans:
+            self.stdout.write(self.style.WARNING(
+                f'{total_seq_scans} consultas con Seq Scan sobre tablas de la aplicación'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Ninguna consulta usa Seq Scan sobre tablas de la aplicación'))
+
+    def obtener_usuario(self, username):
+        """
+        Obtiene el User con el que se ejecutan las vistas
+
+        Args:
+            username: Username indicado por parámetro (opcional)
+
+        Returns:
+            Instancia de User
+        """
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'No existe el usuario "{username}"')
+
+        user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            # Usuario temporal, se revierte junto con el resto
+            user = User.objects.create(username='explicar_consultas', is_superuser=True)
+        return user
+
+    def sembrar(self, cantidad):
+        """
+        Inserta usuarios de prueba con bulk_create y actualiza estadísticas
+
+        Args:
+            cantidad: Número de usuarios a crear
+        """
+        self.stdout.write(f'Sembrando {cantidad} usuarios...')
+
+        ahora = timezone.now()
+        nombres = ['Juan', 'María', 'Pedro', 'Ana', 'Luis', 'Carla', 'Diego', 'Sofía']
+        apellidos = ['Pérez', 'García', 'López', 'Soto', 'Muñoz', 'Rojas', 'Díaz']
+
+        lote = []
+        for i in range(cantidad):
+            telefono = f'+569{10000000 + i}'
+            lote.append(Usuario(
+                first_name=random.choice(nombres),
+                last_name=random.choice(apellidos),
+                email=f'seed{i}@ejemplo.com',
+                edad=random.randint(18, 90),
+                telefono=telefono,
+                telefono_digitos=telefono[1:],
+                rol=random.choice(['ADMIN', 'USER']),
+                is_active=random.random() > 0.1,
+            ))
+            if len(lote) >= 5000:
+                Usuario.objects.bulk_create(lote)
+                lote = []
+        if lote:
+            Usuario.objects.bulk_create(lote)
+
+        # Repartir las fechas de creación en el último año
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE "App_usuario" SET created_at = %s - (random() * interval \'365 days\') '
+                'WHERE email LIKE %s',
+                [ahora + timedelta(seconds=1), 'seed%@ejemplo.com']
+            )
+            cursor.execute('ANALYZE "App_usuario"')
+            cursor.execute('ANALYZE "App_importaudit"')
+
+    def analizar_vista(self, descripcion, url_name, params, user, verbose):
+        """
+        Ejecuta una vista y corre EXPLAIN ANALYZE sobre cada SELECT que hizo
+
+        Args:
+            descripcion: Texto a mostrar
+            url_name: Nombre de la URL de la vista
+            params: Parámetros GET
+            user: User con el que se ejecuta
+            verbose: Mostrar el plan completo
+
+        Returns:
+            int: Cantidad de consultas con Seq Scan sobre tablas de la aplicación
+        """
+        url = reverse(url_name)
+        request = RequestFactory().get(url, params, HTTP_HOST='localhost')
+        request.user = user
+        view = resolve(url).func
+
+        with CaptureQueriesContext(connection) as capturadas:
+            view(request)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{descripcion} ({len(capturadas)} consultas)'))
+
+        seq_scans = 0
+        for query in capturadas.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN ANALYZE {sql}')
+                plan = [fila[0] for fila in cursor.fetchall()]
+
+            tablas_seq = [
+                linea.strip() for linea in plan
+                if 'Seq Scan on ' + PREFIJO_TABLAS_APP in linea
+            ]
+            tiempo = next((l for l in plan if l.startswith('Execution Time')), '')
+
+            if tablas_seq:
+                seq_scans += 1
+                self.stdout.write(self.style.WARNING(f'  SEQ SCAN  {sql[:150]}'))
+                for linea in tablas_seq:
+                    self.stdout.write(self.style.WARNING(f'            {linea}'))
+            else:
+                self.stdout.write(f'  ok        {sql[:150]}')
+            self.stdout.write(f'            {tiempo}')
+
+            if verbose:
+                for linea in plan:
+                    self.stdout.write(f'            | {linea}')
+
+        return seq_scans
@@ -0,0 +1,28 @@
+# App/management/commands/procesar_eliminaciones.py
+"""
+Comando: python manage.py procesar_eliminaciones
+
+Ejecuta en este proceso las eliminaciones masivas (EliminacionMasiva)
+pendientes y las que quedaron "en proceso" sin latido (el proceso que las
+corría se reinició), desde el último lote confirmado. Normalmente empiezan
+en un hilo del servidor web; este comando es el que garantiza que terminen.
+
+Pensado para correr periódicamente (cron, por ejemplo cada minuto).
+"""
+from django.core.management.base import BaseCommand
+
+from App import masivo
+from App.models import EliminacionMasiva
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las eliminaciones masivas pendientes o abandonadas'
+
+    def handle(self, *args, **options):
+        pendientes = masivo.eliminaciones_por_ejecutar().order_by('created_at')
+        for tarea_id in pendientes.values_list('id', flat=True):
+            masivo.ejecutar_eliminacion(tarea_id)
+            tarea = EliminacionMasiva.objects.get(pk=tarea_id)
+            self.stdout.write(f'Eliminación {tarea.id}: {tarea.status}, {tarea.eliminados} eliminados')
+
+        self.stdout.write(self.style.SUCCESS('Eliminaciones procesadas'))
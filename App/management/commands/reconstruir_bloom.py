@@ -0,0 +1,25 @@
+# App/management/commands/reconstruir_bloom.py
+"""
+Comando: python manage.py reconstruir_bloom
+
+Reconstruye el filtro de Bloom de emails y teléfonos existentes (App/bloom.py)
+y lo publica en la caché o en el archivo según settings.BLOOM_USUARIOS.
+Correrlo al desplegar y periódicamente: con las altas el filtro se llena
+y aumentan los falsos positivos (más consultas exactas, nunca errores).
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from App import bloom
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el filtro de Bloom de emails y teléfonos existentes'
+
+    def handle(self, *args, **options):
+        try:
+            claves, tamano = bloom.reconstruir()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'Filtro de Bloom reconstruido: {claves} claves, {tamano / 1024:.1f} KB'
+        ))
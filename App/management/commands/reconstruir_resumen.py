@@ -0,0 +1,21 @@
+# App/management/commands/reconstruir_resumen.py
+"""
+Comando: python manage.py reconstruir_resumen
+
+Recalcula ResumenDiarioUsuario desde App_usuario con un solo GROUP BY.
+Útil después de cargas masivas hechas fuera de la aplicación o si se
+sospecha que los contadores incrementales se desviaron.
+"""
+from django.core.management.base import BaseCommand
+
+from App import dashboard
+from App import resumen
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de usuarios desde App_usuario'
+
+    def handle(self, *args, **options):
+        buckets = resumen.reconstruir()
+        dashboard.invalidar_estadisticas_usuarios()
+        self.stdout.write(self.style.SUCCESS(f'Resumen reconstruido: {buckets} buckets'))
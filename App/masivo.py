@@ -0,0 +1,364 @@
+# App/masivo.py
+"""
+Operaciones sobre muchos usuarios a la vez (selección por checkboxes)
+
+Trabajan por conjuntos en vez de guardar usuario por usuario: un UPDATE
+por conjunto de campos, los históricos y eventos (outbox) en un bulk_create
+y las estructuras derivadas (resumen diario, índice en memoria, dashboard)
+actualizadas una sola vez. update() no dispara señales, así que todo eso
+se hace acá.
+
+La eliminación definitiva corre en segundo plano (EliminacionMasiva) y
+borra por lotes acotados, con las cascadas resueltas por conjuntos. Las
+tareas abandonadas por un reinicio las retoma procesar_eliminaciones.
+"""
+import logging
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EliminacionMasiva, EventoUsuario, Usuario, UsuarioHistorico
+from . import categorias
+from . import dashboard
+from . import permisos
+from . import resumen
+from .indice_usuarios import CAMPOS_CARGA, indice
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== EDICIÓN MASIVA ====================
+
+# Campos que se pueden cambiar en bloque
+CAMPOS_EDITABLES = ('rol', 'categoria_id', 'is_active')
+
+# Campos que definen el bucket del resumen diario (App/resumen.py)
+CAMPOS_BUCKET = ('created_at', 'rol', 'categoria_id', 'is_active')
+
+
+
+def validar_cambios(datos):
+    """
+    Valida los cambios pedidos en el formulario de edición masiva
+    Los campos vacíos se dejan como están
+
+    Args:
+        datos: QueryDict/dict con rol, categoria e is_active
+
+    Returns:
+        dict campo -> valor nuevo (al menos uno)
+
+    Raises:
+        ValidationError: Si un valor no es válido o no se pidió ningún cambio
+    """
+    cambios = {}
+
+    rol = (datos.get('rol') or '').strip()
+    if rol:
+        if rol not in dict(Usuario.ROL_CHOICES):
+            raise ValidationError(f'Rol inválido: {rol}')
+        cambios['rol'] = rol
+
+    categoria = (datos.get('categoria') or '').strip()
+    if categoria:
+        try:
+            categoria_id = int(categoria)
+        except ValueError:
+            raise ValidationError('Categoría inválida')
+        if categorias.nombre(categoria_id) is None:
+            raise ValidationError('La categoría no existe')
+        cambios['categoria_id'] = categoria_id
+
+    is_active = (datos.get('is_active') or '').strip()
+    if is_active:
+        if is_active not in ('True', 'False'):
+            raise ValidationError('Estado inválido')
+        cambios['is_active'] = is_active == 'True'
+
+    if not cambios:
+        raise ValidationError('No se indicó ningún cambio')
+    return cambios
+
+
+def _razon(cambios):
+    return 'Edición masiva: ' + ', '.join(f'{campo}={valor}' for campo, valor in cambios.items())
+
+
+@transaction.atomic
+def editar(ids, cambios, modificado_por=None):
+    """
+    Aplica los mismos cambios a muchos usuarios
+
+    Lee los usuarios una vez (bloqueados con SELECT ... FOR UPDATE para que
+    los deltas del resumen sean exactos), los actualiza con un solo UPDATE
+    y registra los históricos con un solo bulk_create. Los usuarios que ya
+    tenían esos valores no se tocan.
+
+    Args:
+        ids: IDs de los usuarios seleccionados
+        cambios: dict devuelto por validar_cambios()
+        modificado_por: User que hace el cambio (queda en el histórico)
+
+    Returns:
+        int: Cantidad de usuarios modificados
+    """
+    campos = set(CAMPOS_CARGA) | set(UsuarioHistorico.CAMPOS) | set(CAMPOS_EDITABLES) | {'user_id'}
+    usuarios = [
+        usuario
+        for usuario in Usuario.objects.filter(id__in=ids).only(*campos).order_by('id').select_for_update()
+        if any(getattr(usuario, campo) != valor for campo, valor in cambios.items())
+    ]
+    if not usuarios:
+        return 0
+
+    ahora = timezone.now()
+    Usuario.objects.filter(id__in=[usuario.id for usuario in usuarios]).update(updated_at=ahora, **cambios)
+
+    deltas = Counter()
+    razon = _razon(cambios)
+    historicos = []
+    eventos = []
+    for usuario in usuarios:
+        original = dict(usuario._estado_original)
+        anterior = resumen.bucket_de(original)
+        for campo, valor in cambios.items():
+            setattr(usuario, campo, valor)
+        usuario.updated_at = ahora
+        actual = resumen.bucket_de({campo: getattr(usuario, campo) for campo in CAMPOS_BUCKET})
+        if anterior != actual:
+            if anterior is not None:
+                deltas[anterior] -= 1
+            if actual is not None:
+                deltas[actual] += 1
+
+        historicos.append(UsuarioHistorico.pendiente(
+            usuario,
+            original,
+            modified_by=modificado_por,
+            change_reason=razon,
+        ))
+        eventos.append(EventoUsuario.de_guardado(usuario, False, original))
+
+    UsuarioHistorico.preparar_lote(historicos)
+    UsuarioHistorico.objects.bulk_create(historicos, batch_size=1000)
+    EventoUsuario.objects.bulk_create(eventos, batch_size=1000)
+    resumen.aplicar_deltas(deltas)
+    if settings.INDICE_USUARIOS_MEMORIA:
+        indice.registrar_guardados(usuarios)
+    dashboard.invalidar_estadisticas_usuarios()
+    if 'categoria_id' in cambios:
+        permisos.invalidar(usuario.user_id for usuario in usuarios)
+    return len(usuarios)
+
+
+# ==================== ELIMINACIÓN ====================
+
+# Usuarios por lote en la eliminación definitiva: cada lote es una
+# transacción corta, así no se bloquea la tabla ni se carga todo en memoria
+TAMANO_LOTE = 500
+
+# Una tarea en proceso sin latido (uno por lote confirmado) desde hace más
+# que esto se da por abandonada: el proceso que la corría se reinició
+LATIDO_ABANDONADA = timedelta(minutes=5)
+
+
+def desactivar(ids, modificado_por=None):
+    """
+    Eliminación lógica (is_active=False) con un solo UPDATE
+    Se puede revertir editando el estado; deja histórico como cualquier edición
+
+    Returns:
+        int: Cantidad de usuarios desactivados
+    """
+    return editar(ids, {'is_active': False}, modificado_por)
+
+
+def programar_eliminacion(ids, user=None):
+    """
+    Crea la tarea de eliminación definitiva y la lanza en segundo plano
+    al confirmar la transacción
+
+    El hilo es solo para que empiece enseguida: si el proceso se reinicia
+    a mitad de camino, `python manage.py procesar_eliminaciones` (cron) la
+    retoma cuando deja de latir (ver ejecutar_eliminacion)
+
+    Args:
+        ids: IDs de los usuarios seleccionados
+        user: User que pide la eliminación
+
+    Returns:
+        EliminacionMasiva creada
+    """
+    ids = sorted({int(pk) for pk in ids})
+    tarea = EliminacionMasiva.objects.create(user=user, ids=ids, total=len(ids))
+    transaction.on_commit(lambda: _lanzar(tarea.id))
+    return tarea
+
+
+def _lanzar(tarea_id):
+    threading.Thread(
+        target=_ejecutar_en_hilo, args=(tarea_id,),
+        name=f'eliminacion-{tarea_id}', daemon=True,
+    ).start()
+
+
+def _ejecutar_en_hilo(tarea_id):
+    try:
+        ejecutar_eliminacion(tarea_id)
+    finally:
+        # El hilo abrió su propia conexión: no dejarla colgada
+        connections.close_all()
+
+
+class _TareaRetomada(Exception):
+    """Otro proceso retomó la tarea (este dejó de latir a tiempo)"""
+
+
+def eliminaciones_por_ejecutar():
+    """
+    Tareas que un proceso puede tomar: pendientes, o en proceso pero sin
+    latido desde hace LATIDO_ABANDONADA (el proceso que las corría murió)
+
+    Returns:
+        QuerySet de EliminacionMasiva
+    """
+    limite = timezone.now() - LATIDO_ABANDONADA
+    return EliminacionMasiva.objects.filter(
+        models.Q(status=EliminacionMasiva.STATUS_PENDING) |
+        models.Q(status=EliminacionMasiva.STATUS_RUNNING, latido__lt=limite) |
+        models.Q(status=EliminacionMasiva.STATUS_RUNNING, latido__isnull=True)
+    )
+
+
+def ejecutar_eliminacion(tarea_id):
+    """
+    Procesa una tarea de eliminación lote por lote
+
+    Cada lote se confirma junto con el avance y el latido de la tarea: si
+    el proceso se corta, otro la retoma desde el último lote confirmado
+    cuando el latido queda viejo (python manage.py procesar_eliminaciones).
+    El latido es además la marca de dueño: si otro proceso la retomó, el
+    lote en curso se revierte y este proceso la suelta
+
+    Args:
+        tarea_id: ID de EliminacionMasiva
+    """
+    # Tomar la tarea con un UPDATE condicional: dos procesos no la ejecutan a la vez
+    latido = timezone.now()
+    tomada = eliminaciones_por_ejecutar().filter(pk=tarea_id).update(
+        status=EliminacionMasiva.STATUS_RUNNING, latido=latido
+    )
+    if not tomada:
+        return
+
+    tarea = EliminacionMasiva.objects.get(pk=tarea_id)
+    propia = EliminacionMasiva.objects.filter(pk=tarea.id, latido=latido)
+    logger.info(f'Eliminación {tarea.id}: {tarea.total} usuarios, desde {tarea.procesados}')
+    try:
+        for inicio in range(tarea.procesados, tarea.total, TAMANO_LOTE):
+            lote = tarea.ids[inicio:inicio + TAMANO_LOTE]
+            with transaction.atomic():
+                eliminados = eliminar_lote(lote)
+                nuevo = timezone.now()
+                if not propia.update(
+                    procesados=inicio + len(lote),
+                    eliminados=F('eliminados') + eliminados,
+                    latido=nuevo,
+                ):
+                    raise _TareaRetomada(tarea.id)
+            latido = nuevo
+            propia = EliminacionMasiva.objects.filter(pk=tarea.id, latido=latido)
+    except _TareaRetomada:
+        logger.warning(f'Eliminación {tarea.id} retomada por otro proceso')
+        return
+    except Exception as e:
+        logger.error(f'Eliminación {tarea.id} falló: {e}')
+        propia.update(
+            status=EliminacionMasiva.STATUS_FAILED, error=str(e), finished_at=timezone.now()
+        )
+        return
+
+    propia.update(status=EliminacionMasiva.STATUS_DONE, finished_at=timezone.now())
+    logger.info(f'Eliminación {tarea.id} terminada')
+
+
+def _eliminar_relacionados(modelo, pks):
+    """
+    Cascada por conjuntos: un DELETE (o UPDATE ... SET NULL) por relación
+    en vez de que el Collector de Django cargue cada fila relacionada
+
+    Solo resuelve CASCADE, SET_NULL y DO_NOTHING. Una relación con otra
+    regla (PROTECT, RESTRICT, SET_DEFAULT, muchos a muchos) hace fallar la
+    eliminación antes de borrar nada, en vez de saltearse su regla
+
+    Raises:
+        RuntimeError: Si alguna relación tiene una regla que no se resuelve acá
+    """
+    reglas = (models.CASCADE, models.SET_NULL, models.DO_NOTHING)
+    for relacion in modelo._meta.related_objects:
+        if relacion.many_to_many or relacion.on_delete not in reglas:
+            raise RuntimeError(
+                f'La eliminación por lotes no resuelve la relación '
+                f'{relacion.related_model.__name__}.{relacion.field.name} '
+                f'({getattr(relacion.on_delete, "__name__", relacion.on_delete)})'
+            )
+
+    for relacion in modelo._meta.related_objects:
+        relacionados = relacion.related_model._base_manager.filter(
+            **{f'{relacion.field.name}__in': pks}
+        )
+        if relacion.on_delete is models.CASCADE:
+            # Sin señales ni relaciones propias Django lo resuelve en un solo DELETE
+            relacionados.delete()
+        elif relacion.on_delete is models.SET_NULL:
+            relacionados.update(**{relacion.field.name: None})
+
+
+def eliminar_lote(ids):
+    """
+    Elimina definitivamente un lote de usuarios con operaciones por conjuntos
+    Debe llamarse dentro de una transacción
+
+    Args:
+        ids: IDs de Usuario (los que ya no existan se ignoran)
+
+    Returns:
+        int: Cantidad de usuarios eliminados
+    """
+    usuarios = Usuario.objects.filter(id__in=ids)
+    filas = list(usuarios.select_for_update().order_by('id').values_list('id', 'email', 'user_id'))
+    if not filas:
+        return 0
+    pks = [pk for pk, _, _ in filas]
+    usuarios = Usuario.objects.filter(id__in=pks)
+
+    # Resumen diario: un GROUP BY del lote antes de borrar
+    deltas = Counter({
+        (fila['fecha'], fila['rol'], fila['categoria'], fila['is_active']): -fila['total']
+        for fila in resumen.calcular_buckets(usuarios)
+    })
+
+    _eliminar_relacionados(Usuario, pks)
+    # DELETE directo, sin Collector: las relaciones ya se resolvieron arriba y
+    # las señales post_delete se reemplazan por las actualizaciones por lote de abajo
+    with connections[usuarios.db].cursor() as cursor:
+        cursor.execute('DELETE FROM "App_usuario" WHERE id = ANY(%s)', [pks])
+        eliminados = cursor.rowcount
+
+    EventoUsuario.objects.bulk_create(
+        [EventoUsuario.de_eliminacion(pk, email) for pk, email, _ in filas],
+        batch_size=1000,
+    )
+    resumen.aplicar_deltas(deltas)
+    if settings.INDICE_USUARIOS_MEMORIA:
+        indice.registrar_eliminaciones(pks)
+    dashboard.invalidar_estadisticas_usuarios()
+    # Los User vinculados se quedan sin categoría
+    permisos.invalidar(user_id for _, _, user_id in filas)
+    return eliminados
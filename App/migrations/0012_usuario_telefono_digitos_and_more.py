@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-19 03:14
+
+import re
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+def poblar_telefono_digitos(apps, schema_editor):
+    """Calcula telefono_digitos para los usuarios existentes"""
+    Usuario = apps.get_model('App', 'Usuario')
+    pendientes = []
+    for usuario in Usuario.objects.exclude(telefono__isnull=True).only('id', 'telefono').iterator(chunk_size=2000):
+        usuario.telefono_digitos = re.sub(r'\D', '', usuario.telefono) or None
+        pendientes.append(usuario)
+        if len(pendientes) >= 2000:
+            Usuario.objects.bulk_update(pendientes, ['telefono_digitos'])
+            pendientes = []
+    if pendientes:
+        Usuario.objects.bulk_update(pendientes, ['telefono_digitos'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0011_alter_categoria_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='telefono_digitos',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Dígitos del teléfono, usado en búsquedas', max_length=30, null=True, verbose_name='Teléfono Normalizado'),
+        ),
+        migrations.RunPython(poblar_telefono_digitos, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Reverse('telefono_digitos'), name='text_pattern_ops'), name='usuario_tel_reverso_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-19 03:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0013_usuario_email_lower'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='importaudit',
+            index=models.Index(fields=['user', '-uploaded_at'], name='importaudit_user_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='usuario_activo_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['first_name'], name='usuario_activo_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['last_name'], name='usuario_activo_apellido_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['rol', 'created_at'], name='usuario_rol_created_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.6 on 2026-10-19 03:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def poblar_resumen(apps, schema_editor):
+    """Genera el resumen inicial desde los usuarios existentes"""
+    Usuario = apps.get_model('App', 'Usuario')
+    ResumenDiarioUsuario = apps.get_model('App', 'ResumenDiarioUsuario')
+
+    filas = (
+        Usuario.objects
+        .order_by()
+        .annotate(fecha=TruncDate('created_at'))
+        .values('fecha', 'rol', 'categoria', 'is_active')
+        .annotate(total=Count('id'))
+    )
+    ResumenDiarioUsuario.objects.bulk_create([
+        ResumenDiarioUsuario(
+            fecha=fila['fecha'],
+            rol=fila['rol'],
+            categoria_id=fila['categoria'],
+            is_active=fila['is_active'],
+            total=fila['total'],
+        )
+        for fila in filas
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0014_indices_accesos_activos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('rol', models.CharField(max_length=55, verbose_name='Rol')),
+                ('is_active', models.BooleanField(verbose_name='Activo')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='App.categoria', verbose_name='Categoría')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Usuarios',
+                'verbose_name_plural': 'Resúmenes Diarios de Usuarios',
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiariousuario',
+            constraint=models.UniqueConstraint(fields=('fecha', 'rol', 'categoria', 'is_active'), name='resumen_diario_bucket_uniq', nulls_distinct=False),
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-19 03:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0015_resumendiariousuario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EliminacionMasiva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de Creación')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Término')),
+                ('ids', models.JSONField(default=list, verbose_name='IDs')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total')),
+                ('procesados', models.PositiveIntegerField(default=0, verbose_name='Procesados')),
+                ('eliminados', models.PositiveIntegerField(default=0, verbose_name='Eliminados')),
+                ('status', models.CharField(choices=[('PENDING', 'Pendiente'), ('RUNNING', 'En proceso'), ('DONE', 'Terminada'), ('FAILED', 'Falló')], default='PENDING', max_length=20, verbose_name='Estado')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Eliminación Masiva',
+                'verbose_name_plural': 'Eliminaciones Masivas',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.6 on 2026-10-19 04:05
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0016_eliminacionmasiva'),
+    ]
+
+    operations = [
+        # Las columnas del formato anterior pasan a aceptar NULL antes de
+        # quitarse (0019): así la migración también se puede revertir
+        migrations.AlterField(
+            model_name='usuariohistorico',
+            name='first_name',
+            field=models.CharField(max_length=100, null=True, verbose_name='Nombre'),
+        ),
+        migrations.AlterField(
+            model_name='usuariohistorico',
+            name='last_name',
+            field=models.CharField(max_length=100, null=True, verbose_name='Apellido'),
+        ),
+        migrations.AlterField(
+            model_name='usuariohistorico',
+            name='email',
+            field=models.EmailField(max_length=254, null=True, verbose_name='Email'),
+        ),
+        migrations.AddField(
+            model_name='usuariohistorico',
+            name='secuencia',
+            field=models.PositiveIntegerField(null=True, verbose_name='Secuencia'),
+        ),
+        migrations.AddField(
+            model_name='usuariohistorico',
+            name='cambios',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Cambios'),
+        ),
+        migrations.AddField(
+            model_name='usuariohistorico',
+            name='estado',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Estado Completo'),
+        ),
+    ]
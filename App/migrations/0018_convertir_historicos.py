@@ -0,0 +1,96 @@
+# Generated by Django 5.0.6 on 2026-10-19 04:05
+"""
+Convierte los históricos existentes (copia completa de los datos en cada
+fila) a deltas: cada fila guarda solo lo que cambió respecto de la
+anterior del mismo usuario, y la primera y cada INTERVALO_SNAPSHOT
+guardan además el estado completo
+"""
+from django.db import migrations
+
+# Columnas que copiaba el formato anterior
+CAMPOS_ANTERIORES = ('first_name', 'last_name', 'edad', 'email', 'telefono', 'fecha_nacimiento')
+
+# Mismo valor que UsuarioHistorico.INTERVALO_SNAPSHOT al momento de esta migración
+INTERVALO_SNAPSHOT = 20
+
+LOTE = 1000
+
+
+def _filas(UsuarioHistorico, *campos):
+    return (
+        UsuarioHistorico.objects
+        .order_by('usuario_id', 'modified_at', 'id')
+        .values_list('id', 'usuario_id', *campos)
+        .iterator(chunk_size=LOTE)
+    )
+
+
+def convertir_a_deltas(apps, schema_editor):
+    UsuarioHistorico = apps.get_model('App', 'UsuarioHistorico')
+
+    pendientes = []
+    usuario_actual, secuencia, anterior = None, 0, None
+    for pk, usuario_id, *valores in _filas(UsuarioHistorico, *CAMPOS_ANTERIORES):
+        estado = dict(zip(CAMPOS_ANTERIORES, valores))
+        if usuario_id != usuario_actual:
+            usuario_actual, secuencia, anterior = usuario_id, 0, None
+        secuencia += 1
+
+        snapshot = anterior is None or (secuencia - 1) % INTERVALO_SNAPSHOT == 0
+        cambios = {
+            campo: [anterior[campo], valor]
+            for campo, valor in estado.items()
+            if anterior is not None and anterior[campo] != valor
+        }
+        pendientes.append(UsuarioHistorico(
+            id=pk,
+            secuencia=secuencia,
+            cambios=cambios,
+            estado=estado if snapshot else None,
+        ))
+        anterior = estado
+
+        if len(pendientes) >= LOTE:
+            UsuarioHistorico.objects.bulk_update(pendientes, ['secuencia', 'cambios', 'estado'])
+            pendientes = []
+
+    if pendientes:
+        UsuarioHistorico.objects.bulk_update(pendientes, ['secuencia', 'cambios', 'estado'])
+
+
+def convertir_a_copias(apps, schema_editor):
+    """Reverso: rearma la copia completa de cada fila aplicando los deltas"""
+    UsuarioHistorico = apps.get_model('App', 'UsuarioHistorico')
+
+    pendientes = []
+    usuario_actual, estado = None, {}
+    for pk, usuario_id, cambios, snapshot in _filas(UsuarioHistorico, 'cambios', 'estado'):
+        if usuario_id != usuario_actual:
+            usuario_actual, estado = usuario_id, {}
+        if snapshot is not None:
+            estado = dict(snapshot)
+        else:
+            estado.update({campo: nuevo for campo, (anterior, nuevo) in cambios.items()})
+
+        fila = UsuarioHistorico(id=pk)
+        for campo in CAMPOS_ANTERIORES:
+            setattr(fila, campo, estado.get(campo))
+        pendientes.append(fila)
+
+        if len(pendientes) >= LOTE:
+            UsuarioHistorico.objects.bulk_update(pendientes, CAMPOS_ANTERIORES)
+            pendientes = []
+
+    if pendientes:
+        UsuarioHistorico.objects.bulk_update(pendientes, CAMPOS_ANTERIORES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0017_usuariohistorico_deltas'),
+    ]
+
+    operations = [
+        migrations.RunPython(convertir_a_deltas, convertir_a_copias),
+    ]
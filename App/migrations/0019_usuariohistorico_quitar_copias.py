@@ -0,0 +1,46 @@
+# Generated by Django 5.0.6 on 2026-10-19 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0018_convertir_historicos'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='usuariohistorico',
+            name='first_name',
+        ),
+        migrations.RemoveField(
+            model_name='usuariohistorico',
+            name='last_name',
+        ),
+        migrations.RemoveField(
+            model_name='usuariohistorico',
+            name='edad',
+        ),
+        migrations.RemoveField(
+            model_name='usuariohistorico',
+            name='email',
+        ),
+        migrations.RemoveField(
+            model_name='usuariohistorico',
+            name='telefono',
+        ),
+        migrations.RemoveField(
+            model_name='usuariohistorico',
+            name='fecha_nacimiento',
+        ),
+        migrations.AlterField(
+            model_name='usuariohistorico',
+            name='secuencia',
+            field=models.PositiveIntegerField(verbose_name='Secuencia'),
+        ),
+        migrations.AddConstraint(
+            model_name='usuariohistorico',
+            constraint=models.UniqueConstraint(fields=('usuario', 'secuencia'), name='historico_usuario_secuencia_uniq'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-19 03:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0019_usuariohistorico_quitar_copias'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usuariohistorico',
+            index=models.Index(fields=['usuario', 'modified_at'], name='historico_usuario_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.6 on 2026-10-19 03:53
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0020_historico_usuario_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumidorEventos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True, verbose_name='Nombre')),
+                ('ultimo_txid', models.BigIntegerField(default=0, verbose_name='Última Transacción')),
+                ('ultimo_id', models.BigIntegerField(default=0, verbose_name='Último Evento')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+            ],
+            options={
+                'verbose_name': 'Consumidor de Eventos',
+                'verbose_name_plural': 'Consumidores de Eventos',
+            },
+        ),
+        migrations.CreateModel(
+            name='EventoUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('usuario_id', models.BigIntegerField(verbose_name='Usuario')),
+                ('tipo', models.CharField(choices=[('C', 'Creado'), ('M', 'Modificado'), ('E', 'Eliminado')], max_length=1, verbose_name='Tipo')),
+                ('datos', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Datos')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('txid', models.BigIntegerField(db_default=models.Func(function='txid_current', output_field=models.BigIntegerField()), editable=False, verbose_name='Transacción')),
+            ],
+            options={
+                'verbose_name': 'Evento de Usuario',
+                'verbose_name_plural': 'Eventos de Usuarios',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['txid', 'id'], name='evento_txid_id_idx')],
+            },
+        ),
+    ]
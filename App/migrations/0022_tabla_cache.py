@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:12
+"""
+Crea la tabla de las cachés con DatabaseCache (la de coordinación por
+defecto: versiones, locks y el filtro de Bloom, ver settings.CACHES)
+Equivale a `python manage.py createcachetable`; no hace nada si ya existe
+o si ninguna caché usa la base
+"""
+from django.core.management import call_command
+from django.db import migrations
+
+
+def crear_tabla(apps, schema_editor):
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0021_eventousuario'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_tabla, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-19 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0022_tabla_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('usuario_id', models.BigIntegerField(verbose_name='Usuario')),
+                ('ruta', models.CharField(max_length=255, verbose_name='Archivo')),
+                ('desde', models.DateTimeField(verbose_name='Primer Cambio')),
+                ('hasta', models.DateTimeField(verbose_name='Último Cambio')),
+                ('filas', models.PositiveIntegerField(verbose_name='Filas')),
+            ],
+            options={
+                'verbose_name': 'Archivo de Histórico',
+                'verbose_name_plural': 'Archivos de Histórico',
+                'indexes': [models.Index(fields=['usuario_id', 'desde'], name='archivo_historico_usuario_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 04:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0023_archivohistorico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eliminacionmasiva',
+            name='latido',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Último Latido'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-19 04:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0024_eliminacionmasiva_latido'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='usuario',
+            name='usuario_activo_created_idx',
+        ),
+    ]
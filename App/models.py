@@ -3,16 +3,28 @@
 Modelos del sistema NuamExchange
 Define las estructuras de datos para usuarios, auditorías e históricos
 """
-from django.db import models
+import re
+
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Lower, Reverse
+from django.contrib.postgres.indexes import OpClass
 from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 
+from . import diferido
+
+
+# Permite filtrar con email__lower='...' para que la consulta use los
+# índices funcionales LOWER(email) de App_usuario y auth_user
+models.EmailField.register_lookup(Lower)
+
 
 # ==================== VALIDADORES PERSONALIZADOS ====================
 
@@ -64,6 +76,23 @@ def validate_email_domain(value):
         raise ValidationError('Email inválido')
 
 
+def normalizar_telefono(value):
+    """
+    Normaliza un teléfono dejando solo sus dígitos
+    Ejemplo: '+56 9 1234-5678' -> '56912345678'
+    
+    Args:
+        value: Teléfono tal como fue ingresado
+    
+    Returns:
+        str con los dígitos del teléfono, o None si no tiene dígitos
+    """
+    if not value:
+        return None
+    digitos = re.sub(r'\D', '', str(value))
+    return digitos or None
+
+
 # ==================== MODELO USUARIO ====================
 
 class Usuario(models.Model):
@@ -143,6 +172,18 @@ class Usuario(models.Model):
         help_text='Formato: +56912345678'
     )
     
+    # Teléfono normalizado (solo dígitos), se mantiene en save()
+    # Se indexa invertido para que "termina en 5678" sea un rango de índice
+    telefono_digitos = models.CharField(
+        max_length=30,
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Teléfono Normalizado',
+        help_text='Dígitos del teléfono, usado en búsquedas'
+    )
+    
     # Fecha de nacimiento (opcional)
     fecha_nacimiento = models.DateField(
         null=True,
@@ -193,16 +234,60 @@ class Usuario(models.Model):
         verbose_name_plural = "Usuarios"
         
         # Índices para mejorar rendimiento en búsquedas
+        # (email ya queda indexado por unique=True y por usuario_email_lower_uniq)
         indexes = [
-            models.Index(fields=['email']),
             models.Index(fields=['telefono']),
+            # También sirve a los listados activos ordenados por fecha: un
+            # índice parcial por is_active=True sería casi una copia de este
             models.Index(fields=['-created_at']),
+            # Listados y dashboard: casi todo filtra is_active=True y ordena
+            # por nombre, así que se indexa solo la parte activa
+            models.Index(
+                fields=['first_name'],
+                name='usuario_activo_nombre_idx',
+                condition=models.Q(is_active=True),
+            ),
+            models.Index(
+                fields=['last_name'],
+                name='usuario_activo_apellido_idx',
+                condition=models.Q(is_active=True),
+            ),
+            # Consultas por rol ordenadas por fecha
+            models.Index(fields=['rol', 'created_at'], name='usuario_rol_created_idx'),
+            # Búsqueda por sufijo: REVERSE(telefono_digitos) LIKE '8765%'
+            models.Index(
+                OpClass(Reverse('telefono_digitos'), name='text_pattern_ops'),
+                name='usuario_tel_reverso_idx',
+            ),
+        ]
+        
+        # Email único sin importar mayúsculas, garantizado por la base de datos
+        constraints = [
+            models.UniqueConstraint(
+                Lower('email'),
+                name='usuario_email_lower_uniq',
+                violation_error_message='Este correo electrónico ya está registrado',
+            ),
         ]
     
     def __str__(self):
         """Representación en string del usuario"""
         return f"{self.first_name} {self.last_name} <{self.email}>"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Guarda los valores leídos de la base de datos
+        Permite saber qué cambió al guardar (resumen diario, históricos)
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._estado_original = {
+            name: value
+            for name, value in zip(field_names, values)
+            if value is not models.DEFERRED
+        }
+        return instance
+    
     def clean(self):
         """
         Validaciones personalizadas antes de guardar
@@ -245,9 +330,37 @@ class Usuario(models.Model):
         """
         Sobrescribir save para ejecutar validaciones
         """
-        # Ejecutar validaciones antes de guardar
-        self.full_clean()
-        super().save(*args, **kwargs)
+        # Ejecutar validaciones antes de guardar. La unicidad (email, teléfono,
+        # email sin mayúsculas) la garantizan las restricciones de la base:
+        # no se consulta en cada save, los formularios ya la revisaron (con
+        # el filtro de Bloom) y si el INSERT/UPDATE choca se informa abajo
+        self.full_clean(validate_unique=False, validate_constraints=False)
+        
+        # Mantener el teléfono normalizado sincronizado
+        self.telefono_digitos = normalizar_telefono(self.telefono)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'telefono' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'telefono_digitos'}
+        
+        # La fila, su histórico y su evento (señales post_save) se confirman juntos;
+        # si se revierte, dentro de diferido.agrupar() se descartan también
+        # el histórico y el evento pendientes
+        try:
+            with diferido.atomico():
+                super().save(*args, **kwargs)
+        except IntegrityError:
+            # Solo cuando chocó una restricción se consulta cuál fue, para
+            # responder el mismo ValidationError que daba full_clean()
+            self.validate_unique()
+            self.validate_constraints()
+            raise
+        
+        # Lo recién guardado pasa a ser el estado original (las señales
+        # post_save ya compararon contra el estado anterior)
+        self._estado_original = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+        }
 
 class Categoria(models.Model):
     name = models.CharField(max_length=50, null = True, blank=True)
@@ -363,18 +476,101 @@ class ImportAudit(models.Model):
         ordering = ['-uploaded_at']
         verbose_name = "Auditoría de Importación"
         verbose_name_plural = "Auditorías de Importaciones"
+        
+        indexes = [
+            # "Últimas importaciones del usuario" en el home
+            models.Index(fields=['user', '-uploaded_at'], name='importaudit_user_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"Import {self.id} - {self.status} - {self.uploaded_at.date()}"
 
 
+# ==================== MODELO ELIMINACIÓN MASIVA ====================
+
+class EliminacionMasiva(models.Model):
+    """
+    Eliminación definitiva de muchos usuarios, procesada en segundo plano
+    por lotes (ver App/masivo.py). Registra el avance para consultarlo
+    mientras corre
+    """
+
+    STATUS_PENDING = 'PENDING'        # Creada, todavía no empezó
+    STATUS_RUNNING = 'RUNNING'        # Eliminando lotes
+    STATUS_DONE = 'DONE'              # Terminó
+    STATUS_FAILED = 'FAILED'          # Falló (los lotes ya eliminados quedan eliminados)
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En proceso'),
+        (STATUS_DONE, 'Terminada'),
+        (STATUS_FAILED, 'Falló'),
+    ]
+
+    # Usuario que pidió la eliminación
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Usuario'
+    )
+
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Fecha de Creación')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Término')
+
+    # IDs de Usuario seleccionados
+    ids = models.JSONField(default=list, verbose_name='IDs')
+
+    # Avance: IDs recorridos (define desde dónde se retoma) y filas realmente
+    # eliminadas (un ID puede no existir ya)
+    total = models.PositiveIntegerField(default=0, verbose_name='Total')
+    procesados = models.PositiveIntegerField(default=0, verbose_name='Procesados')
+    eliminados = models.PositiveIntegerField(default=0, verbose_name='Eliminados')
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name='Estado'
+    )
+
+    error = models.TextField(blank=True, default='', verbose_name='Error')
+
+    # Se actualiza con cada lote confirmado; identifica al proceso que la
+    # corre y, si queda viejo, permite que otro la retome
+    latido = models.DateTimeField(null=True, blank=True, verbose_name='Último Latido')
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Eliminación Masiva'
+        verbose_name_plural = 'Eliminaciones Masivas'
+
+    def __str__(self):
+        return f"Eliminación {self.id} - {self.status} - {self.procesados}/{self.total}"
+
+
 # ==================== MODELO HISTÓRICO DE USUARIOS ====================
 
 class UsuarioHistorico(models.Model):
     """
-    Histórico de cambios en usuarios
-    Guarda una copia de los datos cada vez que se modifica un usuario
+    Histórico de cambios en usuarios, guardado como deltas
+
+    Cada fila registra solo los campos que cambiaron, con su valor anterior
+    y el nuevo: {"email": ["viejo@x.com", "nuevo@x.com"]}. Cada
+    INTERVALO_SNAPSHOT cambios (y en el primero) la fila guarda además el
+    estado completo, así reconstruir un estado nunca aplica más de
+    INTERVALO_SNAPSHOT - 1 deltas.
     """
+
+    # Campos de Usuario que se registran
+    CAMPOS = (
+        'first_name', 'last_name', 'edad', 'email', 'telefono',
+        'fecha_nacimiento', 'rol', 'categoria_id', 'is_active',
+    )
+
+    # Cada cuántos cambios de un usuario se guarda el estado completo
+    INTERVALO_SNAPSHOT = 20
     
     # Usuario al que pertenece este histórico
     usuario = models.ForeignKey(
@@ -384,13 +580,23 @@ class UsuarioHistorico(models.Model):
         verbose_name='Usuario'
     )
     
-    # Datos históricos (copia del estado anterior)
-    first_name = models.CharField(max_length=100, verbose_name='Nombre')
-    last_name = models.CharField(max_length=100, verbose_name='Apellido')
-    edad = models.PositiveIntegerField(null=True, blank=True, verbose_name='Edad')
-    email = models.EmailField(max_length=254, verbose_name='Email')
-    telefono = models.CharField(max_length=30, blank=True, null=True, verbose_name='Teléfono')
-    fecha_nacimiento = models.DateField(null=True, blank=True, verbose_name='Fecha Nacimiento')
+    # Número de cambio del usuario (1, 2, 3...)
+    secuencia = models.PositiveIntegerField(verbose_name='Secuencia')
+    
+    # Campos modificados: {"campo": [anterior, nuevo]}
+    cambios = models.JSONField(
+        default=dict,
+        encoder=DjangoJSONEncoder,
+        verbose_name='Cambios'
+    )
+    
+    # Estado completo después del cambio, solo en los snapshots
+    estado = models.JSONField(
+        null=True,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+        verbose_name='Estado Completo'
+    )
     
     # Fecha de modificación
     modified_at = models.DateTimeField(
@@ -418,9 +624,291 @@ class UsuarioHistorico(models.Model):
         ordering = ['-modified_at']
         verbose_name = "Histórico de Usuario"
         verbose_name_plural = "Históricos de Usuarios"
+        indexes = [
+            # Estado de un usuario a una fecha: último cambio con modified_at <= fecha
+            models.Index(fields=['usuario', 'modified_at'], name='historico_usuario_fecha_idx'),
+        ]
+        constraints = [
+            # También es el índice para "último cambio del usuario"
+            models.UniqueConstraint(
+                fields=['usuario', 'secuencia'],
+                name='historico_usuario_secuencia_uniq',
+            ),
+        ]
     
     def __str__(self):
         return f"Histórico de {self.usuario} - {self.modified_at}"
+    
+    @property
+    def es_snapshot(self):
+        return self.estado is not None
+    
+    @classmethod
+    def estado_de(cls, usuario):
+        """Valores actuales de los campos registrados de un Usuario"""
+        return {campo: getattr(usuario, campo) for campo in cls.CAMPOS}
+    
+    @classmethod
+    def diferencias(cls, anterior, actual):
+        """
+        Campos que cambiaron entre dos estados
+        (los que no están en anterior no se comparan)
+        
+        Returns:
+            dict campo -> [valor anterior, valor nuevo]
+        """
+        return {
+            campo: [anterior[campo], valor]
+            for campo, valor in actual.items()
+            if campo in anterior and anterior[campo] != valor
+        }
+    
+    @classmethod
+    def ultimas_secuencias(cls, usuario_ids):
+        """
+        Última secuencia de cada usuario, en una sola consulta
+        
+        Returns:
+            dict usuario_id -> secuencia (sin los que no tienen histórico)
+        """
+        return dict(
+            cls.objects.filter(usuario_id__in=usuario_ids)
+            .order_by()
+            .values('usuario_id')
+            .annotate(ultima=models.Max('secuencia'))
+            .values_list('usuario_id', 'ultima')
+        )
+    
+    @classmethod
+    def pendiente(cls, usuario, anterior=None, **extra):
+        """
+        Arma (sin guardar) la fila de un cambio; la secuencia se asigna
+        al guardarla con preparar_lote()
+        
+        Args:
+            usuario: Usuario ya modificado
+            anterior: dict con los valores antes del cambio; si no se
+                conocen (None) la fila es un snapshot
+            **extra: modified_by, change_reason
+        
+        Returns:
+            UsuarioHistorico, o None si no cambió ningún campo registrado
+        """
+        actual = cls.estado_de(usuario)
+        cambios = cls.diferencias(anterior or {}, actual)
+        if anterior is not None and not cambios:
+            return None
+        historico = cls(
+            usuario=usuario,
+            cambios=cambios,
+            estado=actual if anterior is None else None,
+            **extra
+        )
+        historico._actual = actual
+        return historico
+    
+    @classmethod
+    def preparar_lote(cls, historicos):
+        """
+        Numera filas armadas con pendiente() a continuación de la última
+        secuencia de cada usuario (una consulta para todo el lote) y guarda
+        el estado completo en las que caen en un snapshot
+        
+        Bloquea los usuarios (SELECT ... FOR UPDATE, en orden de id) antes de
+        numerar, así dos transacciones no toman la misma secuencia; debe
+        llamarse dentro de la transacción que guarda las filas
+        """
+        usuario_ids = sorted({historico.usuario_id for historico in historicos})
+        list(
+            Usuario.objects.filter(id__in=usuario_ids)
+            .order_by('id').select_for_update().values_list('id', flat=True)
+        )
+        ultimas = cls.ultimas_secuencias(usuario_ids)
+        for historico in historicos:
+            historico.secuencia = ultimas.get(historico.usuario_id, 0) + 1
+            ultimas[historico.usuario_id] = historico.secuencia
+            if (historico.secuencia - 1) % cls.INTERVALO_SNAPSHOT == 0:
+                historico.estado = historico._actual
+        return historicos
+
+
+class ArchivoHistorico(models.Model):
+    """
+    Índice del histórico archivado (ver App/historico.py): una fila por
+    usuario y archivo .ndjson.gz con filas suyas. Las lecturas con
+    archivo=True abren solo los archivos del usuario en vez de recorrer todos
+    """
+    
+    # Sin FK: el archivo sigue existiendo aunque el usuario se borre
+    usuario_id = models.BigIntegerField(verbose_name='Usuario')
+    
+    # Ruta en el storage por defecto
+    ruta = models.CharField(max_length=255, verbose_name='Archivo')
+    
+    # Rango de modified_at de las filas del usuario en el archivo
+    desde = models.DateTimeField(verbose_name='Primer Cambio')
+    hasta = models.DateTimeField(verbose_name='Último Cambio')
+    
+    filas = models.PositiveIntegerField(verbose_name='Filas')
+    
+    class Meta:
+        verbose_name = "Archivo de Histórico"
+        verbose_name_plural = "Archivos de Histórico"
+        indexes = [
+            models.Index(fields=['usuario_id', 'desde'], name='archivo_historico_usuario_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ruta} (usuario {self.usuario_id})"
+
+
+# ==================== MODELO EVENTOS DE USUARIOS (OUTBOX) ====================
+
+class EventoUsuario(models.Model):
+    """
+    Registro de cambios de Usuario, solo de inserción (outbox transaccional)
+    
+    Cada alta, modificación o eliminación agrega un evento en la misma
+    transacción que el cambio: si el cambio se confirma, el evento también.
+    `python manage.py consumir_eventos` los entrega a otros sistemas en
+    orden de (txid, id) y recuerda hasta dónde llegó cada consumidor.
+    
+    txid es la transacción que escribió el evento: los ids se asignan al
+    insertar pero las transacciones confirman en otro orden, así que un
+    consumidor que avanzara por id podría saltarse un evento que todavía
+    no se veía. Leyendo solo transacciones ya terminadas (txid menor que
+    el xmin del snapshot actual) y avanzando por (txid, id) no pasa.
+    """
+    
+    TIPO_CREADO = 'C'
+    TIPO_MODIFICADO = 'M'
+    TIPO_ELIMINADO = 'E'
+    
+    TIPO_CHOICES = [
+        (TIPO_CREADO, 'Creado'),
+        (TIPO_MODIFICADO, 'Modificado'),
+        (TIPO_ELIMINADO, 'Eliminado'),
+    ]
+    
+    # Sin FK: los eventos sobreviven a la eliminación del usuario
+    usuario_id = models.BigIntegerField(verbose_name='Usuario')
+    
+    tipo = models.CharField(max_length=1, choices=TIPO_CHOICES, verbose_name='Tipo')
+    
+    # Creado: estado completo; modificado: {"campo": [anterior, nuevo]};
+    # eliminado: email
+    datos = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name='Datos')
+    
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Fecha')
+    
+    # Transacción que escribió el evento (la asigna PostgreSQL)
+    txid = models.BigIntegerField(
+        db_default=models.Func(function='txid_current', output_field=models.BigIntegerField()),
+        editable=False,
+        verbose_name='Transacción'
+    )
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Evento de Usuario'
+        verbose_name_plural = 'Eventos de Usuarios'
+        indexes = [
+            # Lectura de los consumidores: WHERE (txid, id) > offset ORDER BY txid, id
+            models.Index(fields=['txid', 'id'], name='evento_txid_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Evento {self.id} - {self.get_tipo_display()} usuario {self.usuario_id}"
+    
+    @classmethod
+    def de_guardado(cls, usuario, created, anterior=None):
+        """
+        Arma (sin guardar) el evento de un alta o modificación
+        
+        Args:
+            usuario: Usuario recién guardado
+            created: True si es un alta
+            anterior: dict con los valores antes del cambio (modificaciones)
+        
+        Returns:
+            EventoUsuario, o None si no cambió ningún campo registrado
+        """
+        actual = UsuarioHistorico.estado_de(usuario)
+        if created or anterior is None:
+            tipo = cls.TIPO_CREADO if created else cls.TIPO_MODIFICADO
+            return cls(usuario_id=usuario.pk, tipo=tipo, datos=actual)
+        cambios = UsuarioHistorico.diferencias(anterior, actual)
+        if not cambios:
+            return None
+        return cls(usuario_id=usuario.pk, tipo=cls.TIPO_MODIFICADO, datos=cambios)
+    
+    @classmethod
+    def de_eliminacion(cls, usuario_id, email):
+        """Arma (sin guardar) el evento de una eliminación"""
+        return cls(usuario_id=usuario_id, tipo=cls.TIPO_ELIMINADO, datos={'email': email})
+
+
+class ConsumidorEventos(models.Model):
+    """
+    Offset de cada consumidor de EventoUsuario: (txid, id) del último evento entregado
+    """
+    
+    nombre = models.CharField(max_length=100, unique=True, verbose_name='Nombre')
+    ultimo_txid = models.BigIntegerField(default=0, verbose_name='Última Transacción')
+    ultimo_id = models.BigIntegerField(default=0, verbose_name='Último Evento')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última Actualización')
+    
+    class Meta:
+        verbose_name = 'Consumidor de Eventos'
+        verbose_name_plural = 'Consumidores de Eventos'
+    
+    def __str__(self):
+        return f"{self.nombre} - {self.ultimo_txid}/{self.ultimo_id}"
+
+
+# ==================== MODELO RESUMEN DIARIO DE USUARIOS ====================
+
+class ResumenDiarioUsuario(models.Model):
+    """
+    Tabla de agregados (rollup) de usuarios por día de creación
+    
+    Cada usuario cuenta en exactamente un bucket (fecha, rol, categoria, is_active).
+    Se mantiene incrementalmente desde las señales de Usuario (App/resumen.py)
+    y se puede reconstruir con: python manage.py reconstruir_resumen
+    """
+    
+    # Día de creación del usuario (zona horaria local)
+    fecha = models.DateField(verbose_name='Fecha')
+    
+    rol = models.CharField(max_length=55, verbose_name='Rol')
+    
+    categoria = models.ForeignKey(
+        Categoria,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name='Categoría'
+    )
+    
+    is_active = models.BooleanField(verbose_name='Activo')
+    
+    # Cantidad de usuarios en el bucket
+    total = models.IntegerField(default=0, verbose_name='Total')
+    
+    class Meta:
+        ordering = ['fecha']
+        verbose_name = 'Resumen Diario de Usuarios'
+        verbose_name_plural = 'Resúmenes Diarios de Usuarios'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'rol', 'categoria', 'is_active'],
+                name='resumen_diario_bucket_uniq',
+                nulls_distinct=False,
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha} {self.rol} {self.categoria_id} activo={self.is_active}: {self.total}"
 
 
 # ==================== MODELO PERFIL DE USUARIO (ROLES) ====================
@@ -552,13 +1040,31 @@ def create_usuario_historico(sender, instance, created, **kwargs):
     """
     # Solo crear histórico para actualizaciones (no para nuevos registros)
     if not created:
-        UsuarioHistorico.objects.create(
-            usuario=instance,
-            first_name=instance.first_name,
-            last_name=instance.last_name,
-            edad=instance.edad,
-            email=instance.email,
-            telefono=instance.telefono,
-            fecha_nacimiento=instance.fecha_nacimiento
-        )
-# App/models.py
\ No newline at end of file
+        # _estado_original todavía tiene los valores leídos de la base
+        # (Usuario.save lo actualiza después de las señales)
+        anterior = getattr(instance, '_estado_original', None)
+        historico = UsuarioHistorico.pendiente(instance, anterior)
+        if historico is not None:
+            # Dentro de diferido.agrupar() se escribe con las demás al final
+            diferido.guardar(historico)
+
+
+@receiver(post_save, sender=Usuario)
+def create_evento_guardado(sender, instance, created, **kwargs):
+    """
+    Señal: Agregar el evento de alta o modificación al outbox
+    Corre dentro de la transacción de Usuario.save
+    """
+    anterior = None if created else getattr(instance, '_estado_original', None)
+    evento = EventoUsuario.de_guardado(instance, created, anterior)
+    if evento is not None:
+        diferido.guardar(evento)
+
+
+@receiver(post_delete, sender=Usuario)
+def create_evento_eliminacion(sender, instance, **kwargs):
+    """
+    Señal: Agregar el evento de eliminación al outbox
+    Corre dentro de la transacción del delete()
+    """
+    diferido.guardar(EventoUsuario.de_eliminacion(instance.pk, instance.email))
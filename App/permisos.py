@@ -0,0 +1,160 @@
+# App/permisos.py
+"""
+Permisos de cada User resueltos una vez y servidos desde caché
+
+Todo lo que decide la autorización (grupos, UserProfile.role, categoría
+del Usuario vinculado y su nombre, is_superuser) se resuelve con una sola consulta y
+queda en caché como un snapshot por usuario. En estado estable
+role_required, editar_usuario y el home no consultan la base para esto.
+
+Las señales de App/signals.py borran el snapshot de un usuario cuando
+cambian sus grupos, su perfil, su Usuario o su User; si cambia un Group
+o una Categoria (por ejemplo se renombran) se cambia la versión y caducan
+todos. Nada de Permisos consulta la base: sirve igual en las vistas async.
+La versión también sale de la memoria del proceso (cache_niveles.version):
+en estado estable de() no hace ninguna consulta.
+"""
+from django.contrib.auth.models import User
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from . import cache_niveles
+
+
+CLAVE_VERSION = 'permisos:version'
+CLAVE_PERMISOS = 'permisos:{version}:{user_id}'
+
+# Red de seguridad: aunque falle una invalidación, el snapshot se refresca
+TIMEOUT_PERMISOS = 60 * 10  # 10 minutos
+
+ROL_DEFECTO = 'Employee'
+
+
+class Permisos:
+    """Snapshot de lo que decide la autorización de un User"""
+
+    def __init__(self, grupos=(), rol=ROL_DEFECTO, categoria_id=None, categoria=None,
+                 es_superusuario=False):
+        self.grupos = frozenset(grupos)
+        self.rol = rol or ROL_DEFECTO
+        self.categoria_id = categoria_id
+        self.categoria = categoria
+        self.es_superusuario = es_superusuario
+
+    def en_grupos(self, nombres):
+        """True si pertenece a alguno de los grupos"""
+        return any(nombre in self.grupos for nombre in nombres)
+
+    @property
+    def puede_editar(self):
+        """Solo superusuarios y usuarios de categoría ADMIN editan usuarios"""
+        return self.es_superusuario or self.categoria == 'ADMIN'
+
+    @property
+    def huella(self):
+        """Texto que cambia si cambia algo del snapshot (para ETags)"""
+        return '|'.join([
+            ','.join(sorted(self.grupos)), self.rol, str(self.categoria_id),
+            self.categoria or '', str(self.es_superusuario),
+        ])
+
+
+ANONIMO = Permisos()
+
+
+# ==================== LECTURA ====================
+
+def _consulta(user_id):
+    """Grupos, rol y categoría en una consulta (los grupos agregados en un array)"""
+    return (
+        User.objects.filter(pk=user_id)
+        .values('is_superuser', 'profile__role', 'usuario__categoria_id', 'usuario__categoria__name')
+        .annotate(nombres=ArrayAgg('groups__name', filter=Q(groups__isnull=False), default=[]))
+        .order_by('pk')
+    )
+
+
+def _datos(fila):
+    if fila is None:
+        return {}
+    return {
+        'grupos': fila['nombres'],
+        'rol': fila['profile__role'],
+        'categoria_id': fila['usuario__categoria_id'],
+        'categoria': fila['usuario__categoria__name'],
+        'es_superusuario': fila['is_superuser'],
+    }
+
+
+def de(user):
+    """
+    Permisos de un User, desde caché (o resueltos con una consulta)
+    Quedan también en el objeto user para el resto del request
+
+    Args:
+        user: request.user (puede ser anónimo)
+
+    Returns:
+        Permisos
+    """
+    if not user.is_authenticated:
+        return ANONIMO
+    permisos = getattr(user, '_permisos', None)
+    if permisos is None:
+        version = cache_niveles.version(CLAVE_VERSION)
+        clave = CLAVE_PERMISOS.format(version=version, user_id=user.pk)
+        datos = cache.get(clave)
+        if datos is None:
+            datos = _datos(_consulta(user.pk).first())
+            cache.set(clave, datos, TIMEOUT_PERMISOS)
+        permisos = user._permisos = Permisos(**datos)
+    return permisos
+
+
+async def ade(user):
+    """Versión async de de()"""
+    if not user.is_authenticated:
+        return ANONIMO
+    permisos = getattr(user, '_permisos', None)
+    if permisos is None:
+        version = await cache_niveles.aversion(CLAVE_VERSION)
+        clave = CLAVE_PERMISOS.format(version=version, user_id=user.pk)
+        datos = await cache.aget(clave)
+        if datos is None:
+            datos = _datos(await _consulta(user.pk).afirst())
+            await cache.aset(clave, datos, TIMEOUT_PERMISOS)
+        permisos = user._permisos = Permisos(**datos)
+    return permisos
+
+
+# ==================== INVALIDACIÓN ====================
+
+def invalidar(user_ids):
+    """
+    Descarta el snapshot de algunos usuarios al confirmar la transacción
+    (antes, otro request podría volver a cachear los permisos viejos)
+
+    Args:
+        user_ids: IDs de User (se ignoran los None)
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    def descartar():
+        version = cache_niveles.version(CLAVE_VERSION)
+        cache.delete_many([
+            CLAVE_PERMISOS.format(version=version, user_id=user_id) for user_id in user_ids
+        ])
+
+    transaction.on_commit(descartar)
+
+
+def invalidar_todos():
+    """
+    Cambia la versión al confirmar: caducan los snapshots de todos los
+    usuarios (cambió un Group o una Categoria)
+    """
+    transaction.on_commit(lambda: cache_niveles.cambiar_version(CLAVE_VERSION))
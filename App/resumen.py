@@ -0,0 +1,320 @@
+# App/resumen.py
+"""
+Mantenimiento y lectura del resumen diario de usuarios (ResumenDiarioUsuario)
+
+Cada usuario pertenece a un bucket (fecha de creación, rol, categoria, is_active).
+Crear, modificar o eliminar un usuario mueve contadores entre buckets,
+así las tendencias se leen en O(días) en vez de recorrer App_usuario.
+"""
+import asyncio
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ResumenDiarioUsuario, Usuario
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== BUCKETS ====================
+
+def bucket_de(valores):
+    """
+    Calcula el bucket de un usuario a partir de sus valores
+
+    Args:
+        valores: dict con created_at, rol, categoria_id e is_active
+
+    Returns:
+        tuple (fecha, rol, categoria_id, is_active) o None si faltan datos
+    """
+    try:
+        created_at = valores['created_at']
+        return (
+            timezone.localtime(created_at).date(),
+            valores['rol'],
+            valores['categoria_id'],
+            bool(valores['is_active']),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _valores_actuales(usuario):
+    return {
+        'created_at': usuario.created_at,
+        'rol': usuario.rol,
+        'categoria_id': usuario.categoria_id,
+        'is_active': usuario.is_active,
+    }
+
+
+def aplicar_deltas(deltas):
+    """
+    Suma los deltas a sus buckets con UPDATE ... SET total = total + n
+
+    Si el bucket no existe se crea; si otro proceso lo creó en paralelo
+    (IntegrityError) se reintenta el UPDATE.
+
+    Args:
+        deltas: Counter {bucket: delta}
+    """
+    for (fecha, rol, categoria_id, is_active), delta in deltas.items():
+        if not delta:
+            continue
+
+        filtro = {
+            'fecha': fecha,
+            'rol': rol,
+            'categoria_id': categoria_id,
+            'is_active': is_active,
+        }
+        actualizados = ResumenDiarioUsuario.objects.filter(**filtro).update(
+            total=F('total') + delta
+        )
+        if actualizados or delta < 0:
+            continue
+
+        try:
+            with transaction.atomic():
+                ResumenDiarioUsuario.objects.create(total=delta, **filtro)
+        except IntegrityError:
+            ResumenDiarioUsuario.objects.filter(**filtro).update(total=F('total') + delta)
+
+
+# ==================== ACTUALIZACIÓN INCREMENTAL ====================
+
+def registrar_guardado(usuario, created):
+    """
+    Mueve el usuario de bucket después de crearlo o modificarlo
+
+    Args:
+        usuario: Instancia de Usuario recién guardada
+        created: True si es un nuevo registro
+    """
+    actual = bucket_de(_valores_actuales(usuario))
+    anterior = None
+    if not created:
+        anterior = bucket_de(getattr(usuario, '_estado_original', {}))
+        if anterior is None:
+            # Sin el estado anterior (instancia armada a mano, no leída de la
+            # base) no se sabe de qué bucket sale: sumarlo al actual lo
+            # contaría dos veces. Lo corrige `python manage.py reconstruir_resumen`
+            logger.warning(
+                f'Resumen diario: usuario {usuario.pk} modificado sin estado '
+                f'original, no se mueve de bucket'
+            )
+            return
+
+    if anterior == actual:
+        return
+
+    deltas = Counter()
+    if anterior is not None:
+        deltas[anterior] -= 1
+    if actual is not None:
+        deltas[actual] += 1
+    aplicar_deltas(deltas)
+
+
+def registrar_eliminacion(usuario):
+    """
+    Descuenta un usuario eliminado de su bucket
+
+    Args:
+        usuario: Instancia de Usuario eliminada
+    """
+    valores = getattr(usuario, '_estado_original', None) or _valores_actuales(usuario)
+    bucket = bucket_de(valores)
+    if bucket is not None:
+        aplicar_deltas(Counter({bucket: -1}))
+
+
+# ==================== RECONSTRUCCIÓN ====================
+
+def calcular_buckets(usuarios=None):
+    """
+    Agrupa App_usuario completo (o los usuarios indicados) por bucket
+    con una sola consulta GROUP BY
+
+    Args:
+        usuarios: QuerySet de Usuario (por defecto, todos)
+
+    Returns:
+        QuerySet de dicts con fecha, rol, categoria, is_active y total
+    """
+    if usuarios is None:
+        usuarios = Usuario.objects.all()
+    return (
+        usuarios
+        .order_by()
+        .annotate(fecha=TruncDate('created_at'))
+        .values('fecha', 'rol', 'categoria', 'is_active')
+        .annotate(total=Count('id'))
+    )
+
+
+@transaction.atomic
+def reconstruir():
+    """
+    Reemplaza el resumen completo por uno calculado desde App_usuario
+
+    Returns:
+        int: Cantidad de buckets generados
+    """
+    ResumenDiarioUsuario.objects.all().delete()
+    filas = [
+        ResumenDiarioUsuario(
+            fecha=fila['fecha'],
+            rol=fila['rol'],
+            categoria_id=fila['categoria'],
+            is_active=fila['is_active'],
+            total=fila['total'],
+        )
+        for fila in calcular_buckets()
+    ]
+    ResumenDiarioUsuario.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
+
+
+# ==================== LECTURA ====================
+
+def _activos():
+    return ResumenDiarioUsuario.objects.filter(is_active=True)
+
+
+def _del_dia(fecha):
+    return ResumenDiarioUsuario.objects.filter(fecha=fecha)
+
+
+def total_activos():
+    """Cantidad de usuarios activos"""
+    resultado = _activos().aggregate(total=Sum('total'))
+    return resultado['total'] or 0
+
+
+def total_registros():
+    """Cantidad de usuarios, activos o no"""
+    resultado = ResumenDiarioUsuario.objects.aggregate(total=Sum('total'))
+    return resultado['total'] or 0
+
+
+def creados_en(fecha):
+    """
+    Cantidad de usuarios creados en un día (activos o no)
+
+    Args:
+        fecha: date local
+    """
+    resultado = _del_dia(fecha).aggregate(total=Sum('total'))
+    return resultado['total'] or 0
+
+
+def _consultas_tendencias(dias):
+    """
+    Rango de fechas y consultas de tendencias(), sin ejecutar
+
+    Returns:
+        tuple (desde, hasta, dict nombre -> QuerySet de dicts)
+    """
+    hasta = timezone.localdate()
+    desde = hasta - timedelta(days=dias - 1)
+    rango = ResumenDiarioUsuario.objects.filter(fecha__gte=desde, fecha__lte=hasta).order_by()
+
+    consultas = {
+        'por_dia': rango.values('fecha', 'is_active').annotate(total=Sum('total')),
+        'por_rol': rango.values('rol').annotate(total=Sum('total')),
+        'por_categoria': rango.values('categoria', 'categoria__name').annotate(total=Sum('total')),
+        'estados': ResumenDiarioUsuario.objects.order_by().values('is_active').annotate(total=Sum('total')),
+    }
+    return desde, hasta, consultas
+
+
+def _armar_tendencias(desde, hasta, filas):
+    """
+    Arma la respuesta de tendencias() a partir de las filas ya leídas
+
+    Args:
+        filas: dict nombre -> lista de dicts (mismas claves que _consultas_tendencias)
+    """
+    por_dia = {}
+    for fila in filas['por_dia']:
+        dia = por_dia.setdefault(fila['fecha'], {'fecha': fila['fecha'].isoformat(), 'activos': 0, 'inactivos': 0})
+        dia['activos' if fila['is_active'] else 'inactivos'] += fila['total']
+    for dia in por_dia.values():
+        dia['total'] = dia['activos'] + dia['inactivos']
+
+    por_rol = {fila['rol']: fila['total'] for fila in filas['por_rol']}
+
+    por_categoria = [
+        {'id': fila['categoria'], 'nombre': fila['categoria__name'], 'total': fila['total']}
+        for fila in filas['por_categoria']
+    ]
+
+    estados = {fila['is_active']: fila['total'] for fila in filas['estados']}
+
+    return {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'por_dia': [por_dia[fecha] for fecha in sorted(por_dia)],
+        'por_rol': por_rol,
+        'por_categoria': por_categoria,
+        'activos': estados.get(True, 0),
+        'inactivos': estados.get(False, 0),
+    }
+
+
+def tendencias(dias=30):
+    """
+    Series de usuarios creados por día y totales por rol, categoría y estado
+
+    Args:
+        dias: Cantidad de días hacia atrás (incluye hoy)
+
+    Returns:
+        dict listo para serializar a JSON
+    """
+    desde, hasta, consultas = _consultas_tendencias(dias)
+    filas = {nombre: list(qs) for nombre, qs in consultas.items()}
+    return _armar_tendencias(desde, hasta, filas)
+
+
+# ==================== LECTURA ASYNC ====================
+# Variantes para las vistas async (App/views_async.py), con el ORM async
+
+async def _asumar(queryset):
+    resultado = await queryset.aaggregate(total=Sum('total'))
+    return resultado['total'] or 0
+
+
+async def atotal_activos():
+    """Versión async de total_activos()"""
+    return await _asumar(_activos())
+
+
+async def atotal_registros():
+    """Versión async de total_registros()"""
+    return await _asumar(ResumenDiarioUsuario.objects.all())
+
+
+async def acreados_en(fecha):
+    """Versión async de creados_en()"""
+    return await _asumar(_del_dia(fecha))
+
+
+async def _alistar(queryset):
+    return [fila async for fila in queryset]
+
+
+async def atendencias(dias=30):
+    """
+    Versión async de tendencias(): las cuatro consultas se lanzan juntas
+    """
+    desde, hasta, consultas = _consultas_tendencias(dias)
+    resultados = await asyncio.gather(*(_alistar(qs) for qs in consultas.values()))
+    return _armar_tendencias(desde, hasta, dict(zip(consultas, resultados)))
@@ -0,0 +1,186 @@
+# App/signals.py
+"""
+Señales que mantienen al día las cachés y estructuras derivadas
+Se registran en AppConfig.ready() (App/apps.py)
+
+Las señales que crean registros (perfil, usuario autenticado, histórico)
+siguen en App/models.py.
+"""
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Usuario, ImportAudit, Categoria, UserProfile
+from . import bloom
+from . import categorias
+from . import dashboard
+from . import permisos
+from . import resumen
+from .indice_usuarios import indice
+
+
+# ==================== RESUMEN DIARIO ====================
+
+@receiver(post_save, sender=Usuario)
+def actualizar_resumen_guardado(sender, instance, created, **kwargs):
+    """
+    Señal: Mover el usuario de bucket en ResumenDiarioUsuario
+    """
+    resumen.registrar_guardado(instance, created)
+
+
+@receiver(post_delete, sender=Usuario)
+def actualizar_resumen_eliminacion(sender, instance, **kwargs):
+    """
+    Señal: Descontar el usuario eliminado de ResumenDiarioUsuario
+    """
+    resumen.registrar_eliminacion(instance)
+
+
+# ==================== DASHBOARD ====================
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_dashboard_usuarios(sender, instance, **kwargs):
+    """
+    Señal: Invalidar estadísticas del home cuando cambia un Usuario
+    (se aplica al confirmar la transacción de Usuario.save)
+    """
+    dashboard.invalidar_estadisticas_usuarios()
+
+
+@receiver(post_save, sender=ImportAudit)
+@receiver(post_delete, sender=ImportAudit)
+def invalidar_dashboard_importaciones(sender, instance, **kwargs):
+    """
+    Señal: Invalidar importaciones recientes del usuario que subió el archivo
+    """
+    dashboard.invalidar_importaciones_recientes(instance.user_id)
+
+
+# ==================== ÍNDICE EN MEMORIA ====================
+
+@receiver(post_save, sender=Usuario)
+def actualizar_indice_guardado(sender, instance, **kwargs):
+    """
+    Señal: Actualizar el usuario en el índice en memoria de este proceso
+    """
+    if settings.INDICE_USUARIOS_MEMORIA:
+        indice.registrar_guardado(instance)
+
+
+@receiver(post_delete, sender=Usuario)
+def actualizar_indice_eliminacion(sender, instance, **kwargs):
+    """
+    Señal: Quitar el usuario eliminado del índice en memoria de este proceso
+    """
+    if settings.INDICE_USUARIOS_MEMORIA:
+        indice.registrar_eliminacion(instance)
+
+
+# ==================== FILTRO DE BLOOM ====================
+
+@receiver(post_save, sender=Usuario)
+def registrar_bloom_usuario(sender, instance, **kwargs):
+    """
+    Señal: Agregar email y teléfono del Usuario al filtro de Bloom
+    """
+    bloom.registrar(bloom.claves_usuario(instance))
+
+
+@receiver(post_save, sender=User)
+def registrar_bloom_user(sender, instance, **kwargs):
+    """
+    Señal: Agregar el email del User al filtro de Bloom
+    """
+    clave = bloom.clave_email(instance.email)
+    if clave:
+        bloom.registrar([clave])
+
+
+# ==================== CATEGORÍAS ====================
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_categorias(sender, instance, **kwargs):
+    """
+    Señal: Recargar el mapa nombre <-> id de categorías
+    """
+    categorias.invalidar()
+
+
+# ==================== PERMISOS ====================
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_permisos_grupos(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Señal: Descartar los permisos de los usuarios que entraron o salieron de un grupo
+    (user.groups.add(...) o group.user_set.add(...))
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        permisos.invalidar([instance.pk])
+    elif pk_set is not None:
+        permisos.invalidar(pk_set)
+    else:
+        # group.user_set.clear(): no se sabe a quiénes afectó
+        permisos.invalidar_todos()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidar_permisos_grupo(sender, instance, **kwargs):
+    """
+    Señal: Un grupo cambió de nombre o se eliminó: caducan todos los permisos
+    """
+    permisos.invalidar_todos()
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_permisos_categoria(sender, instance, **kwargs):
+    """
+    Señal: Una categoría cambió de nombre o se eliminó: el snapshot guarda
+    el nombre (puede_editar), caducan todos los permisos
+    """
+    permisos.invalidar_todos()
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidar_permisos_perfil(sender, instance, **kwargs):
+    """
+    Señal: Descartar los permisos cuando cambia el rol del perfil
+    """
+    permisos.invalidar([instance.user_id])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_permisos_user(sender, instance, **kwargs):
+    """
+    Señal: Descartar los permisos cuando cambia el User (is_superuser)
+    """
+    permisos.invalidar([instance.pk])
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_permisos_usuario(sender, instance, created, **kwargs):
+    """
+    Señal: Descartar los permisos si cambió la categoría o el User vinculado
+    """
+    anterior = getattr(instance, '_estado_original', None) or {}
+    if created or any(
+        anterior.get(campo) != getattr(instance, campo) for campo in ('categoria_id', 'user_id')
+    ):
+        permisos.invalidar([instance.user_id, anterior.get('user_id')])
+
+
+@receiver(post_delete, sender=Usuario)
+def invalidar_permisos_usuario_eliminado(sender, instance, **kwargs):
+    """
+    Señal: El User vinculado se queda sin categoría
+    """
+    permisos.invalidar([instance.user_id])
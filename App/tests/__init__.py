@@ -0,0 +1,56 @@
+# App/tests/__init__.py
+"""
+Pruebas de la app
+
+Se corren con `python manage.py test App` (crean una base de prueba en
+PostgreSQL). Las cachés compartidas van a memoria para no tocar
+CACHE_DIRECTORIO; la de coordinación sigue en la tabla cache_compartida
+de la base de prueba, que se revierte con cada test.
+"""
+from django.test import override_settings
+
+from ..models import Categoria, Usuario
+
+
+CACHES_PRUEBA = {
+    'default': {
+        'BACKEND': 'App.cache_niveles.CacheNiveles',
+        'LOCATION': 'compartida',
+    },
+    'compartida': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'coordinacion': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_compartida',
+    },
+}
+
+# Configuración común: sin bus ni filtro de Bloom, cachés en memoria
+configuracion_prueba = override_settings(
+    CACHES=CACHES_PRUEBA,
+    INVALIDACION_BUS=False,
+    BLOOM_USUARIOS='off',
+)
+
+
+def crear_categoria(nombre='General'):
+    return Categoria.objects.create(name=nombre)
+
+
+def crear_usuario(email, categoria, **campos):
+    """
+    Crea un Usuario válido (save() corre full_clean: contraseña y categoría
+    son obligatorias)
+    """
+    datos = {
+        'first_name': 'Nombre',
+        'last_name': 'Apellido',
+        'edad': 30,
+        'password': 'secreta123',
+        'categoria': categoria,
+    }
+    datos.update(campos)
+    usuario = Usuario(email=email, **datos)
+    usuario.save()
+    return usuario
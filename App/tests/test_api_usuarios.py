@@ -0,0 +1,103 @@
+# App/tests/test_api_usuarios.py
+"""
+Paginación por cursor (keyset) de api_usuarios
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Usuario
+from ..views import CAMPOS_ORDEN_NULOS, ORDENAMIENTOS_PERMITIDOS, _codificar_cursor
+from . import configuracion_prueba, crear_categoria, crear_usuario
+
+
+@configuracion_prueba
+class CursorApiUsuariosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = crear_categoria()
+        for i in range(23):
+            # Valores repetidos (desempate por id) y edades en NULL
+            crear_usuario(
+                f'cursor{i:02d}@ejemplo.com', cls.categoria,
+                first_name=f'Nombre{i % 4}', last_name=f'Apellido{i % 3}',
+                edad=None if i % 5 == 0 else 20 + i % 4,
+            )
+        cls.admin = User.objects.create_superuser('admin_cursor', 'admin@ejemplo.com', 'secreta123')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _pagina(self, **params):
+        respuesta = self.client.get(reverse('api_usuarios'), {'fields': 'id', **params})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def _recorrer(self, order_by, limite=5):
+        """IDs de todas las páginas siguiendo el cursor"""
+        ids, cursor = [], None
+        while True:
+            params = {'order_by': order_by, 'limit': limite}
+            if cursor:
+                params['cursor'] = cursor
+            pagina = self._pagina(**params)
+            ids += [fila['id'] for fila in pagina['data']]
+            cursor = pagina['siguiente']
+            if cursor is None:
+                return ids
+
+    def _esperado(self, order_by):
+        """Orden por (campo, id) en el mismo sentido, con los NULL al final"""
+        descendente = order_by.startswith('-')
+        campo = order_by.lstrip('-')
+        filas = list(Usuario.objects.filter(is_active=True).values_list(campo, 'id'))
+        nulos = [pk for valor, pk in filas if valor is None]
+        valores = [(valor, pk) for valor, pk in filas if valor is not None]
+        ordenados = [pk for _, pk in sorted(valores, reverse=descendente)]
+        self.assertTrue(campo in CAMPOS_ORDEN_NULOS or not nulos)
+        return ordenados + sorted(nulos, reverse=descendente)
+
+    def test_recorre_todo_sin_repetir_en_cada_orden(self):
+        for order_by in ORDENAMIENTOS_PERMITIDOS:
+            with self.subTest(order_by=order_by):
+                self.assertEqual(self._recorrer(order_by), self._esperado(order_by))
+
+    def test_altas_antes_del_cursor_no_desplazan_la_pagina(self):
+        primera = self._pagina(order_by='email', limit=5)
+        vistos = [fila['id'] for fila in primera['data']]
+        restantes = self._esperado('email')[5:]
+
+        # Con OFFSET estas altas harían repetir filas en la página siguiente
+        for i in range(3):
+            crear_usuario(f'aaa{i}@ejemplo.com', self.categoria)
+
+        segunda = self._pagina(order_by='email', limit=5, cursor=primera['siguiente'])
+        ids = [fila['id'] for fila in segunda['data']]
+        self.assertEqual(ids, restantes[:5])
+        self.assertFalse(set(ids) & set(vistos))
+
+    def test_bajas_de_la_pagina_vista_no_saltan_filas(self):
+        primera = self._pagina(order_by='-created_at', limit=5)
+        restantes = self._esperado('-created_at')[5:]
+
+        Usuario.objects.filter(id__in=[fila['id'] for fila in primera['data']]).delete()
+
+        segunda = self._pagina(order_by='-created_at', limit=5, cursor=primera['siguiente'])
+        self.assertEqual([fila['id'] for fila in segunda['data']], restantes[:5])
+
+    def test_cursor_en_el_tramo_de_nulos(self):
+        esperado = self._esperado('edad')
+        nulos = list(Usuario.objects.filter(edad__isnull=True).order_by('id').values_list('id', flat=True))
+        cursor = _codificar_cursor(None, nulos[0])
+
+        pagina = self._pagina(order_by='edad', limit=50, cursor=cursor)
+        self.assertEqual([fila['id'] for fila in pagina['data']], esperado[esperado.index(nulos[0]) + 1:])
+
+    def test_cursor_invalido(self):
+        for cursor in ('no-es-base64!', _codificar_cursor('no es fecha', 1)):
+            with self.subTest(cursor=cursor):
+                respuesta = self.client.get(
+                    reverse('api_usuarios'), {'order_by': '-created_at', 'cursor': cursor}
+                )
+                self.assertEqual(respuesta.status_code, 400)
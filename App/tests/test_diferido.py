@@ -0,0 +1,125 @@
+# App/tests/test_diferido.py
+"""
+Escritura diferida de históricos y eventos (App/diferido.py)
+"""
+from unittest import mock
+
+from django.test import TestCase
+
+from .. import diferido
+from ..models import EventoUsuario, Usuario, UsuarioHistorico
+from . import configuracion_prueba, crear_categoria, crear_usuario
+
+
+class Revertir(Exception):
+    """Excepción de prueba para revertir un bloque"""
+
+
+@configuracion_prueba
+class DiferidoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = crear_categoria()
+        cls.usuarios = [crear_usuario(f'diferido{i}@ejemplo.com', categoria) for i in range(3)]
+
+    def setUp(self):
+        # Instancias propias de cada test (setUpTestData las comparte)
+        self.usuarios = list(Usuario.objects.filter(pk__in=[u.pk for u in self.usuarios]).order_by('id'))
+        self.eventos_antes = EventoUsuario.objects.count()
+
+    def _historicos(self, usuario):
+        return list(
+            UsuarioHistorico.objects.filter(usuario=usuario)
+            .order_by('secuencia').values_list('secuencia', flat=True)
+        )
+
+    def _eventos_nuevos(self):
+        return EventoUsuario.objects.count() - self.eventos_antes
+
+    def test_vuelca_al_salir_del_bloque(self):
+        with diferido.agrupar():
+            for usuario in self.usuarios:
+                for nombre in ('Uno', 'Dos'):
+                    usuario.first_name = nombre
+                    usuario.save()
+            # Todavía no se escribió nada
+            self.assertEqual(UsuarioHistorico.objects.count(), 0)
+            self.assertEqual(self._eventos_nuevos(), 0)
+
+        for usuario in self.usuarios:
+            self.assertEqual(self._historicos(usuario), [1, 2])
+        self.assertEqual(self._eventos_nuevos(), 6)
+
+    def test_fuera_de_un_bloque_escribe_en_el_momento(self):
+        usuario = self.usuarios[0]
+        usuario.first_name = 'Otro'
+        usuario.save()
+
+        self.assertEqual(self._historicos(usuario), [1])
+        self.assertEqual(self._eventos_nuevos(), 1)
+
+    def test_atomico_revertido_descarta_sus_filas(self):
+        primero, segundo = self.usuarios[:2]
+        with diferido.agrupar():
+            primero.first_name = 'Confirmado'
+            primero.save()
+            try:
+                with diferido.atomico():
+                    segundo.first_name = 'Revertido'
+                    segundo.save()
+                    raise Revertir()
+            except Revertir:
+                pass
+
+        self.assertEqual(self._historicos(primero), [1])
+        self.assertEqual(self._historicos(segundo), [])
+        self.assertEqual(self._eventos_nuevos(), 1)
+        self.assertEqual(Usuario.objects.get(pk=segundo.pk).first_name, 'Nombre')
+
+    def test_bloque_revertido_no_escribe_nada(self):
+        with self.assertRaises(Revertir):
+            with diferido.agrupar():
+                for usuario in self.usuarios:
+                    usuario.first_name = 'Revertido'
+                    usuario.save()
+                raise Revertir()
+
+        self.assertFalse(diferido.activo())
+        self.assertEqual(UsuarioHistorico.objects.count(), 0)
+        self.assertEqual(self._eventos_nuevos(), 0)
+        self.assertFalse(Usuario.objects.filter(first_name='Revertido').exists())
+
+    def test_agrupar_anidado_revertido_descarta_solo_lo_suyo(self):
+        primero, segundo = self.usuarios[:2]
+        with diferido.agrupar():
+            primero.first_name = 'Externo'
+            primero.save()
+            with self.assertRaises(Revertir):
+                with diferido.agrupar():
+                    segundo.first_name = 'Interno'
+                    segundo.save()
+                    raise Revertir()
+
+        self.assertEqual(self._historicos(primero), [1])
+        self.assertEqual(self._historicos(segundo), [])
+
+    def test_al_confirmar_una_vez_por_bloque(self):
+        funcion = mock.Mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            with diferido.agrupar():
+                for _ in range(5):
+                    diferido.al_confirmar_una_vez(funcion)
+                funcion.assert_not_called()
+
+        funcion.assert_called_once_with()
+
+    def test_al_confirmar_con_bloque_revertido_no_corre(self):
+        funcion = mock.Mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(Revertir):
+                with diferido.agrupar():
+                    diferido.al_confirmar_una_vez(funcion)
+                    raise Revertir()
+
+        funcion.assert_not_called()
@@ -0,0 +1,110 @@
+# App/tests/test_historico.py
+"""
+Histórico como deltas con snapshots (App/historico.py): reconstrucción del
+estado y línea de tiempo alrededor de los límites de snapshot
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import historico
+from ..models import UsuarioHistorico
+from . import configuracion_prueba, crear_categoria, crear_usuario
+
+
+INTERVALO = UsuarioHistorico.INTERVALO_SNAPSHOT
+# Dos snapshots completos y unos cambios más después del tercero
+CAMBIOS = 2 * INTERVALO + 3
+
+
+@configuracion_prueba
+class HistoricoSnapshotsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_usuario('historico@ejemplo.com', crear_categoria())
+        for i in range(1, CAMBIOS + 1):
+            cls.usuario.first_name = f'v{i}'
+            cls.usuario.edad = i
+            cls.usuario.save()
+        cls.fechas = dict(
+            UsuarioHistorico.objects.filter(usuario=cls.usuario).values_list('secuencia', 'modified_at')
+        )
+
+    def test_snapshots_cada_intervalo(self):
+        snapshots = list(
+            UsuarioHistorico.objects.filter(usuario=self.usuario, estado__isnull=False)
+            .order_by('secuencia').values_list('secuencia', flat=True)
+        )
+        self.assertEqual(snapshots, [1, INTERVALO + 1, 2 * INTERVALO + 1])
+
+    def test_estado_en_cada_cambio(self):
+        for secuencia, momento in self.fechas.items():
+            with self.subTest(secuencia=secuencia):
+                estado = historico.estado_en(self.usuario, momento)
+                self.assertEqual(estado['secuencia'], secuencia)
+                self.assertEqual(estado['datos']['first_name'], f'v{secuencia}')
+                self.assertEqual(estado['datos']['edad'], secuencia)
+                self.assertEqual(estado['desconocidos'], [])
+
+    def test_estado_entre_cambios_en_los_limites(self):
+        for secuencia in (INTERVALO - 1, INTERVALO, INTERVALO + 1, 2 * INTERVALO, 2 * INTERVALO + 1):
+            with self.subTest(secuencia=secuencia):
+                momento = self.fechas[secuencia] + (self.fechas[secuencia + 1] - self.fechas[secuencia]) / 2
+                estado = historico.estado_en(self.usuario, momento)
+                self.assertEqual(estado['secuencia'], secuencia)
+                self.assertEqual(estado['datos']['first_name'], f'v{secuencia}')
+
+    def test_estado_antes_del_primer_cambio(self):
+        momento = self.usuario.created_at + (self.fechas[1] - self.usuario.created_at) / 2
+        estado = historico.estado_en(self.usuario, momento)
+
+        self.assertEqual(estado['secuencia'], 0)
+        self.assertEqual(estado['datos']['first_name'], 'Nombre')
+        self.assertEqual(estado['datos']['edad'], 30)
+
+    def test_estado_antes_de_existir(self):
+        momento = self.usuario.created_at - (self.fechas[1] - self.usuario.created_at)
+        self.assertIsNone(historico.estado_en(self.usuario, momento))
+
+    def test_linea_de_tiempo_paginada(self):
+        secuencias, snapshots = [], []
+        antes = None
+        while True:
+            filas, antes = historico.linea_de_tiempo(self.usuario.id, antes=antes, limite=7)
+            secuencias += [fila['secuencia'] for fila in filas]
+            snapshots += [fila['secuencia'] for fila in filas if fila['snapshot']]
+            if antes is None:
+                break
+
+        self.assertEqual(secuencias, list(range(CAMBIOS, 0, -1)))
+        self.assertEqual(snapshots, [2 * INTERVALO + 1, INTERVALO + 1, 1])
+
+
+@configuracion_prueba
+class ApiEstadoUsuarioTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_usuario('api_estado@ejemplo.com', crear_categoria())
+        cls.admin = User.objects.create_superuser('admin_estado', 'admin@ejemplo.com', 'secreta123')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _get(self, en):
+        return self.client.get(reverse('api_estado_usuario', args=[self.usuario.id]), {'en': en})
+
+    def test_fecha_imposible(self):
+        for en in ('2024-02-30', '2024-01-01T25:00:00', 'ayer'):
+            with self.subTest(en=en):
+                self.assertEqual(self._get(en).status_code, 400)
+
+    def test_antes_de_existir(self):
+        self.assertEqual(self._get('2000-01-01').status_code, 404)
+
+    def test_estado_actual(self):
+        respuesta = self.client.get(reverse('api_estado_usuario', args=[self.usuario.id]))
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['data']['datos']['email'], 'api_estado@ejemplo.com')
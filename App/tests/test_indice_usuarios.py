@@ -0,0 +1,68 @@
+# App/tests/test_indice_usuarios.py
+"""
+Listado servido desde el índice en memoria (settings.INDICE_USUARIOS_MEMORIA)
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.messages import constants
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from ..indice_usuarios import IndiceUsuarios
+from . import configuracion_prueba, crear_categoria, crear_usuario
+
+
+@configuracion_prueba
+@override_settings(INDICE_USUARIOS_MEMORIA=True)
+class ListadoIndiceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = crear_categoria()
+        for i in range(25):
+            crear_usuario(f'indice{i:02d}@ejemplo.com', categoria)
+        cls.admin = User.objects.create_superuser('admin_indice', 'admin@ejemplo.com', 'secreta123')
+
+    def setUp(self):
+        # Índice recién creado, como en un proceso que todavía no lo cargó
+        parche = mock.patch('App.views.indice', IndiceUsuarios())
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.client.force_login(self.admin)
+
+    def _dejar_mensaje(self):
+        """Mensaje pendiente en la cookie, como después de un redirect con messages.success()"""
+        storage = CookieStorage(RequestFactory().get('/'))
+        storage.add(constants.SUCCESS, 'Usuario creado exitosamente')
+        respuesta = HttpResponse()
+        storage.update(respuesta)
+        self.client.cookies.update(respuesta.cookies)
+
+    def test_primera_pagina_con_mensaje_pendiente(self):
+        # Con mensajes no hay ETag: la vista tiene que cargar el índice sola
+        self._dejar_mensaje()
+        respuesta = self.client.get(reverse('listar_usuarios'))
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['total'], 25)
+        self.assertEqual(len(respuesta.context['usuarios']), 20)
+        self.assertContains(respuesta, 'Usuario creado exitosamente')
+
+    def test_segunda_pagina_con_mensaje_pendiente(self):
+        self._dejar_mensaje()
+        respuesta = self.client.get(reverse('listar_usuarios'), {'page': 2})
+
+        self.assertEqual(respuesta.status_code, 200)
+        emails = [fila['email'] for fila in respuesta.context['usuarios']]
+        self.assertEqual(len(emails), 5)
+
+    def test_paginas_sin_repetidos(self):
+        emails = []
+        for pagina in (1, 2):
+            respuesta = self.client.get(reverse('listar_usuarios'), {'page': pagina, 'order_by': 'email'})
+            emails += [fila['email'] for fila in respuesta.context['usuarios']]
+
+        self.assertEqual(emails, sorted(f'indice{i:02d}@ejemplo.com' for i in range(25)))
@@ -0,0 +1,91 @@
+# App/tests/test_resumen.py
+"""
+Resumen diario de usuarios: los deltas incrementales deben dar lo mismo
+que reconstruirlo desde App_usuario
+"""
+from django.test import TestCase
+
+from .. import masivo, resumen
+from ..models import ResumenDiarioUsuario, Usuario
+from . import configuracion_prueba, crear_categoria, crear_usuario
+
+
+def _resumen():
+    """Contenido del resumen como dict bucket -> total, sin buckets vacíos"""
+    return {
+        (fila.fecha, fila.rol, fila.categoria_id, fila.is_active): fila.total
+        for fila in ResumenDiarioUsuario.objects.all()
+        if fila.total
+    }
+
+
+@configuracion_prueba
+class ResumenIncrementalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.general = crear_categoria('General')
+        cls.otra = crear_categoria('Otra')
+
+    def _assert_igual_a_reconstruido(self):
+        incremental = _resumen()
+        resumen.reconstruir()
+        self.assertEqual(incremental, _resumen())
+
+    def test_altas(self):
+        for i in range(3):
+            crear_usuario(f'alta{i}@ejemplo.com', self.general)
+        crear_usuario('admin@ejemplo.com', self.otra, rol='ADMIN')
+
+        self.assertEqual(resumen.total_registros(), 4)
+        self._assert_igual_a_reconstruido()
+
+    def test_modificaciones_mueven_de_bucket(self):
+        usuarios = [crear_usuario(f'mod{i}@ejemplo.com', self.general) for i in range(3)]
+
+        usuarios[0].rol = 'ADMIN'
+        usuarios[0].save()
+        usuarios[1].categoria = self.otra
+        usuarios[1].save()
+        usuarios[2].is_active = False
+        usuarios[2].save()
+        # Releído de la base: compara contra el estado leído, no el de la instancia
+        releido = Usuario.objects.get(pk=usuarios[2].pk)
+        releido.is_active = True
+        releido.rol = 'ADMIN'
+        releido.save()
+
+        self.assertEqual(resumen.total_registros(), 3)
+        self.assertEqual(resumen.total_activos(), 3)
+        self._assert_igual_a_reconstruido()
+
+    def test_modificacion_sin_cambios_de_bucket(self):
+        usuario = crear_usuario('igual@ejemplo.com', self.general)
+        antes = _resumen()
+
+        usuario.first_name = 'Otro'
+        usuario.save()
+
+        self.assertEqual(_resumen(), antes)
+
+    def test_bajas(self):
+        usuarios = [crear_usuario(f'baja{i}@ejemplo.com', self.general) for i in range(4)]
+
+        usuarios[0].delete()
+        masivo.eliminar_lote([usuarios[1].pk, usuarios[2].pk])
+
+        self.assertEqual(resumen.total_registros(), 1)
+        self._assert_igual_a_reconstruido()
+
+    def test_modificacion_sin_estado_original_no_cuenta_dos_veces(self):
+        usuario = crear_usuario('parcial@ejemplo.com', self.general)
+        antes = _resumen()
+
+        # Con campos diferidos _estado_original no tiene el bucket anterior
+        parcial = Usuario.objects.only('id', 'first_name').get(pk=usuario.pk)
+        parcial.first_name = 'Otro'
+        with self.assertLogs('App.resumen', 'WARNING'):
+            parcial.save()
+
+        self.assertEqual(_resumen(), antes)
+        self._assert_igual_a_reconstruido()
@@ -1,6 +1,11 @@
 # App/urls.py
+from django.conf import settings
 from django.urls import path
 from . import views
+from . import views_async
+
+# Vistas de solo lectura: variante async bajo ASGI (settings.VISTAS_ASYNC)
+lectura = views_async if settings.VISTAS_ASYNC else views
 
 urlpatterns = [
     # ==================== AUTENTICACIÓN ====================
@@ -8,16 +13,26 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('register/', views.register_view, name='register'),
     # ==================== HOME ====================
-    path('', views.home, name='home'),
+    path('', lectura.home, name='home'),
 
     # ==================== CRUD DE USUARIOS ====================
-    path('usuarios/', views.listar_usuarios, name='listar_usuarios'),
+    path('usuarios/', lectura.listar_usuarios, name='listar_usuarios'),
+    path('usuarios/exportar/', lectura.exportar_usuarios, name='exportar_usuarios'),
     path('crear/', views.crear_usuario, name='crear_usuario'),
     path('eliminar-multiple/', views.eliminar_multiples_usuarios, name='eliminar_multiples'),
+    path('editar-multiple/', views.editar_multiples_usuarios, name='editar_multiples'),
+    path('eliminaciones/<int:eliminacion_id>/', views.detalle_eliminacion, name='detalle_eliminacion'),
     path('editar/<int:usuario_id>/', views.editar_usuario, name='editar_usuario'),
 
 
     # ==================== IMPORTACIÓN DE EXCEL ====================
     path('upload-excel/', views.UploadExcelView.as_view(), name='upload_excel'),
     path('plantilla/', views.descargar_plantilla, name='descargar_plantilla'),
+    path('importaciones/<int:audit_id>/', lectura.detalle_importacion, name='detalle_importacion'),
+
+    # ==================== API ====================
+    path('api/usuarios/', lectura.api_usuarios, name='api_usuarios'),
+    path('api/usuarios/<int:usuario_id>/historial/', views.api_historial_usuario, name='api_historial_usuario'),
+    path('api/usuarios/<int:usuario_id>/estado/', views.api_estado_usuario, name='api_estado_usuario'),
+    path('api/estadisticas/', lectura.estadisticas_usuarios, name='estadisticas_usuarios'),
 ]
\ No newline at end of file
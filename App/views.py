@@ -4,28 +4,133 @@ Vistas del sistema NuamExchange
 Maneja todas las peticiones HTTP y lógica de negocio
 """
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.urls import reverse
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+)
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.html import format_html
 from django.views import View
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Reverse
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.core.exceptions import ValidationError
-from .models import Usuario, ImportAudit
+from django.conf import settings
+from .models import Categoria, EliminacionMasiva, Usuario, ImportAudit, normalizar_telefono
 from .forms import UsuarioForm
 import pandas as pd
+from openpyxl import Workbook
 from datetime import date, datetime
+from functools import lru_cache, partial
+from io import BytesIO
+import base64
+import binascii
+import csv
+import hashlib
+import json
 import logging
+import re
+import tempfile
+import time
+from . import bloom
+from . import categorias
 from . import forms
+from . import historico
+from . import masivo
+from . import permisos
+from . import dashboard
+from . import diferido
+from . import resumen
+from .indice_usuarios import indice
 #logger para registrar y eventos importantes
 logger = logging.getLogger(__name__)
 
 # Al inicio de App/views.py, después de los imports existentes
 
+# Término de búsqueda que parece teléfono: solo dígitos, +, espacios, guiones o paréntesis
+TELEFONO_BUSQUEDA_REGEX = re.compile(r'^\+?[\d\s\-()]+$')
+
+
+def filtrar_por_busqueda(usuarios_list, query):
+    """
+    Aplica el término de búsqueda de los listados de usuarios
+    
+    - Siempre se busca en nombre, apellido y email
+    - Si además el término parece un teléfono, también coinciden los
+      usuarios cuyo teléfono termina en esos dígitos (sobre
+      telefono_digitos invertido, ver usuario_tel_reverso_idx): "1234"
+      encuentra tanto el teléfono ...1234 como juan1234@x.com
+    
+    Args:
+        usuarios_list: QuerySet de Usuario a filtrar
+        query: Término de búsqueda ya limpio
+    
+    Returns:
+        QuerySet filtrado
+    """
+    condicion = (
+        Q(first_name__icontains=query) |      # Buscar en nombre
+        Q(last_name__icontains=query) |       # Buscar en apellido
+        Q(email__icontains=query)             # Buscar en email
+    )
+    
+    if TELEFONO_BUSQUEDA_REGEX.match(query):
+        digitos = normalizar_telefono(query)
+        if digitos:
+            usuarios_list = usuarios_list.annotate(telefono_reverso=Reverse('telefono_digitos'))
+            condicion |= Q(telefono_reverso__startswith=digitos[::-1])
+    
+    return usuarios_list.filter(condicion)
+
+# Lista blanca de campos permitidos para ordenar los listados
+ORDENAMIENTOS_PERMITIDOS = [
+    'first_name', '-first_name',
+    'last_name', '-last_name',
+    'email', '-email',
+    'edad', '-edad',
+    'created_at', '-created_at'
+]
+
+
+def usuarios_filtrados(request):
+    """
+    Usuarios activos filtrados y ordenados según los parámetros GET
+    Compartido por el listado, su ETag y las exportaciones
+    
+    Parámetros GET:
+    - q: término de búsqueda
+    - order_by: campo para ordenar (ORDENAMIENTOS_PERMITIDOS)
+    
+    Returns:
+        tuple (queryset, query, order_by)
+    """
+    query = request.GET.get('q', '').strip()
+    order_by = request.GET.get('order_by', '-created_at')
+    
+    # Consulta base: solo usuarios activos
+    usuarios_list = Usuario.objects.filter(is_active=True)
+    
+    # Aplicar búsqueda si existe término
+    if query:
+        usuarios_list = filtrar_por_busqueda(usuarios_list, query)
+    
+    if order_by in ORDENAMIENTOS_PERMITIDOS:
+        usuarios_list = usuarios_list.order_by(order_by)
+    else:
+        # Si el campo no es válido, usar ordenamiento por defecto
+        usuarios_list = usuarios_list.order_by('-created_at')
+    
+    return usuarios_list, query, order_by
+
+
 # ==================== AUTENTICACIÓN ====================
 def register_view(request):
     """
@@ -70,8 +175,8 @@ def register_view(request):
             messages.error(request, f'El nombre de usuario "{username}" ya está registrado')
             return render(request, 'register.html')
         
-        # 5. Validar email único
-        if User.objects.filter(email=email).exists():
+        # 5. Validar email único (si el filtro de Bloom dice que no existe, no se consulta)
+        if bloom.email_puede_existir(email) and User.objects.filter(email__lower=email).exists():
             messages.error(request, f'El email "{email}" ya está registrado')
             return render(request, 'register.html')
         
@@ -138,8 +243,8 @@ def login_view(request):
             return render(request, 'login.html')
         
         try:
-            # Buscar usuario por email
-            user_obj = User.objects.get(email=email)
+            # Buscar usuario por email (índice auth_user_email_lower_idx)
+            user_obj = User.objects.get(email__lower=email)
             
             # Autenticar con username y password
             user = authenticate(
@@ -196,57 +301,122 @@ def home(request):
     
     Requiere autenticación (@login_required)
     """
-    # Obtener estadísticas
-    total_usuarios = Usuario.objects.filter(is_active=True).count()
-    
-    # Usuarios creados hoy
-    usuarios_hoy = Usuario.objects.filter(
-        created_at__date=datetime.now().date()
-    ).count()
-    
-    # Últimas 5 importaciones del usuario actual
-    recent_imports = ImportAudit.objects.filter(
-        user=request.user
-    ).order_by('-uploaded_at')[:5]
-    
-    # Últimos 10 usuarios creados
-    usuarios_recientes = Usuario.objects.filter(
-        is_active=True
-    ).order_by('-created_at')[:10]
+    # El rol, la versión de datos y las estadísticas los agrega de forma perezosa
+    # App.context_processors.dashboard_context: los fragmentos globales de
+    # home.html se cachean por rol y versión de datos, así que las estadísticas
+    # (App/dashboard.py) solo se leen si algún fragmento no está en caché
+    return render(request, 'home.html')
+
+@login_required
+def estadisticas_usuarios(request):
+    """
+    API JSON de tendencias de usuarios
+    Se lee del resumen diario (ResumenDiarioUsuario): O(días), no O(usuarios)
     
-    # Obtener rol del usuario
-    user_role = 'Employee'  # Por defecto
-    if hasattr(request.user, 'profile'):
-        user_role = request.user.profile.role
+    Parámetros GET:
+    - dias: cantidad de días hacia atrás (1-366, por defecto 30)
+    """
+    return JsonResponse({
+        'status': 'success',
+        'data': resumen.tendencias(_dias_tendencias(request))
+    })
+
+
+def _dias_tendencias(request):
+    """Parámetro dias de estadisticas_usuarios, acotado a 1-366"""
+    try:
+        return min(max(int(request.GET.get('dias', 30)), 1), 366)
+    except ValueError:
+        return 30
+
+# Agregado que resume el estado de la consulta filtrada del listado
+ESTADO_LISTADO = {'ultima': Max('updated_at'), 'total': Count('id')}
+
+
+def _etag_listado(request):
+    """
+    ETag barato del listado: no renderiza nada, solo un agregado
     
-    # Preparar contexto para el template
-    context = {
-        'total_usuarios': total_usuarios,
-        'usuarios_hoy': usuarios_hoy,
-        'recent_imports': recent_imports,
-        'usuarios_recientes': usuarios_recientes,
-        'user_role': user_role
-    }
+    Combina el usuario y sus permisos, los parámetros GET, la versión de datos del
+    dashboard y las importaciones recientes del usuario (fragmentos heredados
+    de home.html) y max(updated_at) + count de la consulta filtrada. Si nada
+    cambió la vista responde 304.
+
+    Con mensajes pendientes no hay ETag: home.html los muestra y así se
+    consumen; un 304 los dejaría para la página siguiente.
+    """
+    if _hay_mensajes(request):
+        return None
+
+    importaciones = _partes_importaciones(dashboard.obtener_importaciones_recientes(request.user))
+    if settings.INDICE_USUARIOS_MEMORIA:
+        indice.asegurar_fresco()
+        return _hash_listado(
+            request, permisos.de(request.user), importaciones,
+            dashboard.version_datos(), indice.version,
+        )
     
-    return render(request, 'home.html', context)
+    usuarios_list, query, order_by = usuarios_filtrados(request)
+    estado = usuarios_list.order_by().aggregate(**ESTADO_LISTADO)
+    return _hash_listado(
+        request, permisos.de(request.user), importaciones,
+        dashboard.version_datos(), *_partes_estado(estado),
+    )
 
-@login_required
-def eliminar_multiples_usuarios(request):
-    if request.method == "POST":
-        ids = request.POST.getlist("usuarios")  # lista de IDs seleccionados
-        if not ids:
-            messages.error(request, "No seleccionaste ningún usuario para eliminar.")
-            return redirect("listar_usuarios")
 
-        User.objects.filter(id__in=ids).delete()
-        messages.success(request, f"Se eliminaron {len(ids)} usuarios correctamente.")
-        return redirect("listar_usuarios")
+def _hay_mensajes(request):
+    """True si hay mensajes de django.contrib.messages sin mostrar (no los marca como leídos)"""
+    return len(messages.get_messages(request)) > 0
+
+
+def _partes_importaciones(importaciones):
+    """Estado de las importaciones recientes del usuario que entra en el ETag"""
+    return [
+        (imp.pk, imp.status, imp.imported_count, imp.updated_count, imp.error_count)
+        for imp in importaciones
+    ]
+
+
+def _partes_estado(estado):
+    """Valores de ESTADO_LISTADO que entran en el ETag"""
+    return estado['ultima'].isoformat() if estado['ultima'] else '', estado['total']
+
+
+def _hash_listado(request, permisos_usuario, importaciones, *estado):
+    """
+    Hash del ETag del listado (compartido con la vista async)
+    Incluye el snapshot de permisos: si el usuario pasa a ADMIN cambia la
+    página (enlaces Editar) aunque no cambien los datos
+    """
+    partes = [
+        request.user.pk, request.GET.urlencode(), permisos_usuario.huella,
+        importaciones, *estado,
+    ]
+    return hashlib.md5('|'.join(str(p) for p in partes).encode()).hexdigest()
+
+
+def _pagina_indice(request, query, order_by):
+    """
+    Página del listado servida desde el índice en memoria (settings.INDICE_USUARIOS_MEMORIA)
+    Filtra, ordena y pagina sin consultar la base; las filas son dicts
+
+    Deja el índice al día por su cuenta: el ETag puede no haberlo hecho
+    (sin ETag con mensajes pendientes, o si la vista se usa sin condition).
+    Puede consultar la base: en vistas async llamarla con sync_to_async
+    """
+    if order_by not in ORDENAMIENTOS_PERMITIDOS:
+        order_by = '-created_at'
+    # Carga la primera vez o al vencer la recarga; si no, solo aplica los
+    # cambios encolados (sin consultas)
+    indice.asegurar_fresco()
+    # El resultado conserva los arrays de la consulta: la página no se
+    # desarma si otro request recarga el índice mientras tanto
+    paginator = Paginator(indice.consultar(query, order_by), 20)
+    return paginator.get_page(request.GET.get('page', 1))
 
-    # GET → mostrar tabla de usuarios con casillas para seleccionar
-    usuarios = User.objects.all().order_by("id")
-    return render(request, "eliminar_multiples.html", {"usuarios": usuarios})
 
 @login_required
+@condition(etag_func=_etag_listado)
 def listar_usuarios(request):
     """
     Listar todos los usuarios con funcionalidades de:
@@ -260,56 +430,31 @@ def listar_usuarios(request):
     - page: número de página
     """
     
-    # Obtener parámetro de búsqueda
-    query = request.GET.get('q', '').strip()
-    
-    # Consulta base: solo usuarios activos
-    usuarios_list = Usuario.objects.filter(is_active=True)
+    # Búsqueda y ordenamiento (solo usuarios activos)
+    usuarios_list, query, order_by = usuarios_filtrados(request)
 
-    # Aplicar búsqueda si existe término
     if query:
-        usuarios_list = usuarios_list.filter(
-            Q(first_name__icontains=query) |      # Buscar en nombre
-            Q(last_name__icontains=query) |       # Buscar en apellido
-            Q(email__icontains=query) |           # Buscar en email
-            Q(telefono__icontains=query)          # Buscar en teléfono
-        )
-        
         logger.info(f'Búsqueda realizada por {request.user.username}: "{query}"')
     
-    # Aplicar ordenamiento
-    order_by = request.GET.get('order_by', '-created_at')
-    
-    # Lista blanca de campos permitidos para ordenar
-    allowed_ordering = [
-        'first_name', '-first_name',
-        'last_name', '-last_name',
-        'email', '-email',
-        'edad', '-edad',
-        'created_at', '-created_at'
-    ]
-    
-    if order_by in allowed_ordering:
-        usuarios_list = usuarios_list.order_by(order_by)
+    if settings.INDICE_USUARIOS_MEMORIA:
+        usuarios = _pagina_indice(request, query, order_by)
     else:
-        # Si el campo no es válido, usar ordenamiento por defecto
-        usuarios_list = usuarios_list.order_by('-created_at')
-    
-    # Implementar paginación
-    paginator = Paginator(usuarios_list, 20)  # 20 usuarios por página
-    page_number = request.GET.get('page', 1)
-    
-    try:
-        usuarios = paginator.get_page(page_number)
-    except:
-        usuarios = paginator.get_page(1)
+        # Implementar paginación
+        paginator = Paginator(usuarios_list, 20)  # 20 usuarios por página
+        page_number = request.GET.get('page', 1)
+        
+        try:
+            usuarios = paginator.get_page(page_number)
+        except:
+            usuarios = paginator.get_page(1)
     
     # Preparar contexto
     context = {
         'usuarios': usuarios,
         'query': query,
         'order_by': order_by,
-        'total': usuarios_list.count()
+        'total': usuarios.paginator.count,  # Ya calculado por el paginador
+        'puede_editar': _puede_editar(request.user),
     }
     
      # Consulta de admins
@@ -321,6 +466,463 @@ def listar_usuarios(request):
     return render(request, 'listar.html', context)
 
 
+# ==================== EXPORTACIÓN ====================
+
+# Columnas exportadas: (encabezado, campo para values_list)
+COLUMNAS_EXPORTACION = [
+    ('id', 'id'),
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('email', 'email'),
+    ('edad', 'edad'),
+    ('telefono', 'telefono'),
+    ('fecha_nacimiento', 'fecha_nacimiento'),
+    ('rol', 'rol'),
+    ('categoria', 'categoria__name'),
+    ('created_at', 'created_at'),
+]
+
+# Filas que se traen por viaje al cursor del servidor
+EXPORTACION_CHUNK_SIZE = 2000
+
+
+# Inicios de celda que Excel/LibreOffice interpretan como fórmula al abrir
+# un CSV (inyección de fórmulas): se les antepone un apóstrofo
+PREFIJOS_FORMULA = ('=', '+', '-', '@')
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _celda_segura(valor, prefijos=PREFIJOS_FORMULA):
+    """Antepone ' a los textos que una planilla ejecutaría como fórmula"""
+    if isinstance(valor, str) and valor.startswith(prefijos):
+        return "'" + valor
+    return valor
+
+
+def _fila_csv(fila):
+    return [_celda_segura(valor) for valor in fila]
+
+
+def _fila_xlsx(fila):
+    # openpyxl guarda como fórmula solo los textos que empiezan con '='.
+    # Excel no soporta datetimes con zona horaria
+    return [
+        timezone.localtime(valor).replace(tzinfo=None) if isinstance(valor, datetime)
+        else _celda_segura(valor, ('=',))
+        for valor in fila
+    ]
+
+
+class _Eco:
+    """Objeto tipo archivo que devuelve lo escrito, para csv.writer en streaming"""
+    def write(self, value):
+        return value
+
+
+def _filas_exportacion(usuarios_list):
+    """
+    Itera los usuarios como tuplas, sin construir instancias del modelo
+    Con PostgreSQL .iterator() usa un cursor del servidor: memoria constante
+    """
+    campos = [campo for _, campo in COLUMNAS_EXPORTACION]
+    return usuarios_list.values_list(*campos).iterator(chunk_size=EXPORTACION_CHUNK_SIZE)
+
+
+def _exportar_csv(usuarios_list):
+    """
+    Respuesta CSV generada fila a fila con StreamingHttpResponse
+    """
+    writer = csv.writer(_Eco())
+    
+    def generar():
+        # BOM para que Excel reconozca UTF-8 (tildes y ñ)
+        yield '\ufeff' + writer.writerow([titulo for titulo, _ in COLUMNAS_EXPORTACION])
+        for fila in _filas_exportacion(usuarios_list):
+            yield writer.writerow(_fila_csv(fila))
+    
+    response = StreamingHttpResponse(generar(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename=usuarios.csv'
+    return response
+
+
+def _exportar_xlsx(usuarios_list):
+    """
+    Respuesta XLSX con openpyxl en modo write-only
+    Las filas se escriben a disco a medida que llegan y el archivo
+    final se envía por bloques con FileResponse
+    """
+    return FileResponse(
+        _generar_xlsx(usuarios_list),
+        as_attachment=True,
+        filename='usuarios.xlsx',
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+def _generar_xlsx(usuarios_list):
+    """
+    Escribe el XLSX en un archivo temporal (compartido con la vista async)
+
+    Returns:
+        Archivo temporal abierto, posicionado al inicio
+    """
+    workbook = Workbook(write_only=True)
+    hoja = workbook.create_sheet('Usuarios')
+    hoja.append([titulo for titulo, _ in COLUMNAS_EXPORTACION])
+    
+    for fila in _filas_exportacion(usuarios_list):
+        hoja.append(_fila_xlsx(fila))
+    
+    archivo = tempfile.TemporaryFile()
+    workbook.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+@login_required
+def exportar_usuarios(request):
+    """
+    Exportar el listado de usuarios con los mismos filtros que listar_usuarios
+    
+    Parámetros GET:
+    - q: término de búsqueda
+    - order_by: campo para ordenar
+    - formato: csv (por defecto) o xlsx
+    """
+    usuarios_list, query, order_by = usuarios_filtrados(request)
+    formato = request.GET.get('formato', 'csv').lower()
+    
+    logger.info(f'Exportación {formato} por {request.user.username}: q="{query}" order_by={order_by}')
+    
+    if formato == 'xlsx':
+        return _exportar_xlsx(usuarios_list)
+    return _exportar_csv(usuarios_list)
+
+
+# ==================== API DE USUARIOS ====================
+
+# Campos que se pueden pedir con ?fields= : nombre en el JSON -> campo para values_list
+CAMPOS_API = {
+    'id': 'id',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'email': 'email',
+    'edad': 'edad',
+    'telefono': 'telefono',
+    'fecha_nacimiento': 'fecha_nacimiento',
+    'rol': 'rol',
+    'categoria_id': 'categoria_id',
+    'categoria': 'categoria__name',
+    'is_active': 'is_active',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+
+# Campos por defecto si no se indica ?fields=
+CAMPOS_API_DEFECTO = ['id', 'first_name', 'last_name', 'email', 'rol', 'created_at']
+
+# Campos de ORDENAMIENTOS_PERMITIDOS que admiten NULL (van al final en ambos sentidos)
+CAMPOS_ORDEN_NULOS = {'edad'}
+
+API_LIMITE_DEFECTO = 50
+API_LIMITE_MAXIMO = 500
+
+
+class CursorInvalido(Exception):
+    """El parámetro cursor no se pudo decodificar"""
+
+
+def _codificar_cursor(valor, pk):
+    """
+    Cursor opaco con el valor del campo de orden y el id de la última fila
+    Las fechas van en isoformat completo (con microsegundos) para no saltar filas
+    """
+    if isinstance(valor, (date, datetime)):
+        valor = valor.isoformat()
+    crudo = json.dumps([valor, pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor):
+    """
+    Returns:
+        tuple (valor, id)
+    
+    Raises:
+        CursorInvalido: si el cursor no tiene el formato esperado
+    """
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valor, pk = json.loads(crudo)
+        return valor, int(pk)
+    except (ValueError, TypeError, binascii.Error):
+        raise CursorInvalido(cursor)
+
+
+def _paginar_por_cursor(usuarios_list, order_by, cursor):
+    """
+    Paginación por keyset: ordena por (campo, id) y continúa después
+    de la última fila vista, sin OFFSET ni COUNT
+    
+    Args:
+        usuarios_list: QuerySet ya filtrado
+        order_by: Campo de ORDENAMIENTOS_PERMITIDOS (con - si es descendente)
+        cursor: Cursor de la página anterior o None
+    
+    Returns:
+        tuple (queryset ordenado desde el cursor, nombre del campo de orden)
+    """
+    if order_by not in ORDENAMIENTOS_PERMITIDOS:
+        order_by = '-created_at'
+    descendente = order_by.startswith('-')
+    campo = order_by.lstrip('-')
+    admite_nulos = campo in CAMPOS_ORDEN_NULOS
+    
+    # NULLS LAST solo donde hace falta: en columnas NOT NULL cambiaría el
+    # orden respecto de los índices y PostgreSQL dejaría de usarlos
+    nulos = {'nulls_last': True} if admite_nulos else {}
+    if descendente:
+        orden = [F(campo).desc(**nulos), F('id').desc()]
+    else:
+        orden = [F(campo).asc(**nulos), F('id').asc()]
+    usuarios_list = usuarios_list.order_by(*orden)
+    
+    if cursor:
+        valor, pk = _decodificar_cursor(cursor)
+        mayor = 'lt' if descendente else 'gt'
+        if valor is None:
+            # Ya estamos en el tramo de NULLs: solo queda avanzar por id
+            siguiente = Q(**{f'{campo}__isnull': True, f'id__{mayor}': pk})
+        else:
+            siguiente = (
+                Q(**{f'{campo}__{mayor}': valor}) |
+                Q(**{campo: valor, f'id__{mayor}': pk})
+            )
+            if admite_nulos:
+                siguiente |= Q(**{f'{campo}__isnull': True})
+        try:
+            usuarios_list = usuarios_list.filter(siguiente)
+        except (ValidationError, ValueError, TypeError):
+            raise CursorInvalido(cursor)
+    
+    return usuarios_list, campo
+
+
+@login_required
+def api_usuarios(request):
+    """
+    API JSON de solo lectura sobre los usuarios activos
+    Misma búsqueda y ordenamiento que listar_usuarios
+    
+    Las filas se leen con values_list (solo las columnas pedidas) y se
+    serializan directo a dicts, sin construir instancias de Usuario.
+    
+    Parámetros GET:
+    - q: término de búsqueda
+    - order_by: campo para ordenar (ORDENAMIENTOS_PERMITIDOS)
+    - fields: campos separados por coma (CAMPOS_API)
+    - limit: filas por página (1-500, por defecto 50)
+    - cursor: valor de "siguiente" de la respuesta anterior
+    
+    Returns:
+        JsonResponse con data, siguiente (cursor o null) y siguiente_url
+    """
+    try:
+        filas, nombres, limite = _consulta_api(request)
+    except ErrorApi as e:
+        return JsonResponse(e.datos, status=400)
+    
+    return _respuesta_api(request, list(filas), nombres, limite)
+
+
+class ErrorApi(Exception):
+    """Parámetros inválidos en la API; datos es el cuerpo de la respuesta 400"""
+    def __init__(self, message, **extra):
+        super().__init__(message)
+        self.datos = {'status': 'error', 'message': message, **extra}
+
+
+def _consulta_api(request):
+    """
+    Valida los parámetros de api_usuarios y arma la consulta (sin ejecutarla)
+    
+    Returns:
+        tuple (QuerySet de tuplas con limite + 1 filas, nombres de campos, limite)
+    
+    Raises:
+        ErrorApi: si fields o cursor no son válidos
+    """
+    usuarios_list, query, order_by = usuarios_filtrados(request)
+    
+    # Campos pedidos (sparse fieldset)
+    fields = request.GET.get('fields', '').strip()
+    nombres = [n.strip() for n in fields.split(',') if n.strip()] if fields else CAMPOS_API_DEFECTO
+    desconocidos = [n for n in nombres if n not in CAMPOS_API]
+    if desconocidos:
+        raise ErrorApi(
+            f'Campos no permitidos: {", ".join(desconocidos)}',
+            permitidos=list(CAMPOS_API),
+        )
+    nombres = list(dict.fromkeys(nombres))
+    
+    try:
+        limite = min(max(int(request.GET.get('limit', API_LIMITE_DEFECTO)), 1), API_LIMITE_MAXIMO)
+    except ValueError:
+        limite = API_LIMITE_DEFECTO
+    
+    try:
+        usuarios_list, campo_orden = _paginar_por_cursor(
+            usuarios_list, order_by, request.GET.get('cursor')
+        )
+    except CursorInvalido:
+        raise ErrorApi('Cursor inválido')
+    
+    # Al final de cada tupla van el campo de orden y el id para armar el cursor
+    columnas = [CAMPOS_API[n] for n in nombres] + [campo_orden, 'id']
+    return usuarios_list.values_list(*columnas)[:limite + 1], nombres, limite
+
+
+def _respuesta_api(request, filas, nombres, limite):
+    """
+    Serializa una página de api_usuarios
+    
+    Args:
+        filas: Lista de tuplas leídas de _consulta_api
+        nombres: Campos pedidos
+        limite: Filas por página
+    """
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = _codificar_cursor(filas[-1][-2], filas[-1][-1])
+    
+    cantidad = len(nombres)
+    data = [dict(zip(nombres, fila[:cantidad])) for fila in filas]
+    
+    siguiente_url = None
+    if siguiente:
+        params = request.GET.copy()
+        params['cursor'] = siguiente
+        siguiente_url = f'{request.path}?{params.urlencode()}'
+    
+    return JsonResponse({
+        'status': 'success',
+        'data': data,
+        'siguiente': siguiente,
+        'siguiente_url': siguiente_url,
+    })
+
+
+def _momento_consulta(valor):
+    """
+    Interpreta el parámetro ?en= de api_estado_usuario
+    Acepta fecha y hora ISO (sin zona = hora local) o solo fecha (= fin de ese día)
+    
+    Returns:
+        datetime con zona horaria, o None si no es válido
+    """
+    # Con el formato correcto pero una fecha imposible (2024-02-30, hora 25)
+    # parse_date/parse_datetime lanzan ValueError en vez de devolver None
+    try:
+        momento = parse_datetime(valor)
+        if momento is None:
+            dia = parse_date(valor)
+            if dia is None:
+                return None
+            momento = datetime.combine(dia, datetime.max.time())
+    except ValueError:
+        return None
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return momento
+
+
+@login_required
+def api_historial_usuario(request, usuario_id):
+    """
+    Línea de tiempo de cambios de un usuario (del más nuevo al más viejo)
+    
+    Parámetros GET:
+    - limit: filas por página (1-500, por defecto 50)
+    - antes: valor de "siguiente" de la respuesta anterior
+    - archivo: 1 para seguir con el histórico archivado al terminarse el de la base
+    
+    Returns:
+        JsonResponse con data, siguiente y siguiente_url
+    """
+    usuario = get_object_or_404(Usuario.objects.only('id'), pk=usuario_id)
+    try:
+        limite = min(max(int(request.GET.get('limit', API_LIMITE_DEFECTO)), 1), API_LIMITE_MAXIMO)
+    except ValueError:
+        limite = API_LIMITE_DEFECTO
+    antes = request.GET.get('antes')
+    if antes is not None and not antes.isdigit():
+        return JsonResponse({'status': 'error', 'message': 'Parámetro antes inválido'}, status=400)
+    
+    data, siguiente = historico.linea_de_tiempo(
+        usuario.id, antes=int(antes) if antes else None, limite=limite,
+        archivo=request.GET.get('archivo') == '1',
+    )
+    
+    siguiente_url = None
+    if siguiente:
+        params = request.GET.copy()
+        params['antes'] = siguiente
+        siguiente_url = f'{request.path}?{params.urlencode()}'
+    
+    return JsonResponse({
+        'status': 'success',
+        'data': data,
+        'siguiente': siguiente,
+        'siguiente_url': siguiente_url,
+    })
+
+
+@login_required
+def api_estado_usuario(request, usuario_id):
+    """
+    Estado de un usuario en un momento dado, reconstruido desde el histórico
+    
+    Parámetros GET:
+    - en: fecha y hora ISO (por defecto, ahora) o solo fecha (fin de ese día)
+    - archivo: 1 para buscar en el histórico archivado si hace falta
+    
+    Returns:
+        JsonResponse con secuencia, modificado, datos y desconocidos (campos
+        que el histórico de ese momento no registraba: vienen en null en
+        datos, no significan "vacío"); 404 si el usuario todavía no existía
+        en ese momento; 410 si hace falta el archivo y no se pidió
+    """
+    usuario = get_object_or_404(Usuario, pk=usuario_id)
+    en = request.GET.get('en')
+    momento = _momento_consulta(en) if en else timezone.now()
+    if momento is None:
+        return JsonResponse({'status': 'error', 'message': 'Parámetro en inválido'}, status=400)
+    
+    try:
+        estado = historico.estado_en(usuario, momento, archivo=request.GET.get('archivo') == '1')
+    except historico.HistoricoArchivado:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'El histórico de ese momento está archivado; repetir con archivo=1'
+        }, status=410)
+    if estado is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'El usuario no existía en ese momento'
+        }, status=404)
+    
+    return JsonResponse({
+        'status': 'success',
+        'data': {
+            'usuario_id': usuario.id,
+            'en': momento.isoformat(),
+            **estado,
+        }
+    })
+
+
 @login_required
 def crear_usuario(request):
     """
@@ -357,13 +959,15 @@ def crear_usuario(request):
                 messages.error(request, 'Nombre, apellido y email son obligatorios')
                 return render(request, 'crear.html')
             
-            # 2. Validar email único
-            if Usuario.objects.filter(email=email).exists():
+            # 2. Validar email único (si el filtro de Bloom dice que no existe, no se consulta)
+            if bloom.email_puede_existir(email) and Usuario.objects.filter(email__lower=email).exists():
                 messages.error(request, f'El email {email} ya está registrado')
                 return render(request, 'crear.html')
             
             # 3. Validar teléfono único (si se proporciona)
-            if telefono and Usuario.objects.filter(telefono=telefono).exists():
+            if telefono and bloom.telefono_puede_existir(telefono) and Usuario.objects.filter(
+                telefono_digitos=normalizar_telefono(telefono)
+            ).exists():
                 messages.error(request, f'El teléfono {telefono} ya está registrado')
                 return render(request, 'crear.html')
             
@@ -441,15 +1045,18 @@ def crear_usuario(request):
     # GET request: mostrar formulario vacío
     return render(request, 'crear.html')
 
+def _puede_editar(user):
+    """
+    Solo admins pueden editar usuarios
+    (desde el snapshot de permisos cacheado, sin consultar la base)
+    """
+    return permisos.de(user).puede_editar
+
+
 @login_required
 def editar_usuario(request, usuario_id):
     usuario = get_object_or_404(Usuario, id=usuario_id)
-    # Solo admins pueden editar
-    if not (
-        request.user.is_superuser or
-        (hasattr(request.user, "usuario") and 
-         request.user.usuario.categoria.name == "ADMIN" )
-    ):
+    if not _puede_editar(request.user):
         return HttpResponseForbidden("No posees permisos para realizar esta accion")
 
     if request.method == "POST":
@@ -484,39 +1091,14 @@ def eliminar_multiples_usuarios(request):
     - Búsqueda
     - Ordenamiento
     - Paginación
-    - Eliminación masiva por checkboxes
+    - Eliminación masiva por checkboxes, en dos modos (POST modo):
+      - desactivar: is_active=False con un solo UPDATE (por defecto)
+      - eliminar: borrado definitivo por lotes en segundo plano (solo admins),
+        con el avance en detalle_eliminacion
     """
 
-    # Obtener término de búsqueda
-    query = request.GET.get('q', '').strip()
-
-    # Base: solo usuarios activos
-    usuarios_list = Usuario.objects.filter(is_active=True)
-
-    # Aplicar búsqueda
-    if query:
-        usuarios_list = usuarios_list.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(email__icontains=query) |
-            Q(telefono__icontains=query)
-        )
-
-    # Ordenamiento
-    order_by = request.GET.get('order_by', '-created_at')
-
-    allowed_ordering = [
-        'first_name', '-first_name',
-        'last_name', '-last_name',
-        'email', '-email',
-        'edad', '-edad',
-        'created_at', '-created_at',
-    ]
-
-    if order_by in allowed_ordering:
-        usuarios_list = usuarios_list.order_by(order_by)
-    else:
-        usuarios_list = usuarios_list.order_by('-created_at')
+    # Búsqueda y ordenamiento (solo usuarios activos)
+    usuarios_list, query, order_by = usuarios_filtrados(request)
 
     # Paginación
     paginator = Paginator(usuarios_list, 20)
@@ -531,16 +1113,28 @@ def eliminar_multiples_usuarios(request):
     # PROCESAR ELIMINACIÓN (POST)
     # ============================
     if request.method == "POST":
-        ids = request.POST.getlist("usuarios")
+        ids = [pk for pk in request.POST.getlist("usuarios") if pk.isdigit()]
+        modo = request.POST.get("modo", "desactivar")
 
-        if ids:
-            eliminados = Usuario.objects.filter(id__in=ids).delete()
+        if not ids:
+            messages.warning(request, "No seleccionaste ningún usuario.")
+        elif modo == "eliminar":
+            if not _puede_editar(request.user):
+                return HttpResponseForbidden("No posees permisos para realizar esta accion")
+            tarea = masivo.programar_eliminacion(ids, user=request.user)
             messages.success(
                 request,
-                f"Se eliminaron {len(ids)} usuarios correctamente."
+                format_html(
+                    'Eliminando {} usuarios en segundo plano. <a href="{}">Ver avance</a>',
+                    tarea.total, reverse('detalle_eliminacion', args=[tarea.id]),
+                ),
             )
         else:
-            messages.warning(request, "No seleccionaste ningún usuario.")
+            desactivados = masivo.desactivar(ids, modificado_por=request.user)
+            messages.success(
+                request,
+                f"Se desactivaron {desactivados} usuarios correctamente."
+            )
 
         return redirect("eliminar_multiples")
 
@@ -549,14 +1143,375 @@ def eliminar_multiples_usuarios(request):
         "usuarios": usuarios,
         "query": query,
         "order_by": order_by,
-        "total": usuarios_list.count(),
+        "total": paginator.count,
+        "puede_editar": _puede_editar(request.user),
+        "roles": Usuario.ROL_CHOICES,
+        "categorias": categorias.opciones(),
     }
 
     return render(request, "deletemulti.html", context)
 
 
+@login_required
+def editar_multiples_usuarios(request):
+    """
+    Edición masiva de rol, categoría o estado de los usuarios seleccionados
+    en la página de eliminación múltiple
+
+    Un solo UPDATE para toda la selección (ver App/masivo.py) en vez de
+    un editar_usuario por usuario
+    """
+    if request.method != "POST":
+        return redirect("eliminar_multiples")
+
+    if not _puede_editar(request.user):
+        return HttpResponseForbidden("No posees permisos para realizar esta accion")
+
+    ids = [pk for pk in request.POST.getlist("usuarios") if pk.isdigit()]
+    if not ids:
+        messages.warning(request, "No seleccionaste ningún usuario.")
+        return redirect("eliminar_multiples")
+
+    try:
+        cambios = masivo.validar_cambios(request.POST)
+    except ValidationError as e:
+        messages.error(request, e.messages[0])
+        return redirect("eliminar_multiples")
+
+    modificados = masivo.editar(ids, cambios, modificado_por=request.user)
+    logger.info(f'Edición masiva por {request.user.username}: {modificados} usuarios, {cambios}')
+    messages.success(request, f"Se actualizaron {modificados} usuarios correctamente.")
+    return redirect("eliminar_multiples")
+
+
+def _eliminaciones_visibles(request):
+    """Eliminaciones masivas que puede consultar el usuario actual"""
+    eliminaciones = EliminacionMasiva.objects.all()
+    if not request.user.is_superuser:
+        eliminaciones = eliminaciones.filter(user=request.user)
+    return eliminaciones
+
+
+def _etag_eliminacion(request, eliminacion_id):
+    """ETag de una eliminación masiva: hash de su estado y avance"""
+    estado = _eliminaciones_visibles(request).filter(pk=eliminacion_id).values_list(
+        'status', 'procesados', 'eliminados', 'finished_at'
+    ).first()
+    if estado is None:
+        return None
+    return hashlib.md5(repr(estado).encode()).hexdigest()
+
+
+@login_required
+@condition(etag_func=_etag_eliminacion)
+def detalle_eliminacion(request, eliminacion_id):
+    """
+    Avance de una eliminación masiva en JSON (para consultar periódicamente)
+    Con If-None-Match responde 304 mientras no avance
+
+    Returns:
+        JsonResponse con estado y contadores
+    """
+    tarea = get_object_or_404(_eliminaciones_visibles(request), pk=eliminacion_id)
+
+    return JsonResponse({
+        'status': 'success',
+        'data': {
+            'eliminacion_id': tarea.id,
+            'estado': tarea.status,
+            'fecha': tarea.created_at.isoformat(),
+            'total': tarea.total,
+            'procesados': tarea.procesados,
+            'eliminados': tarea.eliminados,
+            'porcentaje': round(tarea.procesados * 100 / tarea.total, 1) if tarea.total else 100.0,
+            'terminada': tarea.finished_at.isoformat() if tarea.finished_at else None,
+            'error': tarea.error or None,
+        }
+    })
+
+
 # ==================== IMPORTACIÓN EXCEL ====================
 
+# Filas por transacción en la importación: los históricos y eventos de
+# cada lote se escriben juntos al final del lote (App/diferido.py). El
+# lote se cierra antes si pasan IMPORTACION_LOTE_SEGUNDOS, para no dejar
+# transacciones abiertas mientras se crean usuarios (hash de contraseña)
+IMPORTACION_LOTE = 50
+IMPORTACION_LOTE_SEGUNDOS = 2
+
+
+def _roles_importacion(df, errores_filas):
+    """
+    Valida la columna rol de todo el archivo de una vez (sin recorrer filas)
+    Acepta el código o la etiqueta de Usuario.ROL_CHOICES, sin distinguir mayúsculas
+
+    Args:
+        df: DataFrame del archivo
+        errores_filas: dict índice -> lista de errores, se completa con los roles inválidos
+
+    Returns:
+        dict índice -> código de rol (solo filas con rol válido)
+    """
+    if 'rol' not in df.columns:
+        return {}
+
+    equivalencias = {}
+    for codigo, etiqueta in Usuario.ROL_CHOICES:
+        equivalencias[codigo.lower()] = codigo
+        equivalencias[etiqueta.lower()] = codigo
+
+    texto = df['rol'].fillna('').astype(str).str.strip()
+    roles = texto.str.lower().map(equivalencias)
+
+    for idx in df.index[(texto != '') & roles.isna()]:
+        errores_filas.setdefault(idx, []).append(f'Rol inválido: "{texto[idx]}"')
+
+    return roles.dropna().to_dict()
+
+
+def _categorias_importacion(df, errores_filas, crear=False):
+    """
+    Resuelve la columna categoria (nombres) a ids para todo el archivo
+    Los nombres se buscan en el mapa de App/categorias.py: a lo sumo una
+    consulta por archivo, no una por fila
+
+    Args:
+        df: DataFrame del archivo
+        errores_filas: dict índice -> lista de errores, se completa con las categorías no resueltas
+        crear: Si es True, las categorías que no existen se crean con un solo bulk_create
+
+    Returns:
+        dict índice -> categoria_id (solo filas con categoría resuelta)
+    """
+    if 'categoria' not in df.columns:
+        return {}
+
+    nombres = df['categoria'].fillna('').astype(str).str.strip()
+    unicos = [nombre for nombre in nombres.unique() if nombre]
+    ids = categorias.ids_por_nombre(unicos)
+
+    largo_maximo = Categoria._meta.get_field('name').max_length
+    faltantes = {}
+    for nombre in unicos:
+        if nombre not in ids and len(nombre) <= largo_maximo:
+            # Una sola categoría por nombre aunque venga con distintas mayúsculas
+            faltantes.setdefault(nombre.lower(), nombre)
+
+    if crear and faltantes:
+        creadas = Categoria.objects.bulk_create([Categoria(name=nombre) for nombre in faltantes.values()])
+        # bulk_create no dispara señales: se invalida el mapa a mano. Los ids
+        # nuevos salen de lo creado: el mapa recién se recarga al confirmar
+        categorias.invalidar()
+        ids_creadas = {categoria.name.lower(): categoria.pk for categoria in creadas}
+        ids.update({
+            nombre: ids_creadas[nombre.lower()]
+            for nombre in unicos if nombre not in ids and nombre.lower() in ids_creadas
+        })
+        logger.info(f'Importación: {len(faltantes)} categorías creadas')
+
+    resueltos = nombres.map(ids)
+    for idx in df.index[(nombres != '') & resueltos.isna()]:
+        nombre = nombres[idx]
+        if len(nombre) > largo_maximo:
+            mensaje = f'Categoría "{nombre[:largo_maximo]}..." excede {largo_maximo} caracteres'
+        else:
+            mensaje = f'Categoría "{nombre}" no existe'
+        errores_filas.setdefault(idx, []).append(mensaje)
+
+    return {idx: int(pk) for idx, pk in resueltos.dropna().items()}
+
+
+class FilaInvalida(Exception):
+    """Fila de la importación con errores de validación (no se guarda)"""
+    def __init__(self, errores):
+        super().__init__('; '.join(errores))
+        self.errores = errores
+
+
+def _importar_fila(idx, row, user, errores_filas, roles, categorias_ids):
+    """
+    Valida una fila del archivo y crea o actualiza su Usuario
+
+    Args:
+        idx: Índice de la fila en el DataFrame
+        row: Fila (Series)
+        user: User que importa (queda como created_by)
+        errores_filas, roles, categorias_ids: Resultados de _roles_importacion
+            y _categorias_importacion para todo el archivo
+
+    Returns:
+        bool: True si creó el usuario, False si lo actualizó
+
+    Raises:
+        FilaInvalida: Si la fila no pasa las validaciones
+    """
+    if idx in errores_filas:
+        raise FilaInvalida(errores_filas[idx])
+
+    # Limpiar datos básicos
+    first_name = str(row.get('first_name', '')).strip()
+    last_name = str(row.get('last_name', '')).strip()
+    email = str(row.get('email', '')).strip().lower()
+
+    # Validar campos obligatorios
+    if not all([first_name, last_name, email]):
+        raise FilaInvalida(['Campos obligatorios vacíos'])
+
+    # Validar formato de email
+    if '@' not in email or '.' not in email.split('@')[1]:
+        raise FilaInvalida(['Email inválido'])
+
+    # Procesar edad (opcional)
+    edad = None
+    if pd.notna(row.get('edad')):
+        try:
+            edad = int(float(row.get('edad')))
+        except (TypeError, ValueError):
+            pass
+        else:
+            if edad < 0 or edad > 150:
+                raise FilaInvalida(['Edad debe estar entre 0 y 150'])
+
+    # Procesar teléfono (opcional)
+    telefono = None
+    if pd.notna(row.get('telefono')):
+        telefono = str(row.get('telefono')).strip()
+        # Ignorar valores como 'nan', 'NaN', etc.
+        if telefono.lower() in ['nan', 'none', '']:
+            telefono = None
+
+    # Procesar fecha de nacimiento (opcional)
+    fecha_nac = None
+    if pd.notna(row.get('fecha_nacimiento')):
+        try:
+            fecha_nac = pd.to_datetime(
+                row.get('fecha_nacimiento')
+            ).date()
+        except:
+            pass
+
+    # Crear o actualizar usuario
+    defaults = {
+        'first_name': first_name,
+        'last_name': last_name,
+        'edad': edad,
+        'telefono': telefono,
+        'fecha_nacimiento': fecha_nac,
+        'created_by': user,
+        'is_active': True
+    }
+    # Solo si vienen en el archivo: al actualizar no se pisan los valores actuales
+    if idx in roles:
+        defaults['rol'] = roles[idx]
+    if idx in categorias_ids:
+        defaults['categoria_id'] = categorias_ids[idx]
+    if not bloom.email_puede_existir(email):
+        # Según el filtro de Bloom el email no existe: se intenta crear directo,
+        # sin el SELECT ... FOR UPDATE previo. El filtro puede equivocarse (un
+        # alta de otro proceso cuyo aviso no llegó): si la creación falla,
+        # Usuario.save() ya revirtió su savepoint y se sigue por el camino
+        # exacto, que actualiza si el email existía o da el mismo error si no
+        try:
+            Usuario.objects.create(email=email, **defaults)
+            return True
+        except ValidationError:
+            pass
+
+    # El email ya viene en minúsculas: búsqueda exacta por índice único y
+    # usuario_email_lower_uniq impide duplicados en importaciones concurrentes
+    _, was_created = Usuario.objects.update_or_create(
+        email=email,
+        defaults=defaults
+    )
+    return was_created
+
+
+def _importar_transaccion(pendientes, tomadas, importar):
+    """
+    Importa filas de pendientes en una transacción (diferido.agrupar()),
+    hasta IMPORTACION_LOTE filas o IMPORTACION_LOTE_SEGUNDOS segundos
+    Cada fila va en su propio savepoint: si falla, solo se revierte ella
+
+    Args:
+        pendientes: Iterador de (idx, row)
+        tomadas: Lista donde se agregan las filas tomadas (para reintentarlas)
+        importar: Función (idx, row) -> bool, como _importar_fila
+
+    Returns:
+        tuple (creados, actualizados, errores) de la transacción confirmada
+    """
+    creados = actualizados = 0
+    errores = []
+    limite = time.monotonic() + IMPORTACION_LOTE_SEGUNDOS
+    with diferido.agrupar():
+        for idx, row in pendientes:
+            tomadas.append((idx, row))
+            try:
+                with diferido.atomico():
+                    if importar(idx, row):
+                        creados += 1
+                    else:
+                        actualizados += 1
+            except FilaInvalida as e:
+                errores.append({
+                    'row': idx + 2,  # +2 porque índice empieza en 0 y hay header
+                    'errors': e.errores
+                })
+            except Exception as e:
+                # Error procesando fila específica
+                errores.append({
+                    'row': idx + 2,
+                    'errors': [str(e)]
+                })
+                logger.error(f'Error en fila {idx + 2}: {e}')
+            if len(tomadas) >= IMPORTACION_LOTE or time.monotonic() > limite:
+                break
+    return creados, actualizados, errores
+
+
+def _importar_por_lotes(filas, importar):
+    """
+    Importa todas las filas en transacciones cortas (_importar_transaccion)
+
+    Crear un usuario cuesta el hash de su contraseña (create_autenticado):
+    con transacciones largas se retienen locks y se frena el consumidor de
+    eventos, que solo lee transacciones terminadas. Si una transacción
+    falla al confirmarse (por ejemplo al escribir los históricos del lote),
+    sus filas se reintentan de a una: solo se pierde la que falla y los
+    contadores cuentan solo lo confirmado.
+
+    Args:
+        filas: Iterable de (idx, row)
+        importar: Función (idx, row) -> bool, como _importar_fila
+
+    Returns:
+        tuple (creados, actualizados, errores)
+    """
+    pendientes = iter(filas)
+    creados = actualizados = 0
+    errores = []
+
+    def sumar(resultado):
+        nonlocal creados, actualizados
+        creados += resultado[0]
+        actualizados += resultado[1]
+        errores.extend(resultado[2])
+
+    while True:
+        tomadas = []
+        try:
+            sumar(_importar_transaccion(pendientes, tomadas, importar))
+        except Exception as e:
+            logger.warning(f'Lote de importación revertido ({e}): se reintenta fila por fila')
+            for idx, row in tomadas:
+                try:
+                    sumar(_importar_transaccion(iter([(idx, row)]), [], importar))
+                except Exception as e:
+                    sumar((0, 0, [{'row': idx + 2, 'errors': [str(e)]}]))
+        if not tomadas:
+            return creados, actualizados, errores
+
+
 @method_decorator(login_required, name='dispatch')
 class UploadExcelView(View):
     """
@@ -578,6 +1533,8 @@ class UploadExcelView(View):
     - edad
     - telefono
     - fecha_nacimiento
+    - rol (código o nombre, ver Usuario.ROL_CHOICES)
+    - categoria (nombre; con crear_categorias=1 se crean las que no existan)
     """
     
     def post(self, request):
@@ -694,92 +1651,20 @@ class UploadExcelView(View):
             
             logger.info(f'Procesando {len(df)} registros...')
             
-            created = 0
-            updated = 0
-            errors = []
+            # Rol y categoría se validan y resuelven para todo el archivo antes del recorrido
+            errores_filas = {}
+            crear_categorias = request.POST.get('crear_categorias', '').lower() in ('1', 'true', 'on')
+            roles = _roles_importacion(df, errores_filas)
+            categorias_ids = _categorias_importacion(df, errores_filas, crear=crear_categorias)
             
-            # Iterar sobre cada fila del DataFrame
-            for idx, row in df.iterrows():
-                try:
-                    # Limpiar datos básicos
-                    first_name = str(row.get('first_name', '')).strip()
-                    last_name = str(row.get('last_name', '')).strip()
-                    email = str(row.get('email', '')).strip().lower()
-                    
-                    # Validar campos obligatorios
-                    if not all([first_name, last_name, email]):
-                        errors.append({
-                            'row': idx + 2,  # +2 porque índice empieza en 0 y hay header
-                            'errors': ['Campos obligatorios vacíos']
-                        })
-                        continue
-                    
-                    # Validar formato de email
-                    if '@' not in email or '.' not in email.split('@')[1]:
-                        errors.append({
-                            'row': idx + 2,
-                            'errors': ['Email inválido']
-                        })
-                        continue
-                    
-                    # Procesar edad (opcional)
-                    edad = None
-                    if pd.notna(row.get('edad')):
-                        try:
-                            edad = int(float(row.get('edad')))
-                            if edad < 0 or edad > 150:
-                                errors.append({
-                                    'row': idx + 2,
-                                    'errors': ['Edad debe estar entre 0 y 150']
-                                })
-                                continue
-                        except:
-                            pass
-                    
-                    # Procesar teléfono (opcional)
-                    telefono = None
-                    if pd.notna(row.get('telefono')):
-                        telefono = str(row.get('telefono')).strip()
-                        # Ignorar valores como 'nan', 'NaN', etc.
-                        if telefono.lower() in ['nan', 'none', '']:
-                            telefono = None
-                    
-                    # Procesar fecha de nacimiento (opcional)
-                    fecha_nac = None
-                    if pd.notna(row.get('fecha_nacimiento')):
-                        try:
-                            fecha_nac = pd.to_datetime(
-                                row.get('fecha_nacimiento')
-                            ).date()
-                        except:
-                            pass
-                    
-                    # Crear o actualizar usuario
-                    usuario, was_created = Usuario.objects.update_or_create(
-                        email=email,
-                        defaults={
-                            'first_name': first_name,
-                            'last_name': last_name,
-                            'edad': edad,
-                            'telefono': telefono,
-                            'fecha_nacimiento': fecha_nac,
-                            'created_by': request.user,
-                            'is_active': True
-                        }
-                    )
-                    
-                    if was_created:
-                        created += 1
-                    else:
-                        updated += 1
-                    
-                except Exception as e:
-                    # Error procesando fila específica
-                    errors.append({
-                        'row': idx + 2,
-                        'errors': [str(e)]
-                    })
-                    logger.error(f'Error en fila {idx + 2}: {e}')
+            # Transacciones cortas: cada una confirma sus filas con sus
+            # históricos y eventos (App/diferido.py)
+            importar = partial(
+                _importar_fila,
+                user=request.user, errores_filas=errores_filas,
+                roles=roles, categorias_ids=categorias_ids,
+            )
+            created, updated, errors = _importar_por_lotes(df.iterrows(), importar)
             
             # ===== FINALIZAR AUDITORÍA =====
             
@@ -808,6 +1693,8 @@ class UploadExcelView(View):
                 'status': 'success',
                 'message': 'Importación completada',
                 'data': {
+                    'importacion_id': audit.id,
+                    'detalle_url': reverse('detalle_importacion', args=[audit.id]),
                     'creados': created,
                     'actualizados': updated,
                     'errores': errors[:10],  # Solo primeros 10 para respuesta
@@ -824,7 +1711,110 @@ class UploadExcelView(View):
             }, status=500)
 
 
+def _importaciones_visibles(request):
+    """Importaciones que puede consultar el usuario actual"""
+    importaciones = ImportAudit.objects.all()
+    if not request.user.is_superuser:
+        importaciones = importaciones.filter(user=request.user)
+    return importaciones
+
+
+def _etag_importacion(request, audit_id):
+    """
+    ETag de una importación: hash de su estado y contadores
+    Una sola consulta por columnas; si no cambió, no se serializa nada
+    """
+    estado = _estado_importacion(request, audit_id).first()
+    if estado is None:
+        return None
+    return hashlib.md5(repr(estado).encode()).hexdigest()
+
+
+def _estado_importacion(request, audit_id):
+    """Columnas de una importación que cambian mientras se procesa"""
+    return _importaciones_visibles(request).filter(pk=audit_id).values_list(
+        'status', 'row_count', 'imported_count', 'updated_count',
+        'error_count', 'processing_time'
+    )
+
+
+@login_required
+@condition(etag_func=_etag_importacion)
+def detalle_importacion(request, audit_id):
+    """
+    Resultado de una importación en JSON
+    Pensado para clientes que consultan periódicamente (polling):
+    con If-None-Match responde 304 mientras la importación no cambie
+    
+    Returns:
+        JsonResponse con el estado y los contadores de la importación
+    """
+    audit = get_object_or_404(_importaciones_visibles(request), pk=audit_id)
+    
+    return JsonResponse({
+        'status': 'success',
+        'data': _serializar_importacion(audit)
+    })
+
+
+def _serializar_importacion(audit):
+    """Datos de una ImportAudit para detalle_importacion"""
+    return {
+        'importacion_id': audit.id,
+        'archivo': audit.filename,
+        'estado': audit.status,
+        'fecha': audit.uploaded_at.isoformat(),
+        'filas': audit.row_count,
+        'creados': audit.imported_count,
+        'actualizados': audit.updated_count,
+        'total_errores': audit.error_count,
+        'errores': audit.errors,
+        'tiempo_procesamiento': (
+            audit.processing_time.total_seconds()
+            if audit.processing_time else None
+        ),
+    }
+
+
+# Datos de ejemplo de la plantilla
+PLANTILLA_DATOS = {
+    'first_name': ['Juan', 'María', 'Pedro'],
+    'last_name': ['Pérez', 'García', 'López'],
+    'edad': [25, 30, 28],
+    'email': ['juan@ejemplo.com', 'maria@ejemplo.com', 'pedro@ejemplo.com'],
+    'telefono': ['+56912345678', '+56987654321', '+56955556666'],
+    'fecha_nacimiento': ['1998-05-15', '1993-08-22', '1995-12-10'],
+    'rol': ['USER', 'USER', 'ADMIN'],
+    # Vacía: las categorías dependen de cada instalación y la plantilla es
+    # la misma para todas (un nombre que no existe sería un error por fila)
+    'categoria': ['', '', ''],
+}
+
+# Hash del contenido de la plantilla: estable entre procesos, sirve de ETag
+PLANTILLA_ETAG = hashlib.sha256(
+    json.dumps(PLANTILLA_DATOS, sort_keys=True).encode()
+).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _generar_plantilla():
+    """
+    Genera el .xlsx de la plantilla una sola vez por proceso
+    
+    Returns:
+        bytes con el archivo Excel
+    """
+    # Crear DataFrame
+    df = pd.DataFrame(PLANTILLA_DATOS)
+    
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='Usuarios')
+    return buffer.getvalue()
+
+
 @login_required
+@condition(etag_func=lambda request: PLANTILLA_ETAG)
 def descargar_plantilla(request):
     """
     Descargar plantilla Excel de ejemplo
@@ -834,33 +1824,20 @@ def descargar_plantilla(request):
     - 3 filas de ejemplo
     - Formato adecuado
     
+    El archivo se genera una vez por proceso y se valida con ETag:
+    si el navegador ya lo tiene responde 304 sin reenviarlo.
+    
     Returns:
         HttpResponse con archivo Excel
     """
     
-    # Datos de ejemplo
-    data = {
-        'first_name': ['Juan', 'María', 'Pedro'],
-        'last_name': ['Pérez', 'García', 'López'],
-        'edad': [25, 30, 28],
-        'email': ['juan@ejemplo.com', 'maria@ejemplo.com', 'pedro@ejemplo.com'],
-        'telefono': ['+56912345678', '+56987654321', '+56955556666'],
-        'fecha_nacimiento': ['1998-05-15', '1993-08-22', '1995-12-10']
-    }
-    
-    # Crear DataFrame
-    df = pd.DataFrame(data)
-    
     # Preparar respuesta HTTP
     response = HttpResponse(
+        _generar_plantilla(),
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
     response['Content-Disposition'] = 'attachment; filename=plantilla_usuarios.xlsx'
     
-    # Escribir Excel en la respuesta
-    with pd.ExcelWriter(response, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Usuarios')
-    
     logger.info(f'Plantilla descargada por {request.user.username}')
     
     return response
\ No newline at end of file
@@ -0,0 +1,270 @@
+# App/views_async.py
+"""
+Variantes async de las vistas de solo lectura (home, listado y APIs JSON)
+
+Se usan cuando el proyecto corre bajo ASGI (settings.VISTAS_ASYNC, ver
+oneProject/asgi.py): mientras una consulta o un cliente lento esperan,
+el worker atiende otras conexiones en vez de bloquear un hilo.
+
+Usan el ORM async (acount, aaggregate, async for) y todo lo que el
+template necesita se resuelve antes de renderizar: en el event loop
+no se puede consultar la base de forma perezosa. Los filtros, ETags y
+serializaciones son los mismos de App/views.py.
+"""
+import asyncio
+import csv
+import hashlib
+from functools import wraps
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from .context_processors import adashboard_context
+from .decorators import login_required_async
+from .indice_usuarios import indice
+from .views import (
+    COLUMNAS_EXPORTACION, ESTADO_LISTADO, EXPORTACION_CHUNK_SIZE, XLSX_CONTENT_TYPE,
+    ErrorApi, _Eco, _consulta_api, _dias_tendencias, _estado_importacion, _fila_csv,
+    _filas_exportacion, _generar_xlsx, _hash_listado, _hay_mensajes,
+    _importaciones_visibles, _pagina_indice, _partes_estado, _partes_importaciones,
+    _respuesta_api, _serializar_importacion, logger, usuarios_filtrados,
+)
+from . import dashboard
+from . import permisos
+from . import resumen
+
+
+# ==================== UTILIDADES ====================
+
+def condicion_async(etag_func):
+    """
+    Equivalente a @condition(etag_func=...) con una etag_func async
+    (la de Django llama a etag_func de forma síncrona)
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            etag = await etag_func(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag is not None else None
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if etag and request.method in ('GET', 'HEAD'):
+                response.headers.setdefault('ETag', etag)
+            return response
+        return wrapper
+    return decorator
+
+
+async def _apaginar(queryset, numero, por_pagina=20):
+    """
+    Página de un QuerySet con el ORM async
+    
+    El COUNT se hace con acount() y la página se materializa con
+    async for, así el template recibe una lista y no consulta nada
+    """
+    paginator = Paginator(queryset, por_pagina)
+    paginator.count = await queryset.acount()
+    pagina = paginator.get_page(numero)
+    pagina.object_list = [usuario async for usuario in pagina.object_list]
+    return pagina
+
+
+# ==================== VISTAS ====================
+
+@login_required_async
+async def home(request):
+    """
+    Versión async de views.home
+    Rol, versión de datos y estadísticas se leen en paralelo
+    """
+    # home.html muestra los mensajes pendientes; se cargan antes de renderizar
+    # porque pueden estar en la sesión, que se lee con el ORM síncrono
+    await sync_to_async(_hay_mensajes)(request)
+    return render(request, 'home.html', await adashboard_context(request.user))
+
+
+async def _etag_listado(request):
+    """Versión async de views._etag_listado"""
+    # Los mensajes pueden estar en la sesión, que se lee con el ORM síncrono
+    if await sync_to_async(_hay_mensajes)(request):
+        return None
+
+    if settings.INDICE_USUARIOS_MEMORIA:
+        # La recarga periódica del índice usa el ORM síncrono
+        await sync_to_async(indice.asegurar_fresco)()
+        permisos_usuario, importaciones, version = await asyncio.gather(
+            permisos.ade(request.user),
+            dashboard.aobtener_importaciones_recientes(request.user),
+            dashboard.aversion_datos(),
+        )
+        return _hash_listado(
+            request, permisos_usuario, _partes_importaciones(importaciones),
+            version, indice.version,
+        )
+    
+    usuarios_list, query, order_by = usuarios_filtrados(request)
+    estado, permisos_usuario, importaciones, version = await asyncio.gather(
+        usuarios_list.order_by().aaggregate(**ESTADO_LISTADO),
+        permisos.ade(request.user),
+        dashboard.aobtener_importaciones_recientes(request.user),
+        dashboard.aversion_datos(),
+    )
+    return _hash_listado(
+        request, permisos_usuario, _partes_importaciones(importaciones),
+        version, *_partes_estado(estado),
+    )
+
+
+@login_required_async
+@condicion_async(_etag_listado)
+async def listar_usuarios(request):
+    """
+    Versión async de views.listar_usuarios
+    La página, el contexto del dashboard y los permisos del usuario se cargan en paralelo
+    """
+    usuarios_list, query, order_by = usuarios_filtrados(request)
+
+    if query:
+        logger.info(f'Búsqueda realizada por {request.user.username}: "{query}"')
+    
+    if settings.INDICE_USUARIOS_MEMORIA:
+        # En un hilo: si el índice no está cargado o venció, lo recarga con el ORM síncrono
+        usuarios = await sync_to_async(_pagina_indice)(request, query, order_by)
+        contexto, permisos_usuario = await asyncio.gather(
+            adashboard_context(request.user),
+            permisos.ade(request.user),
+        )
+    else:
+        usuarios, contexto, permisos_usuario = await asyncio.gather(
+            _apaginar(usuarios_list, request.GET.get('page', 1)),
+            adashboard_context(request.user),
+            permisos.ade(request.user),
+        )
+    
+    contexto.update({
+        'usuarios': usuarios,
+        'query': query,
+        'order_by': order_by,
+        'total': usuarios.paginator.count,
+        'puede_editar': permisos_usuario.puede_editar,
+    })
+    return render(request, 'listar.html', contexto)
+
+
+# ==================== EXPORTACIÓN ====================
+
+# Bytes por lectura del XLSX temporal
+BLOQUE_ARCHIVO = 64 * 1024
+
+
+@login_required_async
+async def exportar_usuarios(request):
+    """
+    Versión async de views.exportar_usuarios
+    
+    Bajo ASGI un StreamingHttpResponse/FileResponse con iterador síncrono
+    se consume entero en memoria antes de enviarse: acá las respuestas
+    usan iteradores async (aiterator de la consulta, lectura por bloques
+    del XLSX) y se envían a medida que se generan
+    """
+    usuarios_list, query, order_by = usuarios_filtrados(request)
+    formato = request.GET.get('formato', 'csv').lower()
+    
+    logger.info(f'Exportación {formato} por {request.user.username}: q="{query}" order_by={order_by}')
+    
+    if formato == 'xlsx':
+        # openpyxl es síncrono: el archivo se arma en un hilo
+        archivo = await sync_to_async(_generar_xlsx)(usuarios_list)
+        response = StreamingHttpResponse(_aleer(archivo), content_type=XLSX_CONTENT_TYPE)
+        response['Content-Disposition'] = 'attachment; filename=usuarios.xlsx'
+        return response
+    
+    response = StreamingHttpResponse(_agenerar_csv(usuarios_list), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename=usuarios.csv'
+    return response
+
+
+async def _agenerar_csv(usuarios_list):
+    """Filas del CSV (mismas de views._exportar_csv)"""
+    writer = csv.writer(_Eco())
+    # BOM para que Excel reconozca UTF-8 (tildes y ñ)
+    yield '\ufeff' + writer.writerow([titulo for titulo, _ in COLUMNAS_EXPORTACION])
+    async for fila in _afilas_exportacion(usuarios_list):
+        yield writer.writerow(_fila_csv(fila))
+
+
+async def _afilas_exportacion(usuarios_list):
+    """
+    views._filas_exportacion leído de a EXPORTACION_CHUNK_SIZE filas en un hilo
+    
+    No se usa values_list().aiterator(): en Django 5.0 ejecuta la consulta
+    en el event loop (SynchronousOnlyOperation). Todas las llamadas van al
+    mismo hilo (thread_sensitive), el del cursor del servidor
+    """
+    filas = _filas_exportacion(usuarios_list)
+    try:
+        while bloque := await sync_to_async(_siguientes)(filas):
+            for fila in bloque:
+                yield fila
+    finally:
+        await sync_to_async(filas.close)()
+
+
+def _siguientes(filas):
+    return list(islice(filas, EXPORTACION_CHUNK_SIZE))
+
+
+async def _aleer(archivo):
+    """Lee un archivo por bloques sin bloquear el event loop y lo cierra al terminar"""
+    try:
+        while bloque := await sync_to_async(archivo.read)(BLOQUE_ARCHIVO):
+            yield bloque
+    finally:
+        archivo.close()
+
+
+@login_required_async
+async def estadisticas_usuarios(request):
+    """Versión async de views.estadisticas_usuarios"""
+    return JsonResponse({
+        'status': 'success',
+        'data': await resumen.atendencias(_dias_tendencias(request))
+    })
+
+
+@login_required_async
+async def api_usuarios(request):
+    """Versión async de views.api_usuarios"""
+    try:
+        filas, nombres, limite = _consulta_api(request)
+    except ErrorApi as e:
+        return JsonResponse(e.datos, status=400)
+    
+    return _respuesta_api(request, [fila async for fila in filas], nombres, limite)
+
+
+async def _etag_importacion(request, audit_id):
+    """Versión async de views._etag_importacion"""
+    estado = await _estado_importacion(request, audit_id).afirst()
+    if estado is None:
+        return None
+    return hashlib.md5(repr(estado).encode()).hexdigest()
+
+
+@login_required_async
+@condicion_async(_etag_importacion)
+async def detalle_importacion(request, audit_id):
+    """Versión async de views.detalle_importacion"""
+    audit = await aget_object_or_404(_importaciones_visibles(request), pk=audit_id)
+    
+    return JsonResponse({
+        'status': 'success',
+        'data': _serializar_importacion(audit)
+    })
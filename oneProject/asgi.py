@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'oneProject.settings')
 
+# Bajo ASGI las vistas de solo lectura usan sus variantes async (App/views_async.py)
+# Ejemplo: uvicorn oneProject.asgi:application --workers 2
+os.environ.setdefault('VISTAS_ASYNC', 'True')
+
 application = get_asgi_application()
\ No newline at end of file
@@ -42,6 +42,42 @@ ALLOWED_HOSTS = os.environ.get(
     'localhost,127.0.0.1'
 ).split(',')
 
+# VISTAS_ASYNC: Servir home, listado y APIs JSON con sus variantes async
+# (App/views_async.py). oneProject/asgi.py lo activa por defecto;
+# bajo WSGI (runserver, gunicorn) se usan las vistas síncronas
+VISTAS_ASYNC = os.environ.get('VISTAS_ASYNC', 'False') == 'True'
+
+# INDICE_USUARIOS_MEMORIA: Servir listar_usuarios desde un índice en memoria
+# por proceso (App/indice_usuarios.py) en vez de consultar la base
+# INDICE_USUARIOS_RECARGA: segundos entre recargas completas del índice
+INDICE_USUARIOS_MEMORIA = os.environ.get('INDICE_USUARIOS_MEMORIA', 'False') == 'True'
+INDICE_USUARIOS_RECARGA = int(os.environ.get('INDICE_USUARIOS_RECARGA', '300'))
+
+# BLOOM_USUARIOS: Filtro de Bloom que evita consultar emails/teléfonos que
+# seguro no existen (App/bloom.py). 'cache' (copia por proceso al día por
+# el bus, requiere INVALIDACION_BUS), 'archivo' (mmap de
+# BLOOM_USUARIOS_ARCHIVO, compartido por los procesos del servidor) u 'off'. Se construye con: python manage.py reconstruir_bloom
+BLOOM_USUARIOS = os.environ.get('BLOOM_USUARIOS', 'cache')
+BLOOM_USUARIOS_ARCHIVO = os.environ.get('BLOOM_USUARIOS_ARCHIVO', str(BASE_DIR / 'bloom_usuarios.bin'))
+
+# HISTORICO_RETENCION_DIAS: antigüedad desde la que `python manage.py archivar_historicos`
+# mueve UsuarioHistorico a archivos .ndjson.gz en el storage por defecto,
+# bajo HISTORICO_ARCHIVO_DIR/AAAA-MM-DD/ (App/historico.py)
+HISTORICO_RETENCION_DIAS = int(os.environ.get('HISTORICO_RETENCION_DIAS', '365'))
+HISTORICO_ARCHIVO_DIR = os.environ.get('HISTORICO_ARCHIVO_DIR', 'historicos')
+
+# EVENTOS_DIRECTORIO: segmentos .ndjson donde `python manage.py consumir_eventos`
+# vuelca el outbox de EventoUsuario (App/eventos.py); se abre un segmento nuevo
+# al superar EVENTOS_SEGMENTO_BYTES
+EVENTOS_DIRECTORIO = os.environ.get('EVENTOS_DIRECTORIO', str(BASE_DIR / 'eventos'))
+EVENTOS_SEGMENTO_BYTES = int(os.environ.get('EVENTOS_SEGMENTO_BYTES', str(64 * 1024 * 1024)))
+
+# INVALIDACION_BUS: con cachés por proceso (L1 de la caché, índice en memoria,
+# categorías) cada proceso avisa a los demás qué descartar por
+# LISTEN/NOTIFY de PostgreSQL en INVALIDACION_CANAL (App/bus.py)
+INVALIDACION_BUS = os.environ.get('INVALIDACION_BUS', 'False') == 'True'
+INVALIDACION_CANAL = os.environ.get('INVALIDACION_CANAL', 'app_invalidacion')
+
 
 # ==================== APLICACIONES ====================
 
@@ -55,6 +91,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',       # Manejo de sesiones
     'django.contrib.messages',       # Framework de mensajes
     'django.contrib.staticfiles',    # Manejo de archivos estáticos
+    'django.contrib.postgres',       # Índices y funciones propias de PostgreSQL
     'App',                           # Tu aplicación
 ]
 
@@ -65,6 +102,9 @@ INSTALLED_APPS = [
 # Se ejecutan de arriba hacia abajo en request
 # Se ejecutan de abajo hacia arriba en response
 MIDDLEWARE = [
+    # GZip: Comprime respuestas HTML/JSON grandes (primero, para actuar al final)
+    'django.middleware.gzip.GZipMiddleware',
+    
     # Seguridad: Headers de seguridad HTTP
     'django.middleware.security.SecurityMiddleware',
     
@@ -121,6 +161,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',   # Variable request
                 'django.contrib.auth.context_processors.auth',  # Variable user
                 'django.contrib.messages.context_processors.messages',  # Messages
+                'App.context_processors.dashboard_context',  # Rol y estadísticas del home
             ],
         },
     },
@@ -235,6 +276,15 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'login'
 
+# Backend de autenticación: ModelBackend que carga el User de cada request
+# con su perfil, su Usuario y la categoría en una consulta. Los inicios de
+# sesión nuevos usan el primero; ModelBackend queda para las sesiones que
+# guardaron su ruta antes del cambio (si no, tendrían que volver a entrar)
+AUTHENTICATION_BACKENDS = [
+    'App.backends.ModelBackendRelacionado',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 
 
 # ==================== CONFIGURACIÓN DE SESIONES ====================
@@ -366,23 +416,54 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880
 
 # ==================== CACHÉ ====================
 
-# Caché en memoria local (desarrollo)
-# Para producción usar Redis o Memcached
+# Dos niveles (App/cache_niveles.py): un LRU por proceso de CACHE_L1_ENTRADAS
+# entradas, que duran a lo sumo CACHE_L1_TIMEOUT segundos, delante de la
+# caché compartida por los procesos según CACHE_COMPARTIDA:
+# - 'archivo': FileBasedCache en CACHE_DIRECTORIO (desarrollo, un solo servidor)
+# - 'db':      DatabaseCache (solo bajo WSGI: en las vistas async los {% cache %}
+#              de los templates consultarían la base desde el event loop)
+# - 'redis':   RedisCache en CACHE_REDIS_URL (producción, requiere el paquete redis)
+# Con INVALIDACION_BUS los cambios se sacan al instante del L1 de los demás procesos
+#
+# Versiones, locks y el filtro de Bloom van aparte, sin L1, a la caché
+# 'coordinacion' según CACHE_COORDINACION: necesitan add() atómico entre
+# procesos, que FileBasedCache no tiene. 'db' usa la tabla cache_compartida
+# (la crea la migración 0022); 'redis' es la opción de producción
+CACHE_COMPARTIDA = os.environ.get('CACHE_COMPARTIDA', 'archivo')
+CACHE_COORDINACION = os.environ.get(
+    'CACHE_COORDINACION', 'redis' if CACHE_COMPARTIDA == 'redis' else 'db'
+)
+CACHE_DIRECTORIO = os.environ.get('CACHE_DIRECTORIO', str(BASE_DIR / 'cache_compartida'))
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/1')
+
+CACHES_COMPARTIDAS = {
+    'archivo': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIRECTORIO,
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_compartida',
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+    },
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+        'BACKEND': 'App.cache_niveles.CacheNiveles',
+        'LOCATION': 'compartida',
+        'OPTIONS': {
+            'L1_ENTRADAS': int(os.environ.get('CACHE_L1_ENTRADAS', '1000')),
+            'L1_TIMEOUT': float(os.environ.get('CACHE_L1_TIMEOUT', '5')),
+        },
+    },
+    'compartida': CACHES_COMPARTIDAS[CACHE_COMPARTIDA],
+    'coordinacion': CACHES_COMPARTIDAS[CACHE_COORDINACION],
 }
 
-# Para Redis (producción):
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-#         'LOCATION': 'redis://127.0.0.1:6379/1',
-#     }
-# }
-
 
 # ==================== OTROS ====================
 